@@ -0,0 +1,304 @@
+import os
+import time
+import uuid
+import hashlib
+import tempfile
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+from dotenv import load_dotenv
+load_dotenv()
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+TAMANO_BLOQUE = 1024 * 1024  # 1 MiB por lectura/escritura
+# Un blob publicado o reutilizado hace menos de esto no se purga aunque ningún
+# documento lo referencie todavía: la subida que lo usa aún no ha hecho commit
+MARGEN_PURGA_S = int(os.getenv("ALMACEN_MARGEN_PURGA_S", "3600"))
+
+
+class BlobGuardado(NamedTuple):
+    clave: str
+    tamano: int
+    sha256: str
+
+
+def _ruta_fragmentada(sha256_hex: str) -> str:
+    """'abcdef...' -> 'ab/cd/abcdef...' para no meter miles de archivos en una sola carpeta."""
+    return os.path.join(sha256_hex[:2], sha256_hex[2:4], sha256_hex)
+
+
+class EscritorBlob:
+    """
+    Recibe el contenido por partes, lo vuelca a un archivo temporal y calcula
+    el SHA-256 sobre la marcha. Nunca mantiene el blob completo en memoria.
+    """
+
+    def __init__(self, almacen: "AlmacenBlobs", carpeta_temporal: str):
+        self.almacen = almacen
+        fd, self.ruta_temporal = tempfile.mkstemp(prefix="subida_", dir=carpeta_temporal)
+        self._archivo = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256()
+        self.tamano = 0
+        self._cerrado = False
+
+    def escribir(self, datos: bytes):
+        self._archivo.write(datos)
+        self._hash.update(datos)
+        self.tamano += len(datos)
+
+    def confirmar(self) -> BlobGuardado:
+        self._archivo.close()
+        self._cerrado = True
+        sha = self._hash.hexdigest()
+        try:
+            self.almacen._publicar(self.ruta_temporal, sha)
+        finally:
+            if os.path.exists(self.ruta_temporal):
+                os.remove(self.ruta_temporal)
+        return BlobGuardado(clave=sha, tamano=self.tamano, sha256=sha)
+
+    def descartar(self):
+        if not self._cerrado:
+            self._archivo.close()
+            self._cerrado = True
+        if os.path.exists(self.ruta_temporal):
+            os.remove(self.ruta_temporal)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is not None:
+            self.descartar()
+
+
+class AlmacenBlobs:
+    """Interfaz común de los backends que guardan los paquetes cifrados."""
+
+    carpeta_temporal: Optional[str] = None
+
+    def nuevo_escritor(self) -> EscritorBlob:
+        return EscritorBlob(self, self.carpeta_temporal)
+
+    def guardar_bytes(self, datos: bytes) -> BlobGuardado:
+        with self.nuevo_escritor() as escritor:
+            escritor.escribir(datos)
+            return escritor.confirmar()
+
+    def iterar(self, clave: str, tamano_bloque: int = TAMANO_BLOQUE,
+               inicio: int = 0, fin: Optional[int] = None) -> Iterator[bytes]:
+        """Recorre el blob por bloques; 'fin' es exclusivo (None = hasta el final)."""
+        restante = None if fin is None else fin - inicio
+        with self.abrir_desde(clave, inicio) as f:
+            while restante is None or restante > 0:
+                a_leer = tamano_bloque if restante is None else min(tamano_bloque, restante)
+                bloque = f.read(a_leer)
+                if not bloque:
+                    break
+                if restante is not None:
+                    restante -= len(bloque)
+                yield bloque
+
+    def abrir_desde(self, clave: str, inicio: int) -> BinaryIO:
+        f = self.abrir(clave)
+        if inicio:
+            f.seek(inicio)
+        return f
+
+    def ruta_local(self, clave: str) -> Optional[str]:
+        """Ruta en disco del blob si el backend la tiene (permite sendfile)."""
+        return None
+
+    def _publicar(self, ruta_temporal: str, sha256_hex: str):
+        raise NotImplementedError
+
+    def abrir(self, clave: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def existe(self, clave: str) -> bool:
+        raise NotImplementedError
+
+    def eliminar(self, clave: str):
+        raise NotImplementedError
+
+    def modificado_en(self, clave: str) -> Optional[float]:
+        """Última publicación o reutilización (epoch), o None si no existe."""
+        raise NotImplementedError
+
+    def listar(self) -> Iterator[str]:
+        """Claves de todos los blobs guardados."""
+        raise NotImplementedError
+
+    def purgar(self, clave: str, margen_s: float = MARGEN_PURGA_S) -> bool:
+        """
+        Borra un blob que la base ya no referencia, salvo que se haya publicado
+        o reutilizado hace menos de 'margen_s'. Devuelve si lo borró.
+        """
+        modificado = self.modificado_en(clave)
+        if modificado is None or time.time() - modificado < margen_s:
+            return False
+        self.eliminar(clave)
+        return True
+
+
+class AlmacenSistemaArchivos(AlmacenBlobs):
+    """Blobs direccionados por contenido en <raiz>/ab/cd/<sha256>."""
+
+    def __init__(self, raiz: str):
+        self.raiz = os.path.abspath(raiz)
+        self.carpeta_temporal = os.path.join(self.raiz, "tmp")
+        os.makedirs(self.carpeta_temporal, exist_ok=True)
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.raiz, _ruta_fragmentada(clave))
+
+    def _publicar(self, ruta_temporal: str, sha256_hex: str):
+        destino = self._ruta(sha256_hex)
+        try:
+            # Mismo contenido ya guardado (deduplicado): se marca como reutilizado
+            # para que una purga en curso no lo borre antes del commit de esta subida
+            os.utime(destino)
+            return
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(ruta_temporal, destino)
+
+    def abrir(self, clave: str) -> BinaryIO:
+        return open(self._ruta(clave), "rb")
+
+    def ruta_local(self, clave: str) -> Optional[str]:
+        return self._ruta(clave)
+
+    def existe(self, clave: str) -> bool:
+        return os.path.exists(self._ruta(clave))
+
+    def eliminar(self, clave: str):
+        try:
+            os.remove(self._ruta(clave))
+        except FileNotFoundError:
+            pass
+
+    def modificado_en(self, clave: str) -> Optional[float]:
+        try:
+            return os.stat(self._ruta(clave)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def listar(self) -> Iterator[str]:
+        for carpeta, subcarpetas, archivos in os.walk(self.raiz):
+            if carpeta == self.raiz and "tmp" in subcarpetas:
+                subcarpetas.remove("tmp")
+            for nombre in archivos:
+                if len(nombre) == 64 and carpeta.endswith(os.path.join(nombre[:2], nombre[2:4])):
+                    yield nombre
+
+    def purgar(self, clave: str, margen_s: float = MARGEN_PURGA_S) -> bool:
+        # Se aparta con un rename atómico antes de mirar la fecha: una subida que
+        # lo reutilice a la vez, o ya lo tocó (y se devuelve a su sitio) o ya no
+        # lo encuentra y publica su propia copia
+        ruta = self._ruta(clave)
+        apartado = f"{ruta}.{uuid.uuid4().hex}.purga"
+        try:
+            os.rename(ruta, apartado)
+        except FileNotFoundError:
+            return False
+        if time.time() - os.stat(apartado).st_mtime < margen_s:
+            os.replace(apartado, ruta)
+            return False
+        os.remove(apartado)
+        return True
+
+
+class AlmacenS3(AlmacenBlobs):
+    """
+    Backend compatible con S3 (AWS, MinIO, moto_server...).
+    Para pruebas locales basta con apuntar S3_ENDPOINT_URL a un MinIO o moto_server.
+    """
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, prefijo: str = "blobs"):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("El backend S3 necesita 'boto3'. Instálalo con: pip install boto3")
+
+        self.bucket = bucket
+        self.prefijo = prefijo.strip("/")
+        self.cliente = boto3.client("s3", endpoint_url=endpoint_url)
+        self.carpeta_temporal = None  # Carpeta temporal del sistema
+
+    def _clave_objeto(self, clave: str) -> str:
+        return f"{self.prefijo}/{_ruta_fragmentada(clave)}".replace(os.sep, "/")
+
+    def _publicar(self, ruta_temporal: str, sha256_hex: str):
+        if self.existe(sha256_hex):
+            # Deduplicado: copiarlo sobre sí mismo renueva LastModified, que es lo
+            # que mira purgar() para no borrarlo antes del commit de esta subida
+            objeto = self._clave_objeto(sha256_hex)
+            self.cliente.copy_object(
+                Bucket=self.bucket, Key=objeto, CopySource={"Bucket": self.bucket, "Key": objeto},
+                MetadataDirective="REPLACE"
+            )
+            return
+        # upload_file hace subida multiparte automáticamente para archivos grandes
+        self.cliente.upload_file(ruta_temporal, self.bucket, self._clave_objeto(sha256_hex))
+
+    def abrir(self, clave: str) -> BinaryIO:
+        respuesta = self.cliente.get_object(Bucket=self.bucket, Key=self._clave_objeto(clave))
+        return respuesta["Body"]
+
+    def abrir_desde(self, clave: str, inicio: int) -> BinaryIO:
+        if not inicio:
+            return self.abrir(clave)
+        # GET con Range: S3 solo envía la parte pedida
+        respuesta = self.cliente.get_object(
+            Bucket=self.bucket, Key=self._clave_objeto(clave), Range=f"bytes={inicio}-"
+        )
+        return respuesta["Body"]
+
+    def existe(self, clave: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.cliente.head_object(Bucket=self.bucket, Key=self._clave_objeto(clave))
+            return True
+        except ClientError:
+            return False
+
+    def eliminar(self, clave: str):
+        self.cliente.delete_object(Bucket=self.bucket, Key=self._clave_objeto(clave))
+
+    def modificado_en(self, clave: str) -> Optional[float]:
+        from botocore.exceptions import ClientError
+        try:
+            respuesta = self.cliente.head_object(Bucket=self.bucket, Key=self._clave_objeto(clave))
+        except ClientError:
+            return None
+        return respuesta["LastModified"].timestamp()
+
+    def listar(self) -> Iterator[str]:
+        paginador = self.cliente.get_paginator("list_objects_v2")
+        for pagina in paginador.paginate(Bucket=self.bucket, Prefix=f"{self.prefijo}/"):
+            for objeto in pagina.get("Contents", []):
+                yield objeto["Key"].rsplit("/", 1)[-1]
+
+
+_almacen: Optional[AlmacenBlobs] = None
+
+
+def crear_almacen_desde_entorno() -> AlmacenBlobs:
+    backend = os.getenv("ALMACEN_BACKEND", "fs").lower()
+    if backend == "fs":
+        return AlmacenSistemaArchivos(os.getenv("ALMACEN_RUTA", os.path.join(base_dir, "almacen")))
+    if backend == "s3":
+        bucket = os.getenv("S3_BUCKET")
+        if not bucket:
+            raise RuntimeError("ALMACEN_BACKEND=s3 requiere la variable S3_BUCKET.")
+        return AlmacenS3(bucket, os.getenv("S3_ENDPOINT_URL"), os.getenv("S3_PREFIJO", "blobs"))
+    raise RuntimeError(f"ALMACEN_BACKEND desconocido: {backend}")
+
+
+def obtener_almacen() -> AlmacenBlobs:
+    """Devuelve el almacén configurado (se crea una sola vez por proceso)."""
+    global _almacen
+    if _almacen is None:
+        _almacen = crear_almacen_desde_entorno()
+    return _almacen
@@ -0,0 +1,123 @@
+"""
+Benchmark: rendimiento de la API con MODO_BD=hilos (sesión síncrona en el threadpool)
+frente a MODO_BD=async (aiosqlite).
+
+Uso:  python benchmarks/bench_async.py [concurrencia] [peticiones] [documentos]
+Arranca un uvicorn por modo sobre una base temporal, no toca proyecto.db.
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import subprocess
+import statistics
+import json
+
+import httpx
+
+CARPETA_BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PUERTO = 8765
+CODIGO = "bench"
+
+# Mezcla de lecturas típica del cliente: bandeja, directorio y descarga pequeña
+MEZCLA = [
+    ("GET", "/documentos/recibidos?limit=50"),
+    ("GET", "/usuarios"),
+    ("GET", "/documentos/descargar/{doc}"),
+]
+
+
+def arrancar_servidor(modo: str, carpeta: str) -> subprocess.Popen:
+    entorno = dict(
+        os.environ,
+        MODO_BD=modo,
+        DATABASE_URL=f"sqlite:///{os.path.join(carpeta, 'bench.db')}",
+        ALMACEN_RUTA=os.path.join(carpeta, "almacen"),
+        SUBIDAS_RUTA=os.path.join(carpeta, "subidas"),
+        CODIGO_INVITACION_USUARIO=CODIGO,
+        NGROK_TOKEN="",
+    )
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main_api:app", "--port", str(PUERTO), "--log-level", "warning"],
+        cwd=CARPETA_BACKEND, env=entorno
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{PUERTO}/", timeout=0.5)
+            return proceso
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("El servidor no arrancó")
+
+
+async def preparar(cliente: httpx.AsyncClient, n_documentos: int) -> tuple:
+    credenciales = {"contrasena": "Bench2025@", "codigo_invitacion": CODIGO}
+    await cliente.post("/usuarios/registrar", json={"nombre": "bench", **credenciales})
+    r = await cliente.post("/token", data={"username": "bench", "password": credenciales["contrasena"]})
+    cabeceras = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    uuid_propio = next(u["uuid"] for u in (await cliente.get("/usuarios", headers=cabeceras)).json() if u["nombre"] == "bench")
+
+    meta = json.dumps({"nombre_original": "bench.bin", "deks_cifradas": [{"usuario_uuid": uuid_propio, "dek_cifrada": "x"}]})
+    doc = None
+    for i in range(n_documentos):
+        r = await cliente.post(
+            "/documentos/subir", headers=cabeceras,
+            data={"metadata_json": meta}, files={"archivo_zip": ("b.zip", os.urandom(16 * 1024), "application/zip")}
+        )
+        doc = r.json()["id"]
+    return cabeceras, doc
+
+
+async def carga(cliente: httpx.AsyncClient, cabeceras: dict, doc: int, concurrencia: int, peticiones: int):
+    latencias = []
+    errores = 0
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def una(i: int):
+        nonlocal errores
+        metodo, ruta = MEZCLA[i % len(MEZCLA)]
+        async with semaforo:
+            t0 = time.perf_counter()
+            r = await cliente.request(metodo, ruta.format(doc=doc), headers=cabeceras)
+            latencias.append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(i) for i in range(peticiones)))
+    return time.perf_counter() - inicio, latencias, errores
+
+
+async def medir(modo: str, concurrencia: int, peticiones: int, n_documentos: int):
+    carpeta = tempfile.mkdtemp(prefix=f"bench_async_{modo}_")
+    proceso = arrancar_servidor(modo, carpeta)
+    try:
+        limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PUERTO}", limits=limites, timeout=60) as cliente:
+            cabeceras, doc = await preparar(cliente, n_documentos)
+            await carga(cliente, cabeceras, doc, concurrencia, min(peticiones, 200))  # Calentamiento
+            duracion, latencias, errores = await carga(cliente, cabeceras, doc, concurrencia, peticiones)
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+    latencias.sort()
+    p50 = statistics.median(latencias) * 1000
+    p99 = latencias[int(len(latencias) * 0.99) - 1] * 1000
+    print(f"{modo:>6} | {peticiones / duracion:8.0f} req/s | p50 {p50:7.1f} ms | p99 {p99:7.1f} ms | errores {errores}")
+
+
+def main():
+    concurrencia = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    peticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    n_documentos = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    print(f"Concurrencia {concurrencia}, {peticiones} peticiones, {n_documentos} documentos en bandeja")
+    for modo in ("hilos", "async"):
+        asyncio.run(medir(modo, concurrencia, peticiones, n_documentos))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: registrar un documento con 1, 50 y 1000 destinatarios.
+Compara el camino anterior (Documento + commit, un db.add por DEK + commit)
+con el actual (validación IN + INSERT múltiple en una transacción).
+
+Uso:  python benchmarks/bench_deks.py [repeticiones]
+Crea una base temporal, no toca proyecto.db.
+"""
+import os
+import sys
+import time
+import asyncio
+import statistics
+import tempfile
+import uuid
+
+carpeta = tempfile.mkdtemp(prefix="bench_deks_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(carpeta, 'bench.db')}"
+os.environ["ALMACEN_RUTA"] = os.path.join(carpeta, "almacen")
+os.environ["MODO_BD"] = "async"
+os.environ.setdefault("CODIGO_INVITACION_USUARIO", "bench")
+os.environ["MIGRAR_AL_INICIAR"] = "0"
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+import migraciones
+import modelos
+import schemas
+from database import motor, SesionAsyncLocal
+from almacenamiento import BlobGuardado
+from seguridad import Principal
+from main_api import registrar_documento
+
+DESTINATARIOS = (1, 50, 1000)
+
+
+async def registrar_antes(db, usuario, metadata, blob):
+    """Réplica del registro anterior: dos commits y un objeto ORM por DEK."""
+    documento = modelos.Documento(
+        propietario_id=usuario.id, nombre_archivo=metadata.nombre_original,
+        blob_clave=blob.clave, tamano_bytes=blob.tamano, sha256=blob.sha256
+    )
+    db.add(documento)
+    await db.commit()
+    await db.refresh(documento)
+    for dek in metadata.deks_cifradas:
+        db.add(modelos.DEK(documento_id=documento.id, usuario_uuid=dek.usuario_uuid, dek_cifrada=dek.dek_cifrada))
+    await db.commit()
+
+
+async def medir(funcion, usuario, metadata, blob, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        async with SesionAsyncLocal() as db:
+            inicio = time.perf_counter()
+            await funcion(db, usuario, metadata, blob)
+            tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+async def principal(repeticiones):
+    migraciones.subir(motor, log=lambda *_: None)
+    uuids = [str(uuid.uuid4()) for _ in range(max(DESTINATARIOS))]
+    async with SesionAsyncLocal() as db:
+        await db.execute(insert(modelos.Usuario), [
+            {"nombre": f"u{i}", "uuid": u, "hash_contrasena": "x", "es_admin": False, "secuencia_cambio": 0}
+            for i, u in enumerate(uuids)
+        ])
+        await db.commit()
+    usuario = Principal(1, uuids[0], "u0", False)
+    # El blob ya existe en el almacén real; aquí solo importa la parte de BD
+    blob = BlobGuardado("bench", 1024, "0" * 64)
+    dek = "A" * 344  # Tamaño de una DEK RSA-2048 en base64
+
+    print(f"{'destinatarios':>13} | {'antes (ms)':>10} | {'ahora (ms)':>10}")
+    for n in DESTINATARIOS:
+        metadata = schemas.DocumentoCrear(
+            nombre_original="bench.bin",
+            deks_cifradas=[schemas.DEKCrear(usuario_uuid=u, dek_cifrada=dek) for u in uuids[:n]]
+        )
+        antes = await medir(registrar_antes, usuario, metadata, blob, repeticiones)
+        ahora = await medir(registrar_documento, usuario, metadata, blob, repeticiones)
+        print(f"{n:>13} | {antes:10.2f} | {ahora:10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(principal(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,100 @@
+"""
+Benchmark: planes de consulta y tiempos antes/después de la migración 0004 (índices).
+
+Uso:  python benchmarks/bench_indices.py [usuarios] [documentos] [deks_por_documento]
+Crea una base temporal, no toca proyecto.db.
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+carpeta = tempfile.mkdtemp(prefix="bench_indices_")
+os.environ["ALMACEN_RUTA"] = os.path.join(carpeta, "almacen")
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+import migraciones
+
+REPETICIONES = 50
+
+CONSULTAS = {
+    "bandeja (recibidos)": (
+        "SELECT documento.id, documento.nombre_archivo, documento.creado_en, usuario.uuid "
+        "FROM documento JOIN dek ON documento.id = dek.documento_id "
+        "JOIN usuario ON usuario.id = documento.propietario_id "
+        "WHERE dek.usuario_uuid = :uuid ORDER BY documento.creado_en DESC, documento.id DESC LIMIT 100"
+    ),
+    "acceso en descarga": "SELECT id FROM dek WHERE documento_id = :doc AND usuario_uuid = :uuid LIMIT 1",
+    "accesos de un usuario (borrado admin)": "SELECT count(*) FROM dek WHERE usuario_uuid = :uuid",
+    "documentos propios": "SELECT id FROM documento WHERE propietario_id = :prop ORDER BY creado_en DESC",
+}
+
+
+def poblar(conexion, n_usuarios, n_documentos, deks_por_doc):
+    uuids = [str(uuid.uuid4()) for _ in range(n_usuarios)]
+    conexion.execute(
+        text("INSERT INTO usuario (id, nombre, uuid, hash_contrasena, es_admin) VALUES (:id, :n, :u, 'x', 0)"),
+        [{"id": i + 1, "n": f"user{i}", "u": u} for i, u in enumerate(uuids)]
+    )
+    inicio = datetime(2024, 1, 1)
+    conexion.execute(
+        text("INSERT INTO documento (id, propietario_id, nombre_archivo, creado_en, blob_clave, tamano_bytes, sha256) "
+             "VALUES (:id, :p, :n, :c, :b, 0, :b)"),
+        [{"id": d + 1, "p": random.randint(1, n_usuarios), "n": f"doc{d}.pdf",
+          "c": inicio + timedelta(minutes=d), "b": f"{d:064x}"} for d in range(n_documentos)]
+    )
+    conexion.execute(
+        text("INSERT INTO dek (documento_id, usuario_uuid, dek_cifrada) VALUES (:d, :u, 'x')"),
+        [{"d": d + 1, "u": u} for d in range(n_documentos) for u in random.sample(uuids, deks_por_doc)]
+    )
+    conexion.commit()
+    return uuids
+
+
+def medir(conexion, uuids, n_documentos, n_usuarios):
+    resultados = {}
+    for nombre, sql in CONSULTAS.items():
+        parametros = {"uuid": random.choice(uuids), "doc": random.randint(1, n_documentos),
+                      "prop": random.randint(1, n_usuarios)}
+        plan = [fila[-1] for fila in conexion.execute(text("EXPLAIN QUERY PLAN " + sql), parametros)]
+        t0 = time.perf_counter()
+        for _ in range(REPETICIONES):
+            conexion.execute(text(sql), parametros).fetchall()
+        ms = (time.perf_counter() - t0) * 1000 / REPETICIONES
+        resultados[nombre] = (ms, plan)
+    return resultados
+
+
+def main():
+    n_usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_documentos = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    deks_por_doc = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    motor = create_engine(f"sqlite:///{os.path.join(carpeta, 'bench.db')}")
+    silencio = lambda *_: None
+    migraciones.subir(motor, hasta=3, log=silencio)
+
+    with motor.connect() as conexion:
+        print(f"Poblando: {n_usuarios} usuarios, {n_documentos} documentos, {n_documentos * deks_por_doc} DEKs...")
+        uuids = poblar(conexion, n_usuarios, n_documentos, deks_por_doc)
+        antes = medir(conexion, uuids, n_documentos, n_usuarios)
+
+    migraciones.subir(motor, hasta=4, log=silencio)
+    with motor.connect() as conexion:
+        despues = medir(conexion, uuids, n_documentos, n_usuarios)
+
+    for nombre in CONSULTAS:
+        ms_antes, plan_antes = antes[nombre]
+        ms_despues, plan_despues = despues[nombre]
+        print(f"\n=== {nombre} ===")
+        print(f"  sin índices: {ms_antes:8.3f} ms   plan: {' | '.join(plan_antes)}")
+        print(f"  con índices: {ms_despues:8.3f} ms   plan: {' | '.join(plan_despues)}")
+        print(f"  mejora: x{ms_antes / max(ms_despues, 1e-6):.1f}")
+
+
+if __name__ == "__main__":
+    main()
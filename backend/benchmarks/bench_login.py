@@ -0,0 +1,74 @@
+"""
+Benchmark: latencia de descargas mientras llega una ráfaga de logins.
+Con bcrypt en su pool de procesos las descargas no deberían notar los logins,
+y los que no caben en la cola reciben 503 rápido en vez de esperar.
+
+Uso:  python benchmarks/bench_login.py [logins] [descargas]
+(HASH_PROCESOS y HASH_COLA_MAXIMA se pasan tal cual al servidor.)
+"""
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+from collections import Counter
+
+import httpx
+
+from bench_async import arrancar_servidor, preparar, PUERTO
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[max(0, int(len(valores) * p) - 1)] * 1000
+
+
+async def descargas(cliente, cabeceras, doc, n):
+    latencias = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = await cliente.get(f"/documentos/descargar/{doc}", headers=cabeceras)
+        r.raise_for_status()
+        latencias.append(time.perf_counter() - t0)
+    return latencias
+
+
+async def logins(cliente, n):
+    async def uno():
+        t0 = time.perf_counter()
+        r = await cliente.post("/token", data={"username": "bench", "password": "Bench2025@"})
+        return r.status_code, time.perf_counter() - t0
+    return await asyncio.gather(*(uno() for _ in range(n)))
+
+
+async def medir(n_logins: int, n_descargas: int):
+    proceso = arrancar_servidor("async", tempfile.mkdtemp(prefix="bench_login_"))
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PUERTO}", timeout=120) as cliente:
+            cabeceras, doc = await preparar(cliente, 1)
+
+            base = await descargas(cliente, cabeceras, doc, n_descargas)
+            print(f"descargas sin logins : p50 {statistics.median(base) * 1000:6.1f} ms | p99 {percentil(base, 0.99):6.1f} ms")
+
+            con_logins, resultados = await asyncio.gather(
+                descargas(cliente, cabeceras, doc, n_descargas),
+                logins(cliente, n_logins)
+            )
+            print(f"descargas con logins : p50 {statistics.median(con_logins) * 1000:6.1f} ms | p99 {percentil(con_logins, 0.99):6.1f} ms")
+
+            for codigo, total in sorted(Counter(c for c, _ in resultados).items()):
+                tiempos = [t for c, t in resultados if c == codigo]
+                print(f"logins {codigo}: {total:4d} | p50 {statistics.median(tiempos) * 1000:7.1f} ms")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def main():
+    n_logins = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    n_descargas = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    asyncio.run(medir(n_logins, n_descargas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: coste en el servidor de rotar la clave de un usuario con N DEKs.
+Mide las tres fases (bajar páginas de DEKs pendientes, subir lotes re-envueltos,
+confirmar) y, como referencia para la confirmación, un UPDATE por fila.
+Antes de la rotación la única opción era PUT /usuarios/mi-clave-publica, que
+borra todo y obliga a cifrar y subir otra vez cada documento.
+
+Uso:  python benchmarks/bench_rotacion.py [N ...]
+Crea una base temporal, no toca proyecto.db. Las DEKs son texto de relleno
+del tamaño real (RSA-2048 en base64): aquí solo importa la parte de BD.
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import uuid
+
+carpeta = tempfile.mkdtemp(prefix="bench_rotacion_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(carpeta, 'bench.db')}"
+os.environ["ALMACEN_RUTA"] = os.path.join(carpeta, "almacen")
+os.environ["MODO_BD"] = "async"
+os.environ.setdefault("CODIGO_INVITACION_USUARIO", "bench")
+os.environ["MIGRAR_AL_INICIAR"] = "0"
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from sqlalchemy import insert, select, update, delete
+import migraciones
+import modelos
+import schemas
+from database import motor, SesionAsyncLocal
+from seguridad import Principal
+from main_api import (
+    crear_rotacion_clave, deks_pendientes_rotacion, subir_deks_rotacion, confirmar_rotacion_clave
+)
+
+CANTIDADES = (1000, 10000, 50000)
+PAGINA = 1000
+DEK_VIEJA, DEK_NUEVA = "A" * 344, "B" * 344
+
+
+def pem_nuevo() -> str:
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode("ascii")
+
+
+async def preparar(n: int) -> Principal:
+    usuario_uuid = str(uuid.uuid4())
+    async with SesionAsyncLocal() as db:
+        usuario_id = (await db.execute(insert(modelos.Usuario).values(
+            nombre=f"u{usuario_uuid[:8]}", uuid=usuario_uuid, hash_contrasena="x", es_admin=False,
+            secuencia_cambio=0, clave_publica="x", huella_clave="0" * 64
+        ).returning(modelos.Usuario.id))).scalar_one()
+        ids = (await db.execute(insert(modelos.Documento).returning(modelos.Documento.id), [
+            {"propietario_id": usuario_id, "nombre_archivo": f"d{i}", "blob_clave": "b", "tamano_bytes": 1, "sha256": "0" * 64}
+            for i in range(n)
+        ])).scalars().all()
+        await db.execute(insert(modelos.DEK), [
+            {"documento_id": i, "usuario_uuid": usuario_uuid, "dek_cifrada": DEK_VIEJA} for i in ids
+        ])
+        await db.commit()
+    return Principal(usuario_id, usuario_uuid, "bench", False)
+
+
+async def rotar(usuario: Principal):
+    tiempos = {"paginas": 0.0, "subida": 0.0, "confirmar": 0.0}
+    async with SesionAsyncLocal() as db:
+        rotacion = await crear_rotacion_clave(schemas.RotacionCrear(clave_publica=pem_nuevo()), db, usuario)
+
+    after = None
+    while True:
+        inicio = time.perf_counter()
+        async with SesionAsyncLocal() as db:
+            pagina = await deks_pendientes_rotacion(rotacion.id, after, PAGINA, db, usuario)
+        tiempos["paginas"] += time.perf_counter() - inicio
+        if not pagina:
+            break
+        after = pagina[-1].documento_id
+        lote = schemas.RotacionDEKsSubir(deks=[
+            schemas.DEKRotada(documento_id=d.documento_id, dek_cifrada=DEK_NUEVA) for d in pagina
+        ])
+        inicio = time.perf_counter()
+        async with SesionAsyncLocal() as db:
+            await subir_deks_rotacion(rotacion.id, lote, db, usuario)
+        tiempos["subida"] += time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    async with SesionAsyncLocal() as db:
+        info = await confirmar_rotacion_clave(rotacion.id, schemas.RotacionConfirmar(), db, usuario)
+    tiempos["confirmar"] = time.perf_counter() - inicio
+    assert info.completada and info.recibidas == info.total
+    return tiempos
+
+
+async def confirmar_por_filas(usuario: Principal) -> float:
+    """Referencia: el mismo intercambio con un UPDATE por DEK."""
+    async with SesionAsyncLocal() as db:
+        filas = (await db.execute(
+            select(modelos.DEK.id).where(modelos.DEK.usuario_uuid == usuario.uuid)
+        )).scalars().all()
+        inicio = time.perf_counter()
+        for dek_id in filas:
+            await db.execute(update(modelos.DEK).where(modelos.DEK.id == dek_id).values(dek_cifrada=DEK_VIEJA))
+        await db.commit()
+        return time.perf_counter() - inicio
+
+
+async def principal(cantidades):
+    migraciones.subir(motor, log=lambda *_: None)
+    print(f"{'DEKs':>6} | {'páginas (ms)':>12} | {'subida (ms)':>11} | {'confirmar (ms)':>14} | "
+          f"{'total (ms)':>10} | {'µs/DEK':>6} | {'UPDATE por fila (ms)':>20}")
+    for n in cantidades:
+        usuario = await preparar(n)
+        t = await rotar(usuario)
+        por_filas = await confirmar_por_filas(usuario)
+        total = sum(t.values())
+        print(f"{n:>6} | {t['paginas'] * 1000:12.1f} | {t['subida'] * 1000:11.1f} | {t['confirmar'] * 1000:14.1f} | "
+              f"{total * 1000:10.1f} | {total / n * 1e6:6.1f} | {por_filas * 1000:20.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(principal([int(x) for x in sys.argv[1:]] or CANTIDADES))
@@ -0,0 +1,107 @@
+"""
+Hash y verificación de contraseñas con bcrypt en un pool de procesos propio.
+
+bcrypt gasta ~250 ms de CPU a propósito. Si se ejecuta en el threadpool de
+Starlette, una ráfaga de logins acapara los hilos (y el GIL) que necesitan las
+descargas. Aquí corre en procesos aparte con una cola acotada: si se llena,
+la API responde 503 con Retry-After en lugar de acumular esperas.
+"""
+import os
+import math
+import time
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+import metricas
+from dotenv import load_dotenv
+load_dotenv()
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+PROCESOS_HASH = int(os.getenv("HASH_PROCESOS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Operaciones admitidas a la vez (en curso + esperando); el resto recibe 503
+COLA_MAXIMA_HASH = int(os.getenv("HASH_COLA_MAXIMA", str(PROCESOS_HASH * 8)))
+
+metrica_cola = metricas.Indicador("hash_cola_profundidad", "Operaciones bcrypt en curso o en espera")
+metrica_latencia = metricas.Histograma("hash_segundos", "Latencia de bcrypt incluida la espera en cola")
+metrica_rechazos = metricas.Contador("hash_rechazados_total", "Operaciones bcrypt rechazadas con 503 por cola llena")
+
+_executor = None
+_cerrojo_executor = threading.Lock()
+_pendientes = 0
+_media_segundos = 0.25  # Media móvil del coste de una operación, para estimar Retry-After
+
+
+def verificar_contrasena(contrasena_plana: str, hash_contrasena: str) -> bool:
+    """Comprueba si la contraseña plana coincide con el hash guardado."""
+    return pwd_context.verify(contrasena_plana, hash_contrasena)
+
+
+def obtener_hash_contrasena(contrasena: str) -> str:
+    """Genera un hash para una contraseña plana."""
+    return pwd_context.hash(contrasena)
+
+
+def _nada():
+    return None
+
+
+def _medido(funcion, *args):
+    """Se ejecuta en el proceso hijo: devuelve el resultado y los segundos de cómputo."""
+    inicio = time.perf_counter()
+    return funcion(*args), time.perf_counter() - inicio
+
+
+def iniciar():
+    """Crea el pool y arranca sus procesos para que el primer login no pague el arranque."""
+    global _executor
+    with _cerrojo_executor:
+        if _executor is None:
+            executor = ProcessPoolExecutor(PROCESOS_HASH)
+            for futuro in [executor.submit(_nada) for _ in range(PROCESOS_HASH)]:
+                futuro.result()
+            _executor = executor
+    return _executor
+
+
+def cerrar():
+    global _executor
+    with _cerrojo_executor:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+async def _ejecutar(operacion: str, funcion, *args):
+    global _pendientes, _media_segundos
+    if _pendientes >= COLA_MAXIMA_HASH:
+        metrica_rechazos.incrementar(operacion=operacion)
+        espera = math.ceil(_pendientes * _media_segundos / PROCESOS_HASH)
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado verificando credenciales. Reintenta en unos segundos.",
+            headers={"Retry-After": str(max(1, espera))}
+        )
+
+    _pendientes += 1
+    metrica_cola.fijar(_pendientes)
+    inicio = time.perf_counter()
+    try:
+        executor = _executor or await asyncio.to_thread(iniciar)
+        resultado, computo = await asyncio.wrap_future(executor.submit(_medido, funcion, *args))
+        _media_segundos = 0.9 * _media_segundos + 0.1 * computo
+        return resultado
+    finally:
+        _pendientes -= 1
+        metrica_cola.fijar(_pendientes)
+        metrica_latencia.observar(time.perf_counter() - inicio, operacion=operacion)
+
+
+async def verificar_contrasena_async(contrasena_plana: str, hash_contrasena: str) -> bool:
+    return await _ejecutar("verificar", verificar_contrasena, contrasena_plana, hash_contrasena)
+
+
+async def obtener_hash_contrasena_async(contrasena: str) -> str:
+    return await _ejecutar("hashear", obtener_hash_contrasena, contrasena)
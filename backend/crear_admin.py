@@ -1,7 +1,7 @@
 import sys
 from sqlalchemy.orm import Session
 from database import SessionLocal, motor
-import modelos, seguridad
+import modelos, seguridad, directorio
 import uuid
 import getpass 
 def crear_super_admin():
@@ -31,7 +31,10 @@ def crear_super_admin():
         nombre=nombre,
         hash_contrasena=hash_pw,
         uuid=nuevo_uuid,
-        es_admin=True 
+        es_admin=True,
+        # Mismo número de cambio que /usuarios/registrar: sin él, /usuarios?since=N
+        # no lo devolvería y los clientes con el ETag en caché seguirían con 304
+        secuencia_cambio=directorio.siguiente_secuencia_sincrona(db)
     )
     
     db.add(admin)
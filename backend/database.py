@@ -1,18 +1,216 @@
-from sqlalchemy import create_engine
+import os
+import asyncio
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+load_dotenv()
 
-# 1. Esta es la línea clave: se conecta a "proyecto.db"
-#    El archivo .db se creará en tu carpeta 'backend/'
-SQLALCHEMY_DATABASE_URL = "sqlite:///./proyecto.db"
+# 1. URL y perfil vienen del entorno (.env). Por defecto: "proyecto.db" en la carpeta actual
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./proyecto.db")
+PERFIL_BD = os.getenv("PERFIL_BD", "produccion")
 
-# 2. Crea el "motor" principal de SQLAlchemy
-motor = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False} # Necesario para SQLite
-)
+# 2. PRAGMAs que se aplican a cada conexión nueva de SQLite, según el perfil
+PERFILES_SQLITE = {
+    # Igual que antes pero esperando al lock en vez de fallar con "database is locked"
+    "desarrollo": {
+        "busy_timeout": 5000,
+    },
+    # WAL: los lectores no bloquean al escritor; NORMAL es seguro con WAL y evita un fsync por commit
+    "produccion": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.getenv("BD_BUSY_TIMEOUT_MS", "5000")),
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # Negativo = KiB -> 64 MiB por conexión
+        "temp_store": "MEMORY",
+    },
+}
 
-# 3. Crea la clase SessionLocal, que usaremos para hablar con la BD
+if PERFIL_BD not in PERFILES_SQLITE:
+    raise RuntimeError(f"PERFIL_BD desconocido: {PERFIL_BD}. Usa: {', '.join(PERFILES_SQLITE)}")
+
+
+def es_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def opciones_motor(url: str, perfil: str = PERFIL_BD) -> dict:
+    """Argumentos de create_engine adecuados para la URL (pool y connect_args)."""
+    if not es_sqlite(url):
+        return {"pool_pre_ping": True}
+
+    base_datos = make_url(url).database
+    opciones = {
+        # Necesario para SQLite: las peticiones se atienden desde varios hilos.
+        # 'timeout' es el busy handler del driver (segundos).
+        "connect_args": {"check_same_thread": False, "timeout": PERFILES_SQLITE[perfil]["busy_timeout"] / 1000},
+    }
+    if not base_datos or base_datos == ":memory:":
+        # En memoria todas las sesiones deben compartir la misma conexión
+        opciones["poolclass"] = StaticPool
+    else:
+        # Conexiones reutilizables: los PRAGMA y la caché de páginas se conservan entre peticiones
+        opciones["poolclass"] = QueuePool
+        opciones["pool_size"] = int(os.getenv("BD_POOL_TAMANO", "10"))
+        opciones["max_overflow"] = int(os.getenv("BD_POOL_EXTRA", "20"))
+        opciones["pool_timeout"] = 30
+    return opciones
+
+
+def aplicar_pragmas(conexion_dbapi, pragmas: dict):
+    cursor = conexion_dbapi.cursor()
+    try:
+        for nombre, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nombre}={valor}")
+    finally:
+        cursor.close()
+
+
+def registrar_pragmas(motor, perfil: str = PERFIL_BD):
+    """Aplica los PRAGMA del perfil en cada conexión nueva del pool."""
+    pragmas = PERFILES_SQLITE[perfil]
+
+    @event.listens_for(motor, "connect")
+    def _al_conectar(conexion_dbapi, _registro):
+        aplicar_pragmas(conexion_dbapi, pragmas)
+
+
+def crear_motor(url: str = SQLALCHEMY_DATABASE_URL, perfil: str = PERFIL_BD):
+    motor = create_engine(url, **opciones_motor(url, perfil))
+    if es_sqlite(url):
+        registrar_pragmas(motor, perfil)
+    return motor
+
+
+# 3. Crea el "motor" principal de SQLAlchemy
+motor = crear_motor()
+
+# 4. Crea la clase SessionLocal, que usaremos para hablar con la BD
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=motor)
 
-# 4. Crea la 'Base' que nuestros modelos (tablas) heredarán
-Base = declarative_base()
\ No newline at end of file
+# 5. Crea la 'Base' que nuestros modelos (tablas) heredarán
+Base = declarative_base()
+
+# 6. Modo de acceso de los endpoints (todos son async):
+#    "async" -> AsyncSession sobre aiosqlite, sin hilos.
+#    "hilos" -> Session síncrona cuyas llamadas se ejecutan en el threadpool de Starlette.
+MODO_BD = os.getenv("MODO_BD", "async")
+if MODO_BD not in ("async", "hilos"):
+    raise RuntimeError(f"MODO_BD desconocido: {MODO_BD}. Usa 'async' o 'hilos'.")
+
+
+def url_async(url: str):
+    """Cambia el driver de la URL por su equivalente asyncio."""
+    u = make_url(url)
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+    return u.set(drivername=drivers.get(u.get_backend_name(), u.drivername))
+
+
+def crear_motor_async(url: str = SQLALCHEMY_DATABASE_URL, perfil: str = PERFIL_BD):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    opciones = opciones_motor(url, perfil)
+    if opciones.get("poolclass") is QueuePool:
+        # El dialecto async usa su propio pool (AsyncAdaptedQueuePool) con el mismo tamaño
+        del opciones["poolclass"]
+    motor_async = create_async_engine(url_async(url), **opciones)
+    if es_sqlite(url):
+        registrar_pragmas(motor_async.sync_engine, perfil)
+    return motor_async
+
+
+class SesionEnHilos:
+    """
+    Expone la misma API awaitable que AsyncSession sobre una Session síncrona:
+    cada operación con E/S se ejecuta en el threadpool. Así los endpoints son
+    idénticos en los dos modos.
+
+    Antes de tocar la BD la sesión reserva un turno del pool en el event loop.
+    Sin eso, los hilos se quedan bloqueados esperando conexión mientras las
+    peticiones que tienen conexión esperan un hilo libre (interbloqueo).
+    """
+
+    def __init__(self, sesion, turnos: asyncio.Semaphore = None):
+        self.sync_session = sesion
+        self._turnos = turnos
+        self._con_turno = False
+
+    async def _en_hilo(self, funcion, *args, **kwargs):
+        if self._turnos is not None and not self._con_turno:
+            await self._turnos.acquire()
+            self._con_turno = True
+        return await run_in_threadpool(funcion, *args, **kwargs)
+
+    def add(self, objeto):
+        self.sync_session.add(objeto)
+
+    def add_all(self, objetos):
+        self.sync_session.add_all(objetos)
+
+    async def execute(self, *args, **kwargs):
+        return await self._en_hilo(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._en_hilo(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await self._en_hilo(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._en_hilo(self.sync_session.get, *args, **kwargs)
+
+    async def delete(self, objeto):
+        await self._en_hilo(self.sync_session.delete, objeto)
+
+    async def flush(self):
+        await self._en_hilo(self.sync_session.flush)
+
+    async def commit(self):
+        await self._en_hilo(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._en_hilo(self.sync_session.rollback)
+
+    async def refresh(self, objeto):
+        await self._en_hilo(self.sync_session.refresh, objeto)
+
+    async def run_sync(self, funcion, *args, **kwargs):
+        return await self._en_hilo(funcion, self.sync_session, *args, **kwargs)
+
+    async def close(self):
+        try:
+            await run_in_threadpool(self.sync_session.close)
+        finally:
+            if self._con_turno:
+                self._con_turno = False
+                self._turnos.release()
+
+
+if MODO_BD == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    motor_async = crear_motor_async()
+    SesionAsyncLocal = async_sessionmaker(motor_async, expire_on_commit=False, autoflush=False)
+else:
+    SesionHilosLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=motor)
+    # Tantos turnos como conexiones puede dar el pool (StaticPool comparte una sola y no bloquea)
+    TURNOS_POOL = (
+        asyncio.Semaphore(motor.pool.size() + motor.pool._max_overflow)
+        if isinstance(motor.pool, QueuePool) else None
+    )
+
+
+def nueva_sesion():
+    """Sesión para un endpoint: AsyncSession o SesionEnHilos según MODO_BD."""
+    if MODO_BD == "async":
+        return SesionAsyncLocal()
+    return SesionEnHilos(SesionHilosLocal(), TURNOS_POOL)
+
+
+async def get_db():
+    db = nueva_sesion()
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -0,0 +1,165 @@
+import io
+import time
+import zipfile
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from almacenamiento import AlmacenBlobs
+
+# Los paquetes no cambian una vez subidos: el cliente puede cachearlos sin revalidar
+CACHE_INMUTABLE = "private, max-age=31536000, immutable"
+
+
+def etag_de(sha256_hex: str) -> str:
+    """ETag fuerte: el hash del contenido identifica el paquete byte a byte."""
+    return f'"{sha256_hex}"'
+
+
+def coincide_if_none_match(cabecera: str, etag: str) -> bool:
+    if cabecera.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    candidatos = [c.strip() for c in cabecera.split(",")]
+    return any(c.removeprefix("W/") == etag for c in candidatos)
+
+
+def _rango_solicitado(cabecera: str, tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta 'bytes=a-b', 'bytes=a-' o 'bytes=-n'. Devuelve (inicio, fin_exclusivo).
+    Devuelve None si la cabecera no se entiende o pide varios rangos (se sirve completo).
+    Lanza ValueError si el rango es insatisfacible.
+    """
+    unidades, _, especificacion = cabecera.partition("=")
+    if unidades.strip().lower() != "bytes" or "," in especificacion:
+        return None
+    inicio_txt, guion, fin_txt = especificacion.strip().partition("-")
+    if not guion:
+        return None
+    try:
+        inicio = int(inicio_txt) if inicio_txt else None
+        fin = int(fin_txt) if fin_txt else None
+    except ValueError:
+        return None
+
+    if inicio is None:
+        # 'bytes=-n': los últimos n bytes
+        if not fin:
+            raise ValueError("Sufijo vacío")
+        return max(tamano - fin, 0), tamano
+    fin = tamano if fin is None else min(fin + 1, tamano)
+    if inicio >= tamano or fin <= inicio:
+        raise ValueError("Rango fuera del archivo")
+    return inicio, fin
+
+
+def responder_blob(
+    request: Request,
+    almacen: AlmacenBlobs,
+    clave: str,
+    tamano: int,
+    sha256_hex: str,
+    nombre_descarga: str,
+    media_type: str = "application/zip"
+) -> Response:
+    """
+    Sirve un blob con soporte de ETag/If-None-Match (304), Range (206) e If-Range.
+    En el backend de disco delega en FileResponse, que hace el Range con sendfile.
+    """
+    etag = etag_de(sha256_hex)
+    cabeceras = {
+        "ETag": etag,
+        "Cache-Control": CACHE_INMUTABLE,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{nombre_descarga}"'
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and coincide_if_none_match(if_none_match, etag):
+        return Response(status_code=304, headers={k: v for k, v in cabeceras.items() if k != "Content-Disposition"})
+
+    ruta = almacen.ruta_local(clave)
+    if ruta:
+        # FileResponse atiende Range e If-Range comparando contra nuestro ETag
+        return FileResponse(ruta, media_type=media_type, headers=cabeceras)
+
+    rango = None
+    cabecera_rango = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if cabecera_rango and (if_range is None or if_range.strip() == etag):
+        try:
+            rango = _rango_solicitado(cabecera_rango, tamano)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{tamano}", "ETag": etag})
+
+    if rango is None:
+        cabeceras["Content-Length"] = str(tamano)
+        return StreamingResponse(almacen.iterar(clave), media_type=media_type, headers=cabeceras)
+
+    inicio, fin = rango
+    cabeceras["Content-Range"] = f"bytes {inicio}-{fin - 1}/{tamano}"
+    cabeceras["Content-Length"] = str(fin - inicio)
+    return StreamingResponse(
+        almacen.iterar(clave, inicio=inicio, fin=fin),
+        status_code=206,
+        media_type=media_type,
+        headers=cabeceras
+    )
+
+
+class EntradaLote(NamedTuple):
+    nombre: str
+    clave: str
+    tamano: int
+
+
+class _Sumidero(io.RawIOBase):
+    """
+    Destino no buscable para ZipFile: acumula lo escrito hasta que el generador
+    lo entrega. Al no poder hacer seek, zipfile escribe descriptores de datos
+    (CRC y tamaños detrás de cada entrada) y nunca vuelve atrás.
+    """
+    def __init__(self):
+        self._trozos = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, datos) -> int:
+        self._trozos.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._trozos)
+        self._trozos.clear()
+        return datos
+
+
+def transmitir_zip(almacen: AlmacenBlobs, entradas: Iterable[EntradaLote],
+                   extras: Iterable[Tuple[str, bytes]] = ()) -> Iterator[bytes]:
+    """
+    Genera un ZIP sin compresión (los paquetes ya van cifrados) bloque a bloque:
+    en memoria solo hay un bloque del almacén y las cabeceras pendientes.
+    'extras' son archivos pequeños que se escriben antes (p. ej. un manifiesto).
+    """
+    return (trozo for trozo in _generar_zip(almacen, entradas, extras) if trozo)
+
+
+def _generar_zip(almacen, entradas, extras):
+    sumidero = _Sumidero()
+    fecha = time.localtime()[:6]
+    with zipfile.ZipFile(sumidero, mode="w", compression=zipfile.ZIP_STORED) as archivo:
+        for nombre, datos in extras:
+            archivo.writestr(zipfile.ZipInfo(nombre, fecha), datos)
+            yield sumidero.vaciar()
+        for entrada in entradas:
+            info = zipfile.ZipInfo(entrada.nombre, fecha)
+            # Con el tamaño anunciado zipfile decide si la entrada necesita ZIP64
+            info.file_size = entrada.tamano
+            with archivo.open(info, mode="w") as destino:
+                yield sumidero.vaciar()
+                for bloque in almacen.iterar(entrada.clave):
+                    destino.write(bloque)
+                    yield sumidero.vaciar()
+            yield sumidero.vaciar()
+    # Directorio central
+    yield sumidero.vaciar()
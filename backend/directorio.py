@@ -0,0 +1,108 @@
+import hashlib
+from typing import Optional
+from cryptography.hazmat.primitives import serialization
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import modelos
+
+# Los clientes revalidan siempre, pero solo descargan si el directorio cambió
+CACHE_DIRECTORIO = "private, no-cache"
+
+
+def _incrementar_secuencia():
+    return (
+        update(modelos.SecuenciaDirectorio)
+        .where(modelos.SecuenciaDirectorio.id == 1)
+        .values(valor=modelos.SecuenciaDirectorio.valor + 1)
+        .returning(modelos.SecuenciaDirectorio.valor)
+    )
+
+
+async def siguiente_secuencia(db: AsyncSession) -> int:
+    """
+    Reserva el siguiente número de cambio. El UPDATE bloquea la fila contador
+    hasta el commit, así que los cambios se publican en el orden de su número
+    y un lector nunca ve el N+1 sin el N.
+    """
+    return await db.scalar(_incrementar_secuencia())
+
+
+def siguiente_secuencia_sincrona(db: Session) -> int:
+    """Lo mismo con una Session síncrona (scripts de línea de comandos como crear_admin)."""
+    return db.scalar(_incrementar_secuencia())
+
+
+async def secuencia_actual(db: AsyncSession) -> int:
+    return await db.scalar(
+        select(modelos.SecuenciaDirectorio.valor).where(modelos.SecuenciaDirectorio.id == 1)
+    ) or 0
+
+
+def huella_clave_publica(pem: str) -> Optional[str]:
+    """
+    SHA-256 (hex) del DER SubjectPublicKeyInfo: no depende de saltos de línea
+    ni cabeceras del PEM. Devuelve None si el texto no es una clave pública.
+    """
+    try:
+        clave = serialization.load_pem_public_key(pem.encode())
+    except (ValueError, TypeError):
+        return None
+    der = clave.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(der).hexdigest()
+
+
+def etag_directorio(secuencia: int) -> str:
+    """
+    ETag fuerte: para una URL dada (/usuarios o /usuarios?since=N) el cuerpo
+    depende solo de la secuencia actual.
+    """
+    return f'"directorio-{secuencia}"'
+
+
+def _columnas_usuario():
+    # Solo lo que expone UsuarioVer (sin hash de contraseña ni contadores)
+    return select(
+        modelos.Usuario.nombre,
+        modelos.Usuario.uuid,
+        modelos.Usuario.clave_publica,
+        modelos.Usuario.huella_clave,
+        modelos.Usuario.es_admin
+    )
+
+
+async def usuarios_todos(db: AsyncSession) -> list:
+    return list(await db.execute(_columnas_usuario().order_by(modelos.Usuario.id)))
+
+
+async def usuarios_cambiados(db: AsyncSession, desde: int) -> list:
+    return list(await db.execute(
+        _columnas_usuario()
+        .where(modelos.Usuario.secuencia_cambio > desde)
+        .order_by(modelos.Usuario.secuencia_cambio)
+    ))
+
+
+async def uuids_eliminados(db: AsyncSession, desde: int) -> list:
+    return list(await db.scalars(
+        select(modelos.UsuarioEliminado.uuid)
+        .where(modelos.UsuarioEliminado.secuencia_cambio > desde)
+        .order_by(modelos.UsuarioEliminado.secuencia_cambio)
+    ))
+
+
+def _columnas_clave():
+    return select(
+        modelos.Usuario.uuid,
+        modelos.Usuario.nombre,
+        modelos.Usuario.clave_publica,
+        modelos.Usuario.huella_clave
+    ).where(modelos.Usuario.huella_clave.is_not(None))
+
+
+async def clave_publica_de(db: AsyncSession, usuario_uuid: str):
+    return (await db.execute(_columnas_clave().where(modelos.Usuario.uuid == usuario_uuid))).first()
+
+
+async def claves_publicas_de(db: AsyncSession, uuids: list) -> list:
+    return list(await db.execute(_columnas_clave().where(modelos.Usuario.uuid.in_(uuids))))
@@ -1,12 +1,23 @@
 from fastapi.security import OAuth2PasswordRequestForm
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Response
-from sqlalchemy.orm import Session
-import modelos, schemas, seguridad
-from database import SessionLocal, motor 
-from seguridad import obtener_usuario_actual
-from typing import List
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import or_, and_, select, delete, update, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+import modelos, schemas, seguridad, contrasenas, metricas
+from almacenamiento import obtener_almacen, BlobGuardado
+from subidas import recibir_subida_multipart, TAMANO_MAXIMO_SUBIDA
+import sesiones_subida
+import directorio
+import migraciones
+from descargas import responder_blob, coincide_if_none_match, transmitir_zip, EntradaLote
+from database import motor, get_db
+from seguridad import obtener_usuario_actual, Principal
+from typing import List, Optional, Union
 import json, os,sys
 from pyngrok import ngrok, conf
 from dotenv import load_dotenv
@@ -48,33 +59,54 @@ try:
     iniciar_tunel_seguro()
 except Exception:
     pass
-modelos.Base.metadata.create_all(bind=motor)
+# El esquema evoluciona con migraciones versionadas (ver migrar.py)
+if os.getenv("MIGRAR_AL_INICIAR", "1") == "1":
+    migraciones.subir(motor)
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    # Los procesos de bcrypt arrancan con el servidor, no en el primer login
+    await run_in_threadpool(contrasenas.iniciar)
+    yield
+    contrasenas.cerrar()
 
 app = FastAPI(
     title="API Cripto",
-    description="Backend para gestionar usuarios y documentos cifrados."
+    description="Backend para gestionar usuarios y documentos cifrados.",
+    lifespan=ciclo_de_vida
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def purgar_blobs_huerfanos(db: AsyncSession, claves):
+    """
+    Borra del almacén los blobs que ya no referencia ningún documento (el almacén
+    deduplica por contenido). Una subida del mismo contenido puede estar usando
+    el blob sin haber hecho commit; por eso el almacén respeta un margen desde
+    la última reutilización, y lo que quede lo recoge purgar_blobs.py.
+    """
+    almacen = obtener_almacen()
+    for clave in set(claves):
+        en_uso = await db.scalar(select(modelos.Documento.id).where(modelos.Documento.blob_clave == clave).limit(1))
+        if not en_uso:
+            await run_in_threadpool(almacen.purgar, clave)
 
 @app.get("/")
-def leer_raiz():
+async def leer_raiz():
     return {"mensaje": "Bienvenido a la API de Documentos Seguros"}
 
+@app.get("/metricas", include_in_schema=False)
+async def exportar_metricas():
+    """Métricas en formato Prometheus (cola y latencia de bcrypt, etc.)."""
+    return Response(content=metricas.exportar(), media_type=metricas.TIPO_CONTENIDO)
+
 @app.post(
     "/usuarios/registrar", 
     response_model=schemas.UsuarioVer, 
     status_code=status.HTTP_201_CREATED,
     summary="Registrar un nuevo usuario"
 )
-def registrar_usuario(
+async def registrar_usuario(
     usuario: schemas.UsuarioCrear, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     es_admin_nuevo = False
     
@@ -86,9 +118,9 @@ def registrar_usuario(
             detail="Código de invitación inválido."
         )
  
-    db_usuario = db.query(modelos.Usuario).filter(
+    db_usuario = await db.scalar(select(modelos.Usuario).where(
         modelos.Usuario.nombre == usuario.nombre
-    ).first()
+    ))
     
     if db_usuario:
         raise HTTPException(
@@ -97,25 +129,27 @@ def registrar_usuario(
         )
 
     print(f"--- REGISTRANDO USUARIO: {usuario.nombre} ---") 
-    hash_contrasena = seguridad.obtener_hash_contrasena(usuario.contrasena)
+    # bcrypt va al pool de procesos acotado (503 + Retry-After si está saturado)
+    hash_contrasena = await contrasenas.obtener_hash_contrasena_async(usuario.contrasena)
     nuevo_uuid = str(uuid.uuid4())
 
     nuevo_usuario_db = modelos.Usuario(
         nombre=usuario.nombre,
         hash_contrasena=hash_contrasena,
         uuid=nuevo_uuid,
-        es_admin=es_admin_nuevo
+        es_admin=es_admin_nuevo,
+        secuencia_cambio=await directorio.siguiente_secuencia(db)
     )
 
     db.add(nuevo_usuario_db)
-    db.commit()
-    db.refresh(nuevo_usuario_db)
+    await db.commit()
+    await db.refresh(nuevo_usuario_db)
 
     return nuevo_usuario_db
 
 @app.post("/token", response_model=schemas.Token, summary="Iniciar sesión y obtener un Token de Acceso")
-def login_para_token_acceso(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    usuario = db.query(modelos.Usuario).filter( modelos.Usuario.nombre == form_data.username).first()
+async def login_para_token_acceso(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    usuario = await db.scalar(select(modelos.Usuario).where(modelos.Usuario.nombre == form_data.username))
 
     if not usuario:
         raise HTTPException(status_code=401, detail="Credenciales incorrectas")
@@ -125,18 +159,28 @@ def login_para_token_acceso(form_data: OAuth2PasswordRequestForm = Depends(), db
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Cuenta bloqueada temporalmente. Intenta más tarde."
         )    
-    if not seguridad.verificar_contrasena(form_data.password, usuario.hash_contrasena):
-        usuario.intentos_fallidos += 1
-        db.commit()
-        if usuario.intentos_fallidos >= 5:
-            usuario.bloqueado_hasta = datetime.utcnow() + timedelta(minutes=15) # Bloqueo de 15 min
-            db.commit()
+    if not await contrasenas.verificar_contrasena_async(form_data.password, usuario.hash_contrasena):
+        # Incremento atómico en la BD: con logins concurrentes un "+= 1" en Python perdía intentos
+        intentos = await db.scalar(
+            update(modelos.Usuario)
+            .where(modelos.Usuario.id == usuario.id)
+            .values(intentos_fallidos=func.coalesce(modelos.Usuario.intentos_fallidos, 0) + 1)
+            .returning(modelos.Usuario.intentos_fallidos)
+        )
+        if intentos >= 5:
+            await db.execute(
+                update(modelos.Usuario)
+                .where(modelos.Usuario.id == usuario.id)
+                .values(bloqueado_hasta=datetime.utcnow() + timedelta(minutes=15)) # Bloqueo de 15 min
+            )
+            await db.commit()
             raise HTTPException(status_code=403, detail="Demasiados intentos. Cuenta bloqueada 15 min.")
-            
-        raise HTTPException(status_code=401, detail=f"Credenciales incorrectas. Intentos: {usuario.intentos_fallidos}/5")
+
+        await db.commit()
+        raise HTTPException(status_code=401, detail=f"Credenciales incorrectas. Intentos: {intentos}/5")
     usuario.intentos_fallidos = 0
     usuario.bloqueado_hasta = None
-    db.commit()
+    await db.commit()
 
     token = seguridad.crear_token_acceso( data={"sub": usuario.uuid})
 
@@ -147,137 +191,705 @@ def login_para_token_acceso(form_data: OAuth2PasswordRequestForm = Depends(), db
     response_model=schemas.UsuarioVer,
     summary="Subir/Reemplazar la clave pública (Borra archivos propios y accesos)"
 )
-def subir_clave_publica(
+async def subir_clave_publica(
     datos_clave: schemas.ClavePublicaUpdate,
-    db: Session = Depends(get_db),
-    usuario_de_token: modelos.Usuario = Depends(obtener_usuario_actual)
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(obtener_usuario_actual)
 ):
-    usuario_actual = db.merge(usuario_de_token)
+    huella = directorio.huella_clave_publica(datos_clave.clave_publica)
+    if huella is None:
+        raise HTTPException(status_code=400, detail="La clave pública no es un PEM válido.")
+
+    # Misma sesión que la autenticación: no hace falta merge
+    usuario_actual = await db.get(modelos.Usuario, principal.id)
     
     print(f"--- REGENERANDO CLAVES PARA: {usuario_actual.nombre} ---")
 
+    claves_blobs = list(await db.scalars(select(modelos.Documento.blob_clave).where(
+        modelos.Documento.propietario_id == usuario_actual.id
+    )))
 
-    num_docs = db.query(modelos.Documento).filter(
+    resultado = await db.execute(delete(modelos.Documento).where(
         modelos.Documento.propietario_id == usuario_actual.id
-    ).delete()
-    print(f" -> Eliminados {num_docs} documentos propios.")
+    ))
+    print(f" -> Eliminados {resultado.rowcount} documentos propios.")
 
-    num_deks = db.query(modelos.DEK).filter(
+    resultado = await db.execute(delete(modelos.DEK).where(
         modelos.DEK.usuario_uuid == usuario_actual.uuid
-    ).delete()
-    print(f" -> Eliminados {num_deks} accesos a documentos de terceros.")
+    ))
+    print(f" -> Eliminados {resultado.rowcount} accesos a documentos de terceros.")
     
+    # Reemplazo directo: una rotación a medias ya no tiene sentido
+    await _borrar_rotaciones(db, usuario_actual.id)
+
     usuario_actual.clave_publica = datos_clave.clave_publica
+    usuario_actual.huella_clave = huella
+    usuario_actual.secuencia_cambio = await directorio.siguiente_secuencia(db)
     
-    db.commit()
-    db.refresh(usuario_actual)
+    await db.commit()
+    seguridad.invalidar_principal(usuario_actual.uuid)
+    await db.refresh(usuario_actual)
+    await purgar_blobs_huerfanos(db, claves_blobs)
     
     return usuario_actual
 
+# --- Rotación de clave: se re-envuelven las DEKs, los paquetes cifrados no se tocan ---
+#
+# 1. POST  .../rotacion             abre la rotación con la clave pública nueva
+# 2. GET   .../rotacion/{id}/deks   páginas de DEKs aún sin re-envolver (envueltas con la clave vieja)
+# 3. PUT   .../rotacion/{id}/deks   lotes de DEKs re-envueltas con la nueva (idempotente)
+# 4. POST  .../rotacion/{id}/confirmar  intercambio atómico y publicación de la clave nueva
+# Hasta el paso 4 la clave vieja sigue publicada y en uso; lo que se comparta con el
+# usuario mientras tanto aparece como pendiente en el paso 2.
+
+async def _rotacion_propia(db: AsyncSession, rotacion_id: str, usuario_actual: Principal) -> modelos.RotacionClave:
+    rotacion = await db.scalar(select(modelos.RotacionClave).where(
+        modelos.RotacionClave.id == rotacion_id,
+        modelos.RotacionClave.usuario_id == usuario_actual.id
+    ))
+    if not rotacion:
+        raise HTTPException(status_code=404, detail="Rotación de clave no encontrada.")
+    return rotacion
+
+def _deks_sin_rotar(rotacion_id: str, usuario_uuid: str):
+    """Condición: DEKs del usuario sin versión re-envuelta en la rotación (anti-join por PK)."""
+    return and_(
+        modelos.DEK.usuario_uuid == usuario_uuid,
+        ~select(modelos.DEKRotacion.documento_id).where(
+            modelos.DEKRotacion.rotacion_id == rotacion_id,
+            modelos.DEKRotacion.documento_id == modelos.DEK.documento_id
+        ).exists()
+    )
+
+async def _rotacion_info(db: AsyncSession, rotacion_id: str, huella: str, total: int, usuario_uuid: str) -> schemas.RotacionInfo:
+    recibidas = await db.scalar(
+        select(func.count()).select_from(modelos.DEKRotacion).where(modelos.DEKRotacion.rotacion_id == rotacion_id)
+    )
+    pendientes = await db.scalar(
+        select(func.count()).select_from(modelos.DEK).where(_deks_sin_rotar(rotacion_id, usuario_uuid))
+    )
+    return schemas.RotacionInfo(id=rotacion_id, huella_nueva=huella, total=total, recibidas=recibidas, pendientes=pendientes)
+
+async def _borrar_rotaciones(db: AsyncSession, usuario_id: int):
+    ids = list(await db.scalars(select(modelos.RotacionClave.id).where(modelos.RotacionClave.usuario_id == usuario_id)))
+    if ids:
+        await db.execute(delete(modelos.DEKRotacion).where(modelos.DEKRotacion.rotacion_id.in_(ids)))
+        await db.execute(delete(modelos.RotacionClave).where(modelos.RotacionClave.id.in_(ids)))
+
+@app.post(
+    "/usuarios/mi-clave-publica/rotacion",
+    response_model=schemas.RotacionInfo,
+    status_code=status.HTTP_201_CREATED,
+    summary="Empezar a rotar la clave conservando documentos y accesos"
+)
+async def crear_rotacion_clave(
+    datos: schemas.RotacionCrear,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    huella = directorio.huella_clave_publica(datos.clave_publica)
+    if huella is None:
+        raise HTTPException(status_code=400, detail="La clave pública no es un PEM válido.")
+    actual = await db.scalar(select(modelos.Usuario.huella_clave).where(modelos.Usuario.id == usuario_actual.id))
+    if actual is None:
+        raise HTTPException(status_code=400, detail="No tienes clave pública que rotar: súbela con PUT /usuarios/mi-clave-publica.")
+    if actual == huella:
+        raise HTTPException(status_code=400, detail="La clave nueva es igual a la actual.")
+
+    # Empezar de nuevo descarta una rotación anterior a medias
+    await _borrar_rotaciones(db, usuario_actual.id)
+    total = await db.scalar(
+        select(func.count()).select_from(modelos.DEK).where(modelos.DEK.usuario_uuid == usuario_actual.uuid)
+    )
+    rotacion = modelos.RotacionClave(
+        id=str(uuid.uuid4()),
+        usuario_id=usuario_actual.id,
+        clave_publica=datos.clave_publica,
+        huella_clave=huella,
+        total=total
+    )
+    db.add(rotacion)
+    await db.commit()
+    return schemas.RotacionInfo(id=rotacion.id, huella_nueva=huella, total=total, recibidas=0, pendientes=total)
+
+@app.get(
+    "/usuarios/mi-clave-publica/rotacion/{rotacion_id}",
+    response_model=schemas.RotacionInfo,
+    summary="Estado de una rotación de clave"
+)
+async def estado_rotacion_clave(
+    rotacion_id: str,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    rotacion = await _rotacion_propia(db, rotacion_id, usuario_actual)
+    return await _rotacion_info(db, rotacion.id, rotacion.huella_clave, rotacion.total, usuario_actual.uuid)
+
+@app.get(
+    "/usuarios/mi-clave-publica/rotacion/{rotacion_id}/deks",
+    response_model=List[schemas.DEKRotada],
+    summary="DEKs aún sin re-envolver (paginado por documento_id)"
+)
+async def deks_pendientes_rotacion(
+    rotacion_id: str,
+    after_documento_id: Optional[int] = Query(None),
+    limit: int = Query(1000, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    await _rotacion_propia(db, rotacion_id, usuario_actual)
+    # Orden del índice (usuario_uuid, documento_id): cada página es un rango del índice, sin OFFSET
+    consulta = (
+        select(modelos.DEK.documento_id, modelos.DEK.dek_cifrada)
+        .where(_deks_sin_rotar(rotacion_id, usuario_actual.uuid))
+        .order_by(modelos.DEK.documento_id)
+        .limit(limit)
+    )
+    if after_documento_id is not None:
+        consulta = consulta.where(modelos.DEK.documento_id > after_documento_id)
+    return [
+        schemas.DEKRotada(documento_id=fila.documento_id, dek_cifrada=fila.dek_cifrada)
+        for fila in await db.execute(consulta)
+    ]
+
+@app.put(
+    "/usuarios/mi-clave-publica/rotacion/{rotacion_id}/deks",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Subir un lote de DEKs re-envueltas con la clave nueva"
+)
+async def subir_deks_rotacion(
+    rotacion_id: str,
+    lote: schemas.RotacionDEKsSubir,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    await _rotacion_propia(db, rotacion_id, usuario_actual)
+    ids = [dek.documento_id for dek in lote.deks]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Hay más de una DEK para el mismo documento.")
+    con_acceso = set(await db.scalars(select(modelos.DEK.documento_id).where(
+        modelos.DEK.usuario_uuid == usuario_actual.uuid,
+        modelos.DEK.documento_id.in_(ids)
+    )))
+    ajenos = sorted(set(ids) - con_acceso)
+    if ajenos:
+        raise HTTPException(status_code=400, detail=f"Documentos sin acceso ({len(ajenos)}): {ajenos[:20]}")
+
+    # Reintentar un lote lo reemplaza (borrar + insertar funciona igual en SQLite y en otros motores)
+    await db.execute(delete(modelos.DEKRotacion).where(
+        modelos.DEKRotacion.rotacion_id == rotacion_id,
+        modelos.DEKRotacion.documento_id.in_(ids)
+    ))
+    await db.execute(insert(modelos.DEKRotacion), [
+        {"rotacion_id": rotacion_id, "documento_id": dek.documento_id, "dek_cifrada": dek.dek_cifrada}
+        for dek in lote.deks
+    ])
+    await db.commit()
+    # Sin recuento de pendientes: con decenas de miles de DEKs costaría O(N) por lote (ver GET .../{id})
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.post(
+    "/usuarios/mi-clave-publica/rotacion/{rotacion_id}/confirmar",
+    response_model=schemas.RotacionInfo,
+    summary="Intercambiar todas las DEKs y publicar la clave nueva (atómico)"
+)
+async def confirmar_rotacion_clave(
+    rotacion_id: str,
+    datos: schemas.RotacionConfirmar = schemas.RotacionConfirmar(),
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    rotacion = await _rotacion_propia(db, rotacion_id, usuario_actual)
+    huella, total, clave_publica = rotacion.huella_clave, rotacion.total, rotacion.clave_publica
+
+    if datos.descartar:
+        await db.execute(delete(modelos.DEK).where(
+            modelos.DEK.usuario_uuid == usuario_actual.uuid,
+            modelos.DEK.documento_id.in_(datos.descartar)
+        ))
+    # Un solo UPDATE con subconsulta correlacionada; las DEKs re-envueltas de documentos
+    # que ya no existen o cuyo acceso se revocó entretanto simplemente no casan
+    nueva = select(modelos.DEKRotacion.dek_cifrada).where(
+        modelos.DEKRotacion.rotacion_id == rotacion_id,
+        modelos.DEKRotacion.documento_id == modelos.DEK.documento_id
+    )
+    resultado = await db.execute(
+        update(modelos.DEK)
+        .where(modelos.DEK.usuario_uuid == usuario_actual.uuid, nueva.exists())
+        .values(dek_cifrada=nueva.scalar_subquery())
+        .execution_options(synchronize_session=False)
+    )
+    # Se comprueba dentro de la misma transacción: lo compartido durante la rotación cuenta
+    pendientes = await db.scalar(
+        select(func.count()).select_from(modelos.DEK).where(_deks_sin_rotar(rotacion_id, usuario_actual.uuid))
+    )
+    if pendientes:
+        await db.rollback()
+        return await _rotacion_info(db, rotacion_id, huella, total, usuario_actual.uuid)
+
+    usuario = await db.get(modelos.Usuario, usuario_actual.id)
+    usuario.clave_publica = clave_publica
+    usuario.huella_clave = huella
+    usuario.secuencia_cambio = await directorio.siguiente_secuencia(db)
+    await _borrar_rotaciones(db, usuario_actual.id)
+    await db.commit()
+    seguridad.invalidar_principal(usuario_actual.uuid)
+    return schemas.RotacionInfo(
+        id=rotacion_id, huella_nueva=huella, total=total, recibidas=resultado.rowcount, pendientes=0, completada=True
+    )
+
+@app.delete(
+    "/usuarios/mi-clave-publica/rotacion/{rotacion_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Cancelar una rotación de clave (la clave vieja sigue vigente)"
+)
+async def cancelar_rotacion_clave(
+    rotacion_id: str,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    await _rotacion_propia(db, rotacion_id, usuario_actual)
+    await _borrar_rotaciones(db, usuario_actual.id)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 
 @app.get(
     "/usuarios",
-    response_model=List[schemas.UsuarioVer],
-    summary="Obtener una lista de todos los usuarios"
+    response_model=Union[List[schemas.UsuarioVer], schemas.DirectorioDelta],
+    summary="Directorio de usuarios (completo o incremental con ?since=)",
+    responses={304: {"description": "El directorio no cambió desde el ETag enviado"}}
+)
+async def obtener_usuarios(
+    request: Request,
+    response: Response,
+    since: Optional[int] = Query(None, ge=0, description="Cursor devuelto por la sincronización anterior"),
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    secuencia = await directorio.secuencia_actual(db)
+    cabeceras = {
+        "ETag": directorio.etag_directorio(secuencia),
+        "Cache-Control": directorio.CACHE_DIRECTORIO,
+        "X-Directorio-Cursor": str(secuencia)
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and coincide_if_none_match(if_none_match, cabeceras["ETag"]):
+        return Response(status_code=304, headers=cabeceras)
+    response.headers.update(cabeceras)
+
+    if since is None:
+        return [schemas.UsuarioVer.model_validate(fila) for fila in await directorio.usuarios_todos(db)]
+
+    if since > secuencia:
+        # Cursor de otra base de datos (o restaurada): se manda todo y el cliente reemplaza
+        return schemas.DirectorioDelta(
+            cursor=secuencia,
+            completo=True,
+            usuarios=[schemas.UsuarioVer.model_validate(fila) for fila in await directorio.usuarios_todos(db)],
+            eliminados=[]
+        )
+
+    return schemas.DirectorioDelta(
+        cursor=secuencia,
+        usuarios=[schemas.UsuarioVer.model_validate(fila) for fila in await directorio.usuarios_cambiados(db, since)],
+        eliminados=await directorio.uuids_eliminados(db, since)
+    )
+
+@app.get(
+    "/usuarios/{usuario_uuid}/clave-publica",
+    response_model=schemas.ClavePublicaInfo,
+    summary="Clave pública y huella de un usuario",
+    responses={304: {"description": "La clave no cambió (If-None-Match con la huella)"}}
 )
-def obtener_usuarios(
-    db: Session = Depends(get_db),
-    usuario_actual: modelos.Usuario = Depends(obtener_usuario_actual)
+async def obtener_clave_publica(
+    usuario_uuid: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
 ):
-    usuarios = db.query(modelos.Usuario).all()
-    return usuarios
+    fila = await directorio.clave_publica_de(db, usuario_uuid)
+    if fila is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado o sin clave pública.")
+
+    # La huella identifica la clave: el ETag vale hasta que el usuario la reemplace
+    cabeceras = {"ETag": f'"{fila.huella_clave}"', "Cache-Control": directorio.CACHE_DIRECTORIO}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and coincide_if_none_match(if_none_match, cabeceras["ETag"]):
+        return Response(status_code=304, headers=cabeceras)
+    response.headers.update(cabeceras)
+
+    return schemas.ClavePublicaInfo(
+        uuid=fila.uuid, nombre=fila.nombre, clave_publica=fila.clave_publica, huella=fila.huella_clave
+    )
+
+@app.post(
+    "/usuarios/claves-publicas",
+    response_model=schemas.ClavesPublicasRespuesta,
+    summary="Claves públicas de varios usuarios (omite las que el cliente ya tiene)"
+)
+async def obtener_claves_publicas(
+    pedido: schemas.ClavesPublicasPedir,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    pedidos = list(dict.fromkeys(pedido.uuids))
+    filas = {fila.uuid: fila for fila in await directorio.claves_publicas_de(db, pedidos)}
+
+    claves, sin_cambios, no_encontrados = [], [], []
+    for usuario_uuid in pedidos:
+        fila = filas.get(usuario_uuid)
+        if fila is None:
+            no_encontrados.append(usuario_uuid)
+        elif pedido.conocidas.get(usuario_uuid) == fila.huella_clave:
+            # Equivalente por elemento a un 304: la copia del cliente sigue siendo válida
+            sin_cambios.append(usuario_uuid)
+        else:
+            claves.append(schemas.ClavePublicaInfo(
+                uuid=fila.uuid, nombre=fila.nombre, clave_publica=fila.clave_publica, huella=fila.huella_clave
+            ))
+    return schemas.ClavesPublicasRespuesta(claves=claves, sin_cambios=sin_cambios, no_encontrados=no_encontrados)
+
+async def validar_destinatarios(db: AsyncSession, deks: List[schemas.DEKCrear]):
+    """Una sola consulta IN para comprobar que todos los destinatarios existen."""
+    uuids = {dek.usuario_uuid for dek in deks}
+    if len(uuids) != len(deks):
+        raise HTTPException(status_code=400, detail="Hay más de una DEK para el mismo destinatario.")
+    existentes = set(await db.scalars(select(modelos.Usuario.uuid).where(modelos.Usuario.uuid.in_(uuids))))
+    desconocidos = sorted(uuids - existentes)
+    if desconocidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Destinatarios desconocidos ({len(desconocidos)}): {desconocidos[:20]}"
+        )
+
+async def registrar_documento(
+    db: AsyncSession,
+    usuario_actual: Principal,
+    metadata: schemas.DocumentoCrear,
+    blob: BlobGuardado,
+    sesion_id: Optional[str] = None
+) -> schemas.DocumentoInfo:
+    """
+    Crea el Documento y todas sus DEKs en una sola transacción (un commit, un
+    INSERT múltiple para las DEKs). Si algo falla no queda nada a medias y el
+    blob ya guardado se purga.
+
+    Con 'sesion_id' la sesión de subida se borra en esa misma transacción y
+    antes de insertar: el DELETE bloquea la fila, así que de dos /completar
+    a la vez solo uno la encuentra; el otro recibe 409 y no duplica nada.
+    """
+    try:
+        if sesion_id is not None:
+            reclamada = await db.execute(delete(modelos.SesionSubida).where(
+                modelos.SesionSubida.id == sesion_id,
+                modelos.SesionSubida.propietario_id == usuario_actual.id
+            ))
+            if reclamada.rowcount != 1:
+                raise HTTPException(status_code=409, detail="La sesión de subida ya se completó o se canceló.")
+
+        await validar_destinatarios(db, metadata.deks_cifradas)
+
+        documento = (await db.execute(
+            insert(modelos.Documento)
+            .values(
+                propietario_id=usuario_actual.id,
+                nombre_archivo=metadata.nombre_original,
+                blob_clave=blob.clave,
+                tamano_bytes=blob.tamano,
+                sha256=blob.sha256
+            )
+            .returning(modelos.Documento.id, modelos.Documento.creado_en)
+        )).one()
+
+        if metadata.deks_cifradas:
+            await db.execute(insert(modelos.DEK), [
+                {"documento_id": documento.id, "usuario_uuid": dek.usuario_uuid, "dek_cifrada": dek.dek_cifrada}
+                for dek in metadata.deks_cifradas
+            ])
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await purgar_blobs_huerfanos(db, [blob.clave])
+        raise
+
+    return schemas.DocumentoInfo(
+        id=documento.id,
+        nombre_original=metadata.nombre_original,
+        creado_en=documento.creado_en,
+        propietario_uuid=usuario_actual.uuid
+    )
 
 @app.post(
     "/documentos/subir",
     response_model=schemas.DocumentoInfo,
     status_code=status.HTTP_201_CREATED,
-    summary="Subir un nuevo documento cifrado"
+    summary="Subir un nuevo documento cifrado",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": {
+                "type": "object",
+                "required": ["archivo_zip", "metadata_json"],
+                "properties": {
+                    "archivo_zip": {"type": "string", "format": "binary"},
+                    "metadata_json": {"type": "string"}
+                }
+            }}}
+        }
+    }
 )
 async def subir_documento(
-    archivo_zip: UploadFile = File(...),
-    metadata_json: str = Form(...), 
-    db: Session = Depends(get_db),
-    usuario_actual: modelos.Usuario = Depends(obtener_usuario_actual)
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
 ):
-    zip_bytes = await archivo_zip.read()
+    # El cuerpo se procesa en streaming: el ZIP va al almacén por bloques, nunca entero en RAM
+    campos, blob = await recibir_subida_multipart(request, "archivo_zip")
     
     try:
-        metadata = schemas.DocumentoCrear.model_validate_json(metadata_json)
-    except json.JSONDecodeError:
+        metadata = schemas.DocumentoCrear.model_validate_json(campos.get("metadata_json", ""))
+    except (json.JSONDecodeError, ValidationError):
+        await purgar_blobs_huerfanos(db, [blob.clave])
         raise HTTPException(status_code=400, detail="Metadata JSON mal formateada.")
-    
-    nuevo_documento = modelos.Documento(
+
+    return await registrar_documento(db, usuario_actual, metadata, blob)
+
+# --- Subida por partes (reanudable y en paralelo) ---
+
+HORAS_VIDA_SESION_SUBIDA = 24
+
+async def _sesion_info(sesion: modelos.SesionSubida) -> schemas.SesionSubidaInfo:
+    return schemas.SesionSubidaInfo(
+        id=sesion.id,
+        tamano_total=sesion.tamano_total,
+        tamano_chunk=sesion.tamano_chunk,
+        num_chunks=sesion.num_chunks,
+        chunks_recibidos=await run_in_threadpool(sesiones_subida.chunks_recibidos, sesion.id)
+    )
+
+async def _obtener_sesion_propia(db: AsyncSession, sesion_id: str, usuario_actual: Principal) -> modelos.SesionSubida:
+    sesion = await db.scalar(select(modelos.SesionSubida).where(
+        modelos.SesionSubida.id == sesion_id,
+        modelos.SesionSubida.propietario_id == usuario_actual.id
+    ))
+    if not sesion:
+        raise HTTPException(status_code=404, detail="Sesión de subida no encontrada.")
+    return sesion
+
+@app.post(
+    "/documentos/sesiones",
+    response_model=schemas.SesionSubidaInfo,
+    status_code=status.HTTP_201_CREATED,
+    summary="Abrir una sesión de subida por partes"
+)
+async def crear_sesion_subida(
+    datos: schemas.SesionSubidaCrear,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    if datos.tamano_total > TAMANO_MAXIMO_SUBIDA:
+        raise HTTPException(status_code=413, detail="El archivo supera el máximo permitido.")
+    if not sesiones_subida.TAMANO_CHUNK_MINIMO <= datos.tamano_chunk <= sesiones_subida.TAMANO_CHUNK_MAXIMO:
+        raise HTTPException(status_code=400, detail="Tamaño de parte fuera de rango.")
+
+    # Limpieza perezosa de sesiones abandonadas del mismo usuario
+    limite = datetime.utcnow() - timedelta(hours=HORAS_VIDA_SESION_SUBIDA)
+    for vieja in await db.scalars(select(modelos.SesionSubida).where(
+        modelos.SesionSubida.propietario_id == usuario_actual.id,
+        modelos.SesionSubida.creado_en < limite
+    )):
+        await run_in_threadpool(sesiones_subida.borrar, vieja.id)
+        await db.delete(vieja)
+
+    sesion = modelos.SesionSubida(
+        id=str(uuid.uuid4()),
         propietario_id=usuario_actual.id,
-        nombre_archivo=metadata.nombre_original,
-        zip_bytes=zip_bytes
+        tamano_total=datos.tamano_total,
+        tamano_chunk=datos.tamano_chunk,
+        num_chunks=-(-datos.tamano_total // datos.tamano_chunk)
     )
-    
-    db.add(nuevo_documento)
-    db.commit()
-    db.refresh(nuevo_documento) 
-    
-    for dek_info in metadata.deks_cifradas:
-        nueva_dek = modelos.DEK(
-            documento_id=nuevo_documento.id,
-            usuario_uuid=dek_info.usuario_uuid,
-            dek_cifrada=dek_info.dek_cifrada
+    db.add(sesion)
+    await db.commit()
+    await run_in_threadpool(sesiones_subida.crear_carpeta, sesion.id)
+    return await _sesion_info(sesion)
+
+@app.get(
+    "/documentos/sesiones/{sesion_id}",
+    response_model=schemas.SesionSubidaInfo,
+    summary="Estado de una sesión de subida (partes ya recibidas)"
+)
+async def estado_sesion_subida(
+    sesion_id: str,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    return await _sesion_info(await _obtener_sesion_propia(db, sesion_id, usuario_actual))
+
+@app.put(
+    "/documentos/sesiones/{sesion_id}/chunks/{numero}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Subir una parte numerada (cuerpo binario, cabecera X-Chunk-SHA256)"
+)
+async def subir_chunk(
+    sesion_id: str,
+    numero: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    sha256_chunk = request.headers.get("x-chunk-sha256")
+    if not sha256_chunk:
+        raise HTTPException(status_code=400, detail="Falta la cabecera X-Chunk-SHA256.")
+
+    sesion = await _obtener_sesion_propia(db, sesion_id, usuario_actual)
+    if not 0 <= numero < sesion.num_chunks:
+        raise HTTPException(status_code=400, detail="Número de parte fuera de rango.")
+
+    tamano = sesiones_subida.tamano_esperado(numero, sesion.tamano_total, sesion.tamano_chunk, sesion.num_chunks)
+    # La conexión vuelve al pool antes de recibir el cuerpo, que puede tardar
+    await db.close()
+    await sesiones_subida.guardar_chunk(request, sesion.id, numero, tamano, sha256_chunk)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.post(
+    "/documentos/sesiones/{sesion_id}/completar",
+    response_model=schemas.DocumentoInfo,
+    status_code=status.HTTP_201_CREATED,
+    summary="Ensamblar las partes y registrar el documento con sus DEKs"
+)
+async def completar_sesion_subida(
+    sesion_id: str,
+    metadata: schemas.SesionSubidaCompletar,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    sesion = await _obtener_sesion_propia(db, sesion_id, usuario_actual)
+
+    recibidas = await run_in_threadpool(sesiones_subida.chunks_recibidos, sesion.id)
+    faltan = set(range(sesion.num_chunks)) - set(recibidas)
+    if faltan:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Faltan {len(faltan)} partes: {sorted(faltan)[:20]}"
         )
-        db.add(nueva_dek)
-        
-    db.commit()
-    
-    respuesta = schemas.DocumentoInfo(
-        id=nuevo_documento.id,
-        nombre_original = nuevo_documento.nombre_archivo,
-        creado_en=nuevo_documento.creado_en,
-        propietario_uuid=usuario_actual.uuid
-    )
-    
+
+    try:
+        blob = await run_in_threadpool(sesiones_subida.ensamblar, sesion.id, sesion.num_chunks, obtener_almacen())
+    except FileNotFoundError:
+        # Otra petición completó o canceló la sesión y borró las partes mientras tanto
+        raise HTTPException(status_code=409, detail="La sesión de subida ya se completó o se canceló.")
+    if metadata.sha256 and metadata.sha256.lower() != blob.sha256:
+        await purgar_blobs_huerfanos(db, [blob.clave])
+        raise HTTPException(status_code=400, detail="El SHA-256 del paquete ensamblado no coincide.")
+
+    # Documento, DEKs y borrado de la sesión van en un único commit
+    respuesta = await registrar_documento(db, usuario_actual, metadata, blob, sesion_id=sesion.id)
+
+    await run_in_threadpool(sesiones_subida.borrar, sesion_id)
     return respuesta
 
+@app.delete(
+    "/documentos/sesiones/{sesion_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Cancelar una sesión de subida"
+)
+async def cancelar_sesion_subida(
+    sesion_id: str,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    sesion = await _obtener_sesion_propia(db, sesion_id, usuario_actual)
+    await db.delete(sesion)
+    await db.commit()
+    await run_in_threadpool(sesiones_subida.borrar, sesion_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @app.get(
     "/documentos/recibidos",
     response_model=List[schemas.DocumentoInfo],
-    summary="Listar documentos a los que tengo acceso"
+    summary="Listar documentos a los que tengo acceso (paginado por cursor)"
 )
-def listar_documentos_recibidos(
-    db: Session = Depends(get_db),
-    usuario_actual: modelos.Usuario = Depends(obtener_usuario_actual)
+async def listar_documentos_recibidos(
+    limit: int = Query(100, ge=1, le=1000),
+    after_created: Optional[datetime] = Query(None, description="creado_en del último documento de la página anterior"),
+    after_id: Optional[int] = Query(None, description="id del último documento de la página anterior"),
+    orden: str = Query("desc", pattern="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
 ):
-    documentos = (
-        db.query(modelos.Documento)
+    # Solo columnas de metadatos y el UUID del dueño en el mismo JOIN (sin BLOBs ni N+1)
+    consulta = (
+        select(
+            modelos.Documento.id,
+            modelos.Documento.nombre_archivo,
+            modelos.Documento.creado_en,
+            modelos.Usuario.uuid.label("propietario_uuid")
+        )
         .join(modelos.DEK, modelos.Documento.id == modelos.DEK.documento_id)
-        .filter(modelos.DEK.usuario_uuid == usuario_actual.uuid)
-        .all()
+        .join(modelos.Usuario, modelos.Usuario.id == modelos.Documento.propietario_id)
+        .where(modelos.DEK.usuario_uuid == usuario_actual.uuid)
     )
 
-    respuesta = []
-    for doc in documentos:
-        propietario_uuid = doc.propietario.uuid 
-        
-        info = schemas.DocumentoInfo(
-            id=doc.id,
-            nombre_original=doc.nombre_archivo,
-            creado_en=doc.creado_en,
-            propietario_uuid=propietario_uuid
+    # Un cursor que no se puede aplicar daría otra vez la primera página y el
+    # cliente que pagina no terminaría nunca: se rechaza en vez de ignorarlo
+    if after_created is not None and after_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="after_created requiere after_id (el cursor es el par creado_en, id)."
         )
-        respuesta.append(info)
+    if after_id is not None and after_created is None:
+        after_created = await db.scalar(select(modelos.Documento.creado_en).where(modelos.Documento.id == after_id))
+        if after_created is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="after_id no corresponde a ningún documento; envía también after_created."
+            )
 
-    return respuesta
+    # Paginación por cursor (creado_en, id): no usa OFFSET, cada página cuesta lo mismo
+    if after_id is not None:
+        if orden == "desc":
+            consulta = consulta.where(or_(
+                modelos.Documento.creado_en < after_created,
+                and_(modelos.Documento.creado_en == after_created, modelos.Documento.id < after_id)
+            ))
+        else:
+            consulta = consulta.where(or_(
+                modelos.Documento.creado_en > after_created,
+                and_(modelos.Documento.creado_en == after_created, modelos.Documento.id > after_id)
+            ))
+
+    if orden == "desc":
+        consulta = consulta.order_by(modelos.Documento.creado_en.desc(), modelos.Documento.id.desc())
+    else:
+        consulta = consulta.order_by(modelos.Documento.creado_en.asc(), modelos.Documento.id.asc())
+
+    return [
+        schemas.DocumentoInfo(
+            id=fila.id,
+            nombre_original=fila.nombre_archivo,
+            creado_en=fila.creado_en,
+            propietario_uuid=fila.propietario_uuid
+        )
+        for fila in await db.execute(consulta.limit(limit))
+    ]
 
 @app.get(
     "/documentos/descargar/{documento_id}",
     summary="Descargar el ZIP cifrado de un documento"
 )
-def descargar_documento(
+async def descargar_documento(
     documento_id: int,
-    db: Session = Depends(get_db),
-    usuario_actual: modelos.Usuario = Depends(obtener_usuario_actual)
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
 ):
-    dek_acceso = db.query(modelos.DEK).filter(
+    dek_acceso = await db.scalar(select(modelos.DEK.id).where(
         modelos.DEK.documento_id == documento_id,
         modelos.DEK.usuario_uuid == usuario_actual.uuid
-    ).first()
+    ).limit(1))
     
     if not dek_acceso:
         raise HTTPException(
@@ -285,26 +897,204 @@ def descargar_documento(
             detail="Documento no encontrado o no tienes acceso."
         )
 
-    documento = db.query(modelos.Documento).filter(
-        modelos.Documento.id == documento_id
-    ).first()
+    documento = await db.get(modelos.Documento, documento_id)
     
     if not documento:
         raise HTTPException(status_code=404, detail="Documento no encontrado.")
 
-    return Response(
-        content=documento.zip_bytes,
+    return responder_blob(
+        request,
+        obtener_almacen(),
+        documento.blob_clave,
+        documento.tamano_bytes,
+        documento.sha256,
+        f"secure_document_{documento_id}.zip"
+    )
+
+@app.post(
+    "/documentos/descargar-lote",
+    summary="Descargar varios documentos en un solo ZIP (en streaming)"
+)
+async def descargar_documentos_lote(
+    peticion: schemas.DescargaLote,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    ids = list(dict.fromkeys(peticion.ids))
+    # Una sola consulta comprueba el acceso y trae lo necesario de todos los documentos
+    filas = {
+        fila.id: fila
+        for fila in await db.execute(
+            select(
+                modelos.Documento.id,
+                modelos.Documento.nombre_archivo,
+                modelos.Documento.blob_clave,
+                modelos.Documento.tamano_bytes,
+                modelos.Documento.sha256,
+                modelos.Documento.creado_en,
+                modelos.Usuario.uuid.label("propietario_uuid")
+            )
+            .join(modelos.DEK, modelos.Documento.id == modelos.DEK.documento_id)
+            .join(modelos.Usuario, modelos.Usuario.id == modelos.Documento.propietario_id)
+            .where(modelos.DEK.usuario_uuid == usuario_actual.uuid, modelos.Documento.id.in_(ids))
+        )
+    }
+
+    faltan = [i for i in ids if i not in filas]
+    if faltan:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Documentos no encontrados o sin acceso: {faltan}"
+        )
+
+    entradas = [
+        EntradaLote(f"secure_document_{i}.zip", filas[i].blob_clave, filas[i].tamano_bytes)
+        for i in ids
+    ]
+    # El manifiesto va primero: el cliente sabe qué es cada entrada y puede verificar su hash
+    manifiesto = json.dumps([
+        {
+            "id": i,
+            "archivo": entrada.nombre,
+            "nombre_original": filas[i].nombre_archivo,
+            "propietario_uuid": filas[i].propietario_uuid,
+            "creado_en": filas[i].creado_en.isoformat() if filas[i].creado_en else None,
+            "tamano_bytes": filas[i].tamano_bytes,
+            "sha256": filas[i].sha256
+        }
+        for i, entrada in zip(ids, entradas)
+    ], ensure_ascii=False, indent=2).encode("utf-8")
+
+    # Generador síncrono: Starlette lo recorre en el threadpool, la lectura del almacén no bloquea el bucle
+    return StreamingResponse(
+        transmitir_zip(obtener_almacen(), entradas, [("manifiesto.json", manifiesto)]),
         media_type="application/zip",
         headers={
-            "Content-Disposition": f"attachment; filename=secure_document_{documento_id}.zip"
+            "Content-Disposition": 'attachment; filename="documentos.zip"',
+            "Cache-Control": "private, no-store"
         }
     )
 
+# --- Gestión de accesos (sin volver a subir el paquete) ---
+
+async def _documento_propio(db: AsyncSession, documento_id: int, usuario_actual: Principal):
+    propietario_id = await db.scalar(
+        select(modelos.Documento.propietario_id).where(modelos.Documento.id == documento_id)
+    )
+    if propietario_id is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado.")
+    if propietario_id != usuario_actual.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo el propietario puede gestionar los accesos del documento."
+        )
+
+async def _accesos_de(db: AsyncSession, documento_id: int) -> List[schemas.AccesoInfo]:
+    return [
+        schemas.AccesoInfo(usuario_uuid=fila.uuid, nombre=fila.nombre)
+        for fila in await db.execute(
+            select(modelos.Usuario.uuid, modelos.Usuario.nombre)
+            .join(modelos.DEK, modelos.DEK.usuario_uuid == modelos.Usuario.uuid)
+            .where(modelos.DEK.documento_id == documento_id)
+            .order_by(modelos.Usuario.nombre)
+        )
+    ]
+
+@app.get(
+    "/documentos/{documento_id}/dek",
+    response_model=schemas.DEKVer,
+    summary="Mi DEK envuelta para un documento"
+)
+async def obtener_mi_dek(
+    documento_id: int,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    # A quien se dio acceso después de subir el paquete no está en su cabecera: su DEK está aquí
+    dek_cifrada = await db.scalar(select(modelos.DEK.dek_cifrada).where(
+        modelos.DEK.documento_id == documento_id,
+        modelos.DEK.usuario_uuid == usuario_actual.uuid
+    ).limit(1))
+    if dek_cifrada is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado o no tienes acceso.")
+    return schemas.DEKVer(documento_id=documento_id, dek_cifrada=dek_cifrada)
+
+@app.get(
+    "/documentos/{documento_id}/accesos",
+    response_model=List[schemas.AccesoInfo],
+    summary="Quién tiene acceso a un documento propio"
+)
+async def listar_accesos(
+    documento_id: int,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    await _documento_propio(db, documento_id, usuario_actual)
+    return await _accesos_de(db, documento_id)
+
+@app.post(
+    "/documentos/{documento_id}/accesos",
+    response_model=List[schemas.AccesoInfo],
+    status_code=status.HTTP_201_CREATED,
+    summary="Dar acceso a más usuarios (solo se envían sus DEKs envueltas)"
+)
+async def agregar_accesos(
+    documento_id: int,
+    peticion: schemas.AccesosAgregar,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    await _documento_propio(db, documento_id, usuario_actual)
+    await validar_destinatarios(db, peticion.deks_cifradas)
+
+    ya_tienen = sorted(await db.scalars(select(modelos.DEK.usuario_uuid).where(
+        modelos.DEK.documento_id == documento_id,
+        modelos.DEK.usuario_uuid.in_([dek.usuario_uuid for dek in peticion.deks_cifradas])
+    )))
+    if ya_tienen:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Ya tienen acceso ({len(ya_tienen)}): {ya_tienen[:20]}"
+        )
+
+    await db.execute(insert(modelos.DEK), [
+        {"documento_id": documento_id, "usuario_uuid": dek.usuario_uuid, "dek_cifrada": dek.dek_cifrada}
+        for dek in peticion.deks_cifradas
+    ])
+    await db.commit()
+    return await _accesos_de(db, documento_id)
+
+@app.delete(
+    "/documentos/{documento_id}/accesos/{usuario_uuid}",
+    status_code=204,
+    summary="Revocar el acceso de un usuario a un documento propio"
+)
+async def revocar_acceso(
+    documento_id: int,
+    usuario_uuid: str,
+    db: AsyncSession = Depends(get_db),
+    usuario_actual: Principal = Depends(obtener_usuario_actual)
+):
+    # Borra su DEK: deja de verlo en la bandeja y de poder bajarlo. Lo que ya descargó
+    # y descifró antes no se puede recuperar; para eso habría que cifrar de nuevo.
+    await _documento_propio(db, documento_id, usuario_actual)
+    if usuario_uuid == usuario_actual.uuid:
+        raise HTTPException(status_code=400, detail="No puedes revocar tu propio acceso.")
+
+    resultado = await db.execute(delete(modelos.DEK).where(
+        modelos.DEK.documento_id == documento_id,
+        modelos.DEK.usuario_uuid == usuario_uuid
+    ))
+    if not resultado.rowcount:
+        raise HTTPException(status_code=404, detail="Ese usuario no tiene acceso al documento.")
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @app.delete("/admin/usuarios/{usuario_uuid}", status_code=204)
-def eliminar_usuario(
+async def eliminar_usuario(
     usuario_uuid: str,
-    db: Session = Depends(get_db),
-    admin_actual: modelos.Usuario = Depends(obtener_usuario_actual)
+    db: AsyncSession = Depends(get_db),
+    admin_actual: Principal = Depends(obtener_usuario_actual)
 ):
     if not admin_actual.es_admin:
         raise HTTPException(
@@ -312,12 +1102,23 @@ def eliminar_usuario(
             detail="No eres administrador."
         )
         
-    victima = db.query(modelos.Usuario).filter(modelos.Usuario.uuid == usuario_uuid).first()
+    victima = await db.scalar(select(modelos.Usuario).where(modelos.Usuario.uuid == usuario_uuid))
     if not victima:
         raise HTTPException(status_code=404, detail="Usuario no encontrado.")
         
-    db.query(modelos.DEK).filter(modelos.DEK.usuario_uuid == usuario_uuid).delete()
+    await db.execute(delete(modelos.DEK).where(modelos.DEK.usuario_uuid == usuario_uuid))
+    # Consulta explícita: en modo async no hay carga perezosa de victima.documentos
+    claves_blobs = list(await db.scalars(select(modelos.Documento.blob_clave).where(
+        modelos.Documento.propietario_id == victima.id
+    )))
+    for sesion in await db.scalars(select(modelos.SesionSubida).where(modelos.SesionSubida.propietario_id == victima.id)):
+        await run_in_threadpool(sesiones_subida.borrar, sesion.id)
+        await db.delete(sesion)
+    await _borrar_rotaciones(db, victima.id)
     
-    db.delete(victima)
-    db.commit()
-    return
\ No newline at end of file
+    db.add(modelos.UsuarioEliminado(uuid=victima.uuid, secuencia_cambio=await directorio.siguiente_secuencia(db)))
+    await db.delete(victima)
+    await db.commit()
+    seguridad.invalidar_principal(usuario_uuid)
+    await purgar_blobs_huerfanos(db, claves_blobs)
+    return
@@ -0,0 +1,104 @@
+"""
+Métricas del servidor en formato de texto de Prometheus (GET /metricas).
+Sin dependencias: contadores, indicadores e histogramas en memoria del proceso.
+"""
+import threading
+from typing import Dict, List, Tuple
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+# Segundos: cubren desde un hash en caché caliente hasta una cola saturada
+CUBETAS_SEGUNDOS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _etiquetas(etiquetas: Dict[str, str]) -> str:
+    if not etiquetas:
+        return ""
+    pares = ",".join(f'{k}="{v}"' for k, v in sorted(etiquetas.items()))
+    return "{" + pares + "}"
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self._cerrojo = threading.Lock()
+        _REGISTRO.append(self)
+
+    def lineas(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str):
+        super().__init__(nombre, ayuda)
+        self._valores: Dict[Tuple, float] = {}
+
+    def incrementar(self, cantidad: float = 1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._cerrojo:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def lineas(self) -> List[str]:
+        with self._cerrojo:
+            valores = dict(self._valores) or {(): 0}
+        return super().lineas() + [f"{self.nombre}{_etiquetas(dict(k))} {v}" for k, v in valores.items()]
+
+
+class Indicador(_Metrica):
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str):
+        super().__init__(nombre, ayuda)
+        self._valor = 0.0
+
+    def fijar(self, valor: float):
+        self._valor = valor
+
+    def lineas(self) -> List[str]:
+        return super().lineas() + [f"{self.nombre} {self._valor}"]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, cubetas=CUBETAS_SEGUNDOS):
+        super().__init__(nombre, ayuda)
+        self.cubetas = tuple(cubetas)
+        self._series: Dict[Tuple, list] = {}
+
+    def observar(self, valor: float, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._cerrojo:
+            # [conteos por cubeta..., suma, total]
+            serie = self._series.setdefault(clave, [0] * len(self.cubetas) + [0.0, 0])
+            for i, limite in enumerate(self.cubetas):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def lineas(self) -> List[str]:
+        with self._cerrojo:
+            series = {k: list(v) for k, v in self._series.items()}
+        lineas = super().lineas()
+        for clave, serie in series.items():
+            etiquetas = dict(clave)
+            for limite, conteo in zip(self.cubetas, serie):
+                lineas.append(f"{self.nombre}_bucket{_etiquetas({**etiquetas, 'le': str(limite)})} {conteo}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas({**etiquetas, 'le': '+Inf'})} {serie[-1]}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(etiquetas)} {serie[-2]}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(etiquetas)} {serie[-1]}")
+        return lineas
+
+
+_REGISTRO: List[_Metrica] = []
+
+
+def exportar() -> str:
+    """Todas las métricas registradas, listas para servir a Prometheus."""
+    return "\n".join(linea for metrica in _REGISTRO for linea in metrica.lineas()) + "\n"
@@ -0,0 +1,85 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada módulo mNNNN_*.py define VERSION, DESCRIPCION, subir(conexion) y bajar(conexion).
+Las versiones aplicadas quedan registradas en la tabla 'version_esquema'.
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+from sqlalchemy import text
+
+
+def descubrir() -> list:
+    """Módulos de migración ordenados por VERSION."""
+    modulos = []
+    for info in pkgutil.iter_modules(__path__):
+        if info.name.startswith("m") and info.name[1:5].isdigit():
+            modulos.append(importlib.import_module(f"{__name__}.{info.name}"))
+    modulos.sort(key=lambda m: m.VERSION)
+    return modulos
+
+
+def _asegurar_tabla_versiones(conexion):
+    conexion.execute(text(
+        "CREATE TABLE IF NOT EXISTS version_esquema ("
+        " version INTEGER PRIMARY KEY,"
+        " descripcion TEXT NOT NULL,"
+        " aplicada_en DATETIME NOT NULL)"
+    ))
+    conexion.commit()
+
+
+def versiones_aplicadas(conexion) -> list:
+    _asegurar_tabla_versiones(conexion)
+    return [fila[0] for fila in conexion.execute(text("SELECT version FROM version_esquema ORDER BY version"))]
+
+
+def version_actual(motor) -> int:
+    with motor.connect() as conexion:
+        aplicadas = versiones_aplicadas(conexion)
+    return aplicadas[-1] if aplicadas else 0
+
+
+def subir(motor, hasta: int = None, log=print) -> int:
+    """Aplica en orden las migraciones pendientes (hasta 'hasta', inclusive). Devuelve cuántas aplicó."""
+    aplicadas_ahora = 0
+    with motor.connect() as conexion:
+        aplicadas = set(versiones_aplicadas(conexion))
+        for migracion in descubrir():
+            if migracion.VERSION in aplicadas:
+                continue
+            if hasta is not None and migracion.VERSION > hasta:
+                break
+            log(f"Aplicando migración {migracion.VERSION:04d}: {migracion.DESCRIPCION}")
+            migracion.subir(conexion)
+            conexion.execute(
+                text("INSERT INTO version_esquema (version, descripcion, aplicada_en) VALUES (:v, :d, :f)"),
+                {"v": migracion.VERSION, "d": migracion.DESCRIPCION, "f": datetime.utcnow()}
+            )
+            conexion.commit()
+            aplicadas_ahora += 1
+    return aplicadas_ahora
+
+
+def bajar(motor, hasta: int, log=print) -> int:
+    """Revierte, de la más nueva a la más vieja, las migraciones con VERSION > 'hasta'."""
+    revertidas = 0
+    with motor.connect() as conexion:
+        aplicadas = set(versiones_aplicadas(conexion))
+        for migracion in reversed(descubrir()):
+            if migracion.VERSION <= hasta or migracion.VERSION not in aplicadas:
+                continue
+            log(f"Revirtiendo migración {migracion.VERSION:04d}: {migracion.DESCRIPCION}")
+            migracion.bajar(conexion)
+            conexion.execute(text("DELETE FROM version_esquema WHERE version = :v"), {"v": migracion.VERSION})
+            conexion.commit()
+            revertidas += 1
+    return revertidas
+
+
+def estado(motor) -> list:
+    """Lista de (version, descripcion, aplicada) para todas las migraciones conocidas."""
+    with motor.connect() as conexion:
+        aplicadas = set(versiones_aplicadas(conexion))
+    return [(m.VERSION, m.DESCRIPCION, m.VERSION in aplicadas) for m in descubrir()]
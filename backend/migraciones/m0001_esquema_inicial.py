@@ -0,0 +1,63 @@
+from sqlalchemy import text, inspect
+
+VERSION = 1
+DESCRIPCION = "Esquema inicial (usuario, documento, dek)"
+
+# DDL original de create_all. IF NOT EXISTS permite adoptar bases creadas antes de las migraciones.
+TABLAS = [
+    """CREATE TABLE IF NOT EXISTS usuario (
+        id INTEGER NOT NULL,
+        nombre VARCHAR NOT NULL,
+        uuid VARCHAR NOT NULL,
+        clave_publica TEXT,
+        hash_contrasena VARCHAR NOT NULL,
+        es_admin BOOLEAN,
+        intentos_fallidos INTEGER,
+        bloqueado_hasta DATETIME,
+        PRIMARY KEY (id),
+        UNIQUE (nombre),
+        UNIQUE (uuid)
+    )""",
+    """CREATE TABLE IF NOT EXISTS documento (
+        id INTEGER NOT NULL,
+        propietario_id INTEGER NOT NULL,
+        nombre_archivo VARCHAR NOT NULL,
+        zip_bytes BLOB NOT NULL,
+        creado_en DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(propietario_id) REFERENCES usuario (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS dek (
+        id INTEGER NOT NULL,
+        documento_id INTEGER NOT NULL,
+        usuario_uuid VARCHAR NOT NULL,
+        dek_cifrada TEXT NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(documento_id) REFERENCES documento (id)
+    )""",
+]
+
+
+# Si subir() adopta tablas que ya existían, lo anota aquí para que bajar() no las borre
+TABLA_ADOPTADAS = "esquema_adoptado"
+
+
+def subir(conexion):
+    existentes = set(inspect(conexion).get_table_names()) & {"usuario", "documento", "dek"}
+    for ddl in TABLAS:
+        conexion.execute(text(ddl))
+    if existentes:
+        conexion.execute(text(f"CREATE TABLE IF NOT EXISTS {TABLA_ADOPTADAS} (tabla VARCHAR NOT NULL, PRIMARY KEY (tabla))"))
+        for tabla in sorted(existentes):
+            conexion.execute(text(f"INSERT INTO {TABLA_ADOPTADAS} (tabla) VALUES (:t)"), {"t": tabla})
+
+
+def bajar(conexion):
+    if TABLA_ADOPTADAS in inspect(conexion).get_table_names():
+        adoptadas = [fila[0] for fila in conexion.execute(text(f"SELECT tabla FROM {TABLA_ADOPTADAS} ORDER BY tabla"))]
+        raise RuntimeError(
+            f"Las tablas {', '.join(adoptadas)} ya existían cuando se aplicó el esquema inicial; "
+            "no se borran. Si de verdad hay que vaciar la base, hazlo a mano."
+        )
+    for tabla in ("dek", "documento", "usuario"):
+        conexion.execute(text(f"DROP TABLE IF EXISTS {tabla}"))
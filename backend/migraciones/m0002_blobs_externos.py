@@ -0,0 +1,30 @@
+from sqlalchemy import text
+from almacenamiento import obtener_almacen
+from migrar_blobs import migrar_blobs, columnas_documento
+
+VERSION = 2
+DESCRIPCION = "Paquetes cifrados fuera de la BD (blob_clave, tamano_bytes, sha256)"
+
+
+def subir(conexion):
+    # Si ya se corrió migrar_blobs.py a mano, no hay nada que mover
+    migrar_blobs(conexion, obtener_almacen())
+
+
+def bajar(conexion):
+    """Devuelve los paquetes a documento.zip_bytes (los blobs se quedan en el almacén)."""
+    almacen = obtener_almacen()
+    if "zip_bytes" not in columnas_documento(conexion):
+        conexion.execute(text("ALTER TABLE documento ADD COLUMN zip_bytes BLOB"))
+
+    filas = conexion.execute(text("SELECT id, blob_clave FROM documento WHERE zip_bytes IS NULL")).fetchall()
+    for doc_id, clave in filas:
+        with almacen.abrir(clave) as f:
+            conexion.execute(
+                text("UPDATE documento SET zip_bytes = :datos WHERE id = :id"),
+                {"datos": f.read(), "id": doc_id}
+            )
+        conexion.commit()
+
+    for columna in ("blob_clave", "tamano_bytes", "sha256"):
+        conexion.execute(text(f"ALTER TABLE documento DROP COLUMN {columna}"))
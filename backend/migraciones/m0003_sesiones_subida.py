@@ -0,0 +1,23 @@
+from sqlalchemy import text
+
+VERSION = 3
+DESCRIPCION = "Tabla sesion_subida (subida por partes)"
+
+
+def subir(conexion):
+    conexion.execute(text(
+        """CREATE TABLE IF NOT EXISTS sesion_subida (
+            id VARCHAR NOT NULL,
+            propietario_id INTEGER NOT NULL,
+            tamano_total INTEGER NOT NULL,
+            tamano_chunk INTEGER NOT NULL,
+            num_chunks INTEGER NOT NULL,
+            creado_en DATETIME,
+            PRIMARY KEY (id),
+            FOREIGN KEY(propietario_id) REFERENCES usuario (id)
+        )"""
+    ))
+
+
+def bajar(conexion):
+    conexion.execute(text("DROP TABLE IF EXISTS sesion_subida"))
@@ -0,0 +1,24 @@
+from sqlalchemy import text
+
+VERSION = 4
+DESCRIPCION = "Índices en dek(usuario_uuid, documento_id), dek(documento_id) y documento(propietario_id, creado_en)"
+
+INDICES = {
+    # Bandeja, comprobación de acceso en descargas y borrado de accesos por usuario
+    "ix_dek_usuario_documento": "dek (usuario_uuid, documento_id)",
+    # Cascada de DEKs al borrar documentos
+    "ix_dek_documento": "dek (documento_id)",
+    # Documentos de un usuario (regenerar claves, borrar usuario) ordenados por fecha
+    "ix_documento_propietario_creado": "documento (propietario_id, creado_en)",
+}
+
+
+def subir(conexion):
+    for nombre, definicion in INDICES.items():
+        conexion.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON {definicion}"))
+    conexion.execute(text("ANALYZE"))
+
+
+def bajar(conexion):
+    for nombre in INDICES:
+        conexion.execute(text(f"DROP INDEX IF EXISTS {nombre}"))
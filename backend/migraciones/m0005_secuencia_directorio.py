@@ -0,0 +1,46 @@
+from sqlalchemy import text, inspect
+
+VERSION = 5
+DESCRIPCION = "Secuencia de cambios del directorio de usuarios y lápidas de usuarios borrados"
+
+
+def subir(conexion):
+    columnas = {columna["name"] for columna in inspect(conexion).get_columns("usuario")}
+    if "secuencia_cambio" not in columnas:
+        conexion.execute(text("ALTER TABLE usuario ADD COLUMN secuencia_cambio INTEGER NOT NULL DEFAULT 0"))
+    # Los usuarios existentes cuentan como cambios ya publicados, en orden de alta
+    conexion.execute(text("UPDATE usuario SET secuencia_cambio = id WHERE secuencia_cambio = 0"))
+    conexion.execute(text("CREATE INDEX IF NOT EXISTS ix_usuario_secuencia ON usuario (secuencia_cambio)"))
+
+    conexion.execute(text(
+        """CREATE TABLE IF NOT EXISTS secuencia_directorio (
+            id INTEGER NOT NULL,
+            valor INTEGER NOT NULL,
+            PRIMARY KEY (id)
+        )"""
+    ))
+    # Inserción solo si falta la fila, sin sintaxis propia de un motor
+    if conexion.execute(text("SELECT 1 FROM secuencia_directorio WHERE id = 1")).first() is None:
+        conexion.execute(text(
+            "INSERT INTO secuencia_directorio (id, valor) "
+            "SELECT 1, COALESCE(MAX(secuencia_cambio), 0) FROM usuario"
+        ))
+
+    conexion.execute(text(
+        """CREATE TABLE IF NOT EXISTS usuario_eliminado (
+            uuid VARCHAR NOT NULL,
+            secuencia_cambio INTEGER NOT NULL,
+            eliminado_en DATETIME,
+            PRIMARY KEY (uuid)
+        )"""
+    ))
+    conexion.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_usuario_eliminado_secuencia ON usuario_eliminado (secuencia_cambio)"
+    ))
+
+
+def bajar(conexion):
+    conexion.execute(text("DROP TABLE IF EXISTS usuario_eliminado"))
+    conexion.execute(text("DROP TABLE IF EXISTS secuencia_directorio"))
+    conexion.execute(text("DROP INDEX IF EXISTS ix_usuario_secuencia"))
+    conexion.execute(text("ALTER TABLE usuario DROP COLUMN secuencia_cambio"))
@@ -0,0 +1,25 @@
+from sqlalchemy import text, inspect
+from directorio import huella_clave_publica
+
+VERSION = 6
+DESCRIPCION = "Huella SHA-256 de la clave pública de cada usuario"
+
+
+def subir(conexion):
+    columnas = {columna["name"] for columna in inspect(conexion).get_columns("usuario")}
+    if "huella_clave" not in columnas:
+        conexion.execute(text("ALTER TABLE usuario ADD COLUMN huella_clave VARCHAR(64)"))
+
+    filas = conexion.execute(text(
+        "SELECT id, clave_publica FROM usuario WHERE clave_publica IS NOT NULL AND huella_clave IS NULL"
+    )).fetchall()
+    for usuario_id, clave_publica in filas:
+        # Las claves que no son PEM válido se quedan sin huella (no se pueden servir)
+        conexion.execute(
+            text("UPDATE usuario SET huella_clave = :huella WHERE id = :id"),
+            {"huella": huella_clave_publica(clave_publica), "id": usuario_id}
+        )
+
+
+def bajar(conexion):
+    conexion.execute(text("ALTER TABLE usuario DROP COLUMN huella_clave"))
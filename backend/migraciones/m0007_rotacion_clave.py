@@ -0,0 +1,35 @@
+from sqlalchemy import text
+
+VERSION = 7
+DESCRIPCION = "Rotación de clave: tablas rotacion_clave y dek_rotacion (DEKs re-envueltas pendientes de confirmar)"
+
+
+def subir(conexion):
+    conexion.execute(text(
+        """CREATE TABLE IF NOT EXISTS rotacion_clave (
+            id VARCHAR NOT NULL,
+            usuario_id INTEGER NOT NULL,
+            clave_publica TEXT NOT NULL,
+            huella_clave VARCHAR(64) NOT NULL,
+            total INTEGER NOT NULL,
+            creado_en DATETIME,
+            PRIMARY KEY (id),
+            UNIQUE (usuario_id),
+            FOREIGN KEY(usuario_id) REFERENCES usuario (id)
+        )"""
+    ))
+    # PK (rotacion_id, documento_id): la subida es idempotente y el cruce con 'dek' va por índice
+    conexion.execute(text(
+        """CREATE TABLE IF NOT EXISTS dek_rotacion (
+            rotacion_id VARCHAR NOT NULL,
+            documento_id INTEGER NOT NULL,
+            dek_cifrada TEXT NOT NULL,
+            PRIMARY KEY (rotacion_id, documento_id),
+            FOREIGN KEY(rotacion_id) REFERENCES rotacion_clave (id)
+        )"""
+    ))
+
+
+def bajar(conexion):
+    conexion.execute(text("DROP TABLE IF EXISTS dek_rotacion"))
+    conexion.execute(text("DROP TABLE IF EXISTS rotacion_clave"))
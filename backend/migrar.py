@@ -0,0 +1,42 @@
+"""
+Herramienta de migraciones del esquema.
+
+Uso:
+  python migrar.py estado             Lista las migraciones y cuáles están aplicadas
+  python migrar.py subir [VERSION]    Aplica las pendientes (hasta VERSION si se indica)
+  python migrar.py bajar VERSION      Revierte hasta dejar la base en VERSION
+"""
+import sys
+from database import motor
+import migraciones
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("estado", "subir", "bajar"):
+        print(__doc__)
+        sys.exit(1)
+
+    comando = sys.argv[1]
+    if comando == "estado":
+        for version, descripcion, aplicada in migraciones.estado(motor):
+            marca = "[x]" if aplicada else "[ ]"
+            print(f"{marca} {version:04d}  {descripcion}")
+    elif comando == "subir":
+        hasta = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        total = migraciones.subir(motor, hasta)
+        print(f"Migraciones aplicadas: {total}. Versión actual: {migraciones.version_actual(motor)}")
+    else:
+        if len(sys.argv) < 3:
+            print("Indica la versión destino. Ej: python migrar.py bajar 3")
+            sys.exit(1)
+        try:
+            total = migraciones.bajar(motor, int(sys.argv[2]))
+        except RuntimeError as e:
+            print(f"No se pudo revertir: {e}")
+            print(f"Versión actual: {migraciones.version_actual(motor)}")
+            sys.exit(1)
+        print(f"Migraciones revertidas: {total}. Versión actual: {migraciones.version_actual(motor)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Migración única: saca los paquetes cifrados de la columna documento.zip_bytes
+y los mueve al almacén de blobs configurado (ALMACEN_BACKEND).
+
+Uso:  python migrar_blobs.py
+(También la aplica la migración 0002 de 'python migrar.py subir'.)
+"""
+from sqlalchemy import text, inspect
+from database import motor
+from almacenamiento import obtener_almacen
+
+LOTE_COMMIT = 50
+
+
+def columnas_documento(conexion) -> set:
+    return {c["name"] for c in inspect(conexion).get_columns("documento")}
+
+
+def migrar_blobs(conexion, almacen, log=print) -> int:
+    """
+    Mueve cada BLOB al almacén y deja en la fila solo clave, tamaño y hash.
+    Lee los BLOBs de uno en uno para no cargar toda la tabla en memoria.
+    Devuelve el número de documentos migrados.
+    """
+    columnas = columnas_documento(conexion)
+    if "zip_bytes" not in columnas:
+        log("La tabla 'documento' ya no tiene la columna zip_bytes. Nada que migrar.")
+        return 0
+
+    for nombre, tipo in (("blob_clave", "VARCHAR"), ("tamano_bytes", "INTEGER"), ("sha256", "VARCHAR(64)")):
+        if nombre not in columnas:
+            conexion.execute(text(f"ALTER TABLE documento ADD COLUMN {nombre} {tipo}"))
+
+    ids = [fila[0] for fila in conexion.execute(
+        text("SELECT id FROM documento WHERE blob_clave IS NULL ORDER BY id")
+    )]
+    log(f"Documentos por migrar: {len(ids)}")
+
+    for i, doc_id in enumerate(ids, start=1):
+        zip_bytes = conexion.execute(
+            text("SELECT zip_bytes FROM documento WHERE id = :id"), {"id": doc_id}
+        ).scalar_one()
+        blob = almacen.guardar_bytes(zip_bytes)
+        conexion.execute(
+            text("UPDATE documento SET blob_clave = :clave, tamano_bytes = :tamano, sha256 = :sha WHERE id = :id"),
+            {"clave": blob.clave, "tamano": blob.tamano, "sha": blob.sha256, "id": doc_id}
+        )
+        if i % LOTE_COMMIT == 0:
+            conexion.commit()
+            log(f" -> {i}/{len(ids)} documentos migrados")
+
+    conexion.execute(text("ALTER TABLE documento DROP COLUMN zip_bytes"))
+    conexion.commit()
+    return len(ids)
+
+
+def main():
+    almacen = obtener_almacen()
+    print("--- MIGRACIÓN DE BLOBS FUERA DE proyecto.db ---")
+
+    with motor.connect() as conexion:
+        total = migrar_blobs(conexion, almacen)
+
+    if total:
+        # VACUUM no puede ir dentro de una transacción
+        with motor.connect().execution_options(isolation_level="AUTOCOMMIT") as conexion:
+            conexion.execute(text("VACUUM"))
+    print(f"Migración terminada. Documentos movidos: {total}")
+
+
+if __name__ == "__main__":
+    main()
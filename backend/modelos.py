@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, LargeBinary, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -11,6 +11,8 @@ class Usuario(Base):
     uuid = Column(String, unique=True, nullable=False)
     
     clave_publica = Column(Text, nullable=True)
+    # SHA-256 (hex) del DER SubjectPublicKeyInfo; se calcula al subir la clave (migración 0006)
+    huella_clave = Column(String(64), nullable=True)
     
     hash_contrasena = Column(String, nullable=False)
 
@@ -20,18 +22,50 @@ class Usuario(Base):
     intentos_fallidos = Column(Integer, default=0)
     bloqueado_hasta = Column(DateTime, nullable=True)
 
+    # Valor de secuencia_directorio en el último alta o cambio de clave (migración 0005)
+    secuencia_cambio = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_usuario_secuencia", "secuencia_cambio"),
+    )
+
+class UsuarioEliminado(Base):
+    # Lápida: permite a los clientes enterarse de bajas en la sincronización incremental
+    __tablename__ = "usuario_eliminado"
+    uuid = Column(String, primary_key=True)
+    secuencia_cambio = Column(Integer, nullable=False)
+    eliminado_en = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_usuario_eliminado_secuencia", "secuencia_cambio"),
+    )
+
+class SecuenciaDirectorio(Base):
+    # Una sola fila (id=1): contador de cambios del directorio de usuarios
+    __tablename__ = "secuencia_directorio"
+    id = Column(Integer, primary_key=True)
+    valor = Column(Integer, nullable=False)
+
 class Documento(Base):
     __tablename__ = "documento"
     id = Column(Integer, primary_key=True, autoincrement=True)
     propietario_id = Column(Integer, ForeignKey("usuario.id"), nullable=False)
     nombre_archivo = Column(String, nullable=False)
     
-    zip_bytes = Column(LargeBinary, nullable=False)
+    # El paquete cifrado vive en el almacén de blobs (ver almacenamiento.py)
+    blob_clave = Column(String, nullable=False)
+    tamano_bytes = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
     
     creado_en = Column(DateTime, default=datetime.utcnow)
     propietario = relationship("Usuario", back_populates="documentos")
     deks = relationship("DEK", back_populates="documento", cascade="all, delete")
 
+    # Índices creados por la migración 0004
+    __table_args__ = (
+        Index("ix_documento_propietario_creado", "propietario_id", "creado_en"),
+    )
+
 class DEK(Base):
     __tablename__ = "dek"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -40,4 +74,35 @@ class DEK(Base):
     
     dek_cifrada = Column(Text, nullable=False) 
     
-    documento = relationship("Documento", back_populates="deks")
\ No newline at end of file
+    documento = relationship("Documento", back_populates="deks")
+
+    __table_args__ = (
+        Index("ix_dek_usuario_documento", "usuario_uuid", "documento_id"),
+        Index("ix_dek_documento", "documento_id"),
+    )
+
+class SesionSubida(Base):
+    __tablename__ = "sesion_subida"
+    id = Column(String, primary_key=True)  # UUID de la sesión
+    propietario_id = Column(Integer, ForeignKey("usuario.id"), nullable=False)
+    tamano_total = Column(Integer, nullable=False)
+    tamano_chunk = Column(Integer, nullable=False)
+    num_chunks = Column(Integer, nullable=False)
+    creado_en = Column(DateTime, default=datetime.utcnow)
+
+class RotacionClave(Base):
+    # Una rotación abierta por usuario: la clave nueva no se publica hasta confirmar (migración 0007)
+    __tablename__ = "rotacion_clave"
+    id = Column(String, primary_key=True)  # UUID de la rotación
+    usuario_id = Column(Integer, ForeignKey("usuario.id"), nullable=False, unique=True)
+    clave_publica = Column(Text, nullable=False)
+    huella_clave = Column(String(64), nullable=False)
+    total = Column(Integer, nullable=False)  # DEKs del usuario al empezar
+    creado_en = Column(DateTime, default=datetime.utcnow)
+
+class DEKRotacion(Base):
+    # DEK re-envuelta con la clave nueva, a la espera de la confirmación
+    __tablename__ = "dek_rotacion"
+    rotacion_id = Column(String, ForeignKey("rotacion_clave.id"), primary_key=True)
+    documento_id = Column(Integer, primary_key=True)
+    dek_cifrada = Column(Text, nullable=False)
@@ -0,0 +1,38 @@
+"""
+Mantenimiento: borra del almacén los blobs que ningún documento referencia.
+
+El servidor purga al borrar documentos, pero respeta un margen
+(ALMACEN_MARGEN_PURGA_S) desde la última publicación o reutilización de cada
+blob, porque una subida del mismo contenido puede estar usándolo sin haber
+hecho commit. Lo que se quedó dentro del margen (o de subidas que fallaron) lo
+recoge este script; se puede lanzar a mano o desde cron.
+
+Uso:  python purgar_blobs.py
+"""
+from sqlalchemy import text
+from database import motor
+from almacenamiento import obtener_almacen
+
+
+def purgar_blobs(conexion, almacen, log=print) -> int:
+    """Devuelve el número de blobs borrados."""
+    borrados = 0
+    for clave in almacen.listar():
+        en_uso = conexion.execute(
+            text("SELECT 1 FROM documento WHERE blob_clave = :clave LIMIT 1"), {"clave": clave}
+        ).first()
+        if not en_uso and almacen.purgar(clave):
+            borrados += 1
+            log(f" -> {clave}")
+    return borrados
+
+
+def main():
+    print("--- PURGA DE BLOBS SIN DOCUMENTO ---")
+    with motor.connect() as conexion:
+        total = purgar_blobs(conexion, obtener_almacen())
+    print(f"Purga terminada. Blobs borrados: {total}")
+
+
+if __name__ == "__main__":
+    main()
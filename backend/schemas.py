@@ -1,6 +1,6 @@
 import re
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class UsuarioBase(BaseModel):
@@ -28,11 +28,36 @@ class UsuarioVer(BaseModel):
     nombre: str
     uuid: str
     clave_publica: Optional[str] = None
+    huella_clave: Optional[str] = None
     es_admin: bool
 
     class Config:
         from_attributes = True
 
+class DirectorioDelta(BaseModel):
+    # Cursor a enviar como ?since= en la próxima sincronización
+    cursor: int
+    # True: 'usuarios' es el directorio entero y la copia local debe reemplazarse
+    completo: bool = False
+    usuarios: List[UsuarioVer]
+    eliminados: List[str]
+
+class ClavePublicaInfo(BaseModel):
+    uuid: str
+    nombre: str
+    clave_publica: str
+    huella: str
+
+class ClavesPublicasPedir(BaseModel):
+    uuids: List[str] = Field(..., min_length=1, max_length=1000)
+    # uuid -> huella que el cliente ya tiene; esas claves no se reenvían si no cambiaron
+    conocidas: Dict[str, str] = {}
+
+class ClavesPublicasRespuesta(BaseModel):
+    claves: List[ClavePublicaInfo]
+    sin_cambios: List[str]
+    no_encontrados: List[str]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -58,4 +83,57 @@ class DocumentoInfo(BaseModel):
     propietario_uuid: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DEKVer(BaseModel):
+    documento_id: int
+    dek_cifrada: str
+
+class AccesoInfo(BaseModel):
+    usuario_uuid: str
+    nombre: str
+
+class AccesosAgregar(BaseModel):
+    # DEK del documento envuelta de nuevo por el propietario para cada destinatario nuevo
+    deks_cifradas: List[DEKCrear] = Field(..., min_length=1, max_length=1000)
+
+class RotacionCrear(BaseModel):
+    clave_publica: str
+
+class RotacionInfo(BaseModel):
+    id: str
+    huella_nueva: str
+    total: int
+    # DEKs ya re-envueltas y DEKs del usuario que aún no lo están
+    recibidas: int
+    pendientes: int
+    completada: bool = False
+
+class DEKRotada(BaseModel):
+    documento_id: int
+    dek_cifrada: str
+
+class RotacionDEKsSubir(BaseModel):
+    deks: List[DEKRotada] = Field(..., min_length=1, max_length=5000)
+
+class RotacionConfirmar(BaseModel):
+    # Documentos cuya DEK no se pudo abrir con la clave vieja: se pierde el acceso a ellos
+    descartar: List[int] = []
+
+class DescargaLote(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class SesionSubidaCrear(BaseModel):
+    tamano_total: int = Field(..., gt=0)
+    tamano_chunk: int = Field(8 * 1024 * 1024, gt=0)
+
+class SesionSubidaInfo(BaseModel):
+    id: str
+    tamano_total: int
+    tamano_chunk: int
+    num_chunks: int
+    chunks_recibidos: List[int]
+
+class SesionSubidaCompletar(DocumentoCrear):
+    # Hash del paquete completo; si se envía, el servidor lo comprueba al ensamblar
+    sha256: Optional[str] = None
@@ -1,28 +1,22 @@
 import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, NamedTuple
 
 # Importaciones de FastAPI y BD
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import modelos # Importa tus modelos
-from database import SessionLocal # Importa la sesión de BD
-from passlib.context import CryptContext
+from database import get_db # La misma sesión que usa el endpoint (FastAPI la cachea por petición)
+import metricas
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session # <--- ¡AÑADE ESTA LÍNEA!
+from sqlalchemy import select
 from dotenv import load_dotenv
 load_dotenv() 
 
-# --- 1. Configuración de Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verificar_contrasena(contrasena_plana: str, hash_contrasena: str) -> bool:
-    """Comprueba si la contraseña plana coincide con el hash guardado."""
-    return pwd_context.verify(contrasena_plana, hash_contrasena)
-
-def obtener_hash_contrasena(contrasena: str) -> str:
-    """Genera un hash para una contraseña plana."""
-    return pwd_context.hash(contrasena)
+# --- 1. Hashing: bcrypt vive en contrasenas.py (pool de procesos propio) ---
+from contrasenas import verificar_contrasena, obtener_hash_contrasena
  
 base_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.join(base_dir, ".env")
@@ -67,25 +61,67 @@ def verificar_token(token: str) -> Optional[str]:
 # en la cabecera "Authorization: Bearer <token>"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_db_para_seguridad():
-    """Dependencia interna para que esta función acceda a la BD."""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class Principal(NamedTuple):
+    """Copia inmutable de los datos del usuario autenticado que usan los endpoints."""
+    id: int
+    uuid: str
+    nombre: str
+    es_admin: bool
+
+
+# --- 4. Caché de principales (TTL + LRU) ---
+# Evita el SELECT de Usuario en cada petición autenticada. Se invalida al borrar
+# un usuario o cambiar su clave; el TTL acota lo que tarda en verse un cambio
+# hecho desde otro proceso (otro worker, crear_admin.py).
+PRINCIPALES_TTL = float(os.getenv("PRINCIPALES_CACHE_TTL_S", "60"))
+PRINCIPALES_MAXIMO = int(os.getenv("PRINCIPALES_CACHE_MAX", "1024"))
+
+_principales: "OrderedDict[str, tuple]" = OrderedDict()
+# Sube con cada invalidación: una consulta que empezó antes no puede volver a cachear datos viejos
+_generacion = 0
+
+metrica_cache = metricas.Contador("principales_cache_total", "Búsquedas del usuario autenticado por resultado")
+
+
+def _principal_cacheado(uuid_usuario: str) -> Optional[Principal]:
+    entrada = _principales.get(uuid_usuario)
+    if entrada is None:
+        return None
+    principal, caduca = entrada
+    if caduca < time.monotonic():
+        del _principales[uuid_usuario]
+        return None
+    _principales.move_to_end(uuid_usuario)
+    return principal
+
+
+def _cachear_principal(principal: Principal, generacion: int):
+    if generacion != _generacion:
+        return
+    _principales[principal.uuid] = (principal, time.monotonic() + PRINCIPALES_TTL)
+    _principales.move_to_end(principal.uuid)
+    while len(_principales) > PRINCIPALES_MAXIMO:
+        _principales.popitem(last=False)
+
+
+def invalidar_principal(uuid_usuario: str):
+    """Llamar tras cambiar o borrar un usuario (después del commit)."""
+    global _generacion
+    _generacion += 1
+    _principales.pop(uuid_usuario, None)
+
 
 # ¡Y AHORA SÍ PUEDES USAR 'oauth2_scheme' EN LA FUNCIÓN!
-def obtener_usuario_actual(
+async def obtener_usuario_actual(
     token: str = Depends(oauth2_scheme), 
-    db: Session = Depends(get_db_para_seguridad)
-):
+    db = Depends(get_db)
+) -> Principal:
     """
     Dependencia de FastAPI:
     1. Toma el token de la cabecera.
     2. Lo verifica.
-    3. Busca al usuario en la BD.
-    4. Devuelve el objeto 'usuario' completo.
+    3. Busca al usuario en la caché o, si no está, en la BD (misma sesión que el endpoint).
+    4. Devuelve un 'Principal' con id, uuid, nombre y es_admin.
     """
     credenciales_excepcion = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -96,9 +132,21 @@ def obtener_usuario_actual(
     uuid_usuario = verificar_token(token)
     if uuid_usuario is None:
         raise credenciales_excepcion
-        
-    usuario = db.query(modelos.Usuario).filter(modelos.Usuario.uuid == uuid_usuario).first()
-    if usuario is None:
+
+    principal = _principal_cacheado(uuid_usuario)
+    if principal is not None:
+        metrica_cache.incrementar(resultado="acierto")
+        return principal
+    metrica_cache.incrementar(resultado="fallo")
+
+    generacion = _generacion
+    fila = (await db.execute(
+        select(modelos.Usuario.id, modelos.Usuario.uuid, modelos.Usuario.nombre, modelos.Usuario.es_admin)
+        .where(modelos.Usuario.uuid == uuid_usuario)
+    )).first()
+    if fila is None:
         raise credenciales_excepcion
-    
-    return usuario
\ No newline at end of file
+
+    principal = Principal(fila.id, fila.uuid, fila.nombre, bool(fila.es_admin))
+    _cachear_principal(principal, generacion)
+    return principal
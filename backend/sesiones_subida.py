@@ -0,0 +1,96 @@
+import os
+import uuid
+import shutil
+import hashlib
+from typing import List
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from almacenamiento import AlmacenBlobs, BlobGuardado, TAMANO_BLOQUE
+from dotenv import load_dotenv
+load_dotenv()
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Las partes se quedan en disco local hasta que se completa la sesión
+RUTA_SESIONES = os.path.abspath(os.getenv("SUBIDAS_RUTA", os.path.join(base_dir, "subidas_pendientes")))
+
+TAMANO_CHUNK_MINIMO = 256 * 1024
+TAMANO_CHUNK_MAXIMO = 64 * 1024 * 1024
+
+
+def _carpeta(sesion_id: str) -> str:
+    return os.path.join(RUTA_SESIONES, sesion_id)
+
+
+def _ruta_chunk(sesion_id: str, numero: int) -> str:
+    return os.path.join(_carpeta(sesion_id), f"{numero:06d}.part")
+
+
+def tamano_esperado(numero: int, tamano_total: int, tamano_chunk: int, num_chunks: int) -> int:
+    if numero < num_chunks - 1:
+        return tamano_chunk
+    return tamano_total - tamano_chunk * (num_chunks - 1)
+
+
+def crear_carpeta(sesion_id: str):
+    os.makedirs(_carpeta(sesion_id), exist_ok=True)
+
+
+def chunks_recibidos(sesion_id: str) -> List[int]:
+    """Partes ya verificadas (solo existen con nombre final tras validar su hash)."""
+    carpeta = _carpeta(sesion_id)
+    if not os.path.isdir(carpeta):
+        return []
+    return sorted(int(n[:-5]) for n in os.listdir(carpeta) if n.endswith(".part"))
+
+
+def borrar(sesion_id: str):
+    shutil.rmtree(_carpeta(sesion_id), ignore_errors=True)
+
+
+async def guardar_chunk(request: Request, sesion_id: str, numero: int, tamano: int, sha256_esperado: str):
+    """
+    Vuelca el cuerpo de la petición a disco por bloques, comprobando tamaño y
+    SHA-256. La parte solo queda visible (rename atómico) si el hash coincide,
+    así que subir dos veces la misma parte o en paralelo es seguro.
+    """
+    destino = _ruta_chunk(sesion_id, numero)
+    temporal = f"{destino}.{uuid.uuid4().hex}.tmp"
+    h = hashlib.sha256()
+    recibido = 0
+    pendiente = bytearray()
+
+    archivo = await run_in_threadpool(open, temporal, "wb")
+    try:
+        async for trozo in request.stream():
+            recibido += len(trozo)
+            if recibido > tamano:
+                raise HTTPException(status_code=413, detail=f"La parte {numero} supera {tamano} bytes.")
+            h.update(trozo)
+            pendiente += trozo
+            if len(pendiente) >= TAMANO_BLOQUE:
+                await run_in_threadpool(archivo.write, bytes(pendiente))
+                pendiente.clear()
+        await run_in_threadpool(archivo.write, bytes(pendiente))
+        await run_in_threadpool(archivo.close)
+
+        if recibido != tamano:
+            raise HTTPException(status_code=400, detail=f"La parte {numero} debe medir {tamano} bytes (llegaron {recibido}).")
+        if h.hexdigest() != sha256_esperado.lower():
+            raise HTTPException(status_code=400, detail=f"El SHA-256 de la parte {numero} no coincide.")
+        os.replace(temporal, destino)
+    finally:
+        if not archivo.closed:
+            archivo.close()
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def ensamblar(sesion_id: str, num_chunks: int, almacen: AlmacenBlobs) -> BlobGuardado:
+    """Concatena las partes en el almacén leyendo por bloques (código bloqueante)."""
+    with almacen.nuevo_escritor() as escritor:
+        for numero in range(num_chunks):
+            with open(_ruta_chunk(sesion_id, numero), "rb") as f:
+                while bloque := f.read(TAMANO_BLOQUE):
+                    escritor.escribir(bloque)
+        return escritor.confirmar()
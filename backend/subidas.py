@@ -0,0 +1,134 @@
+import os
+from typing import Dict, Tuple
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import FormParserError
+from almacenamiento import obtener_almacen, BlobGuardado, TAMANO_BLOQUE
+from dotenv import load_dotenv
+load_dotenv()
+
+# Límite del paquete cifrado, comprobado mientras llega (no al final)
+TAMANO_MAXIMO_SUBIDA = int(os.getenv("TAMANO_MAXIMO_SUBIDA_MB", "512")) * 1024 * 1024
+# Límite para los campos de texto del formulario (metadata_json con las DEKs)
+TAMANO_MAXIMO_CAMPOS = 8 * 1024 * 1024
+
+
+def _error_tamano():
+    return HTTPException(
+        status_code=413,
+        detail=f"El archivo supera el máximo permitido ({TAMANO_MAXIMO_SUBIDA // (1024 * 1024)} MB)."
+    )
+
+
+class _ReceptorPartes:
+    """Callbacks del parser multipart: separa los campos de texto del archivo."""
+
+    def __init__(self, campo_archivo: str):
+        self.campo_archivo = campo_archivo
+        self.campos: Dict[str, bytearray] = {}
+        self.pendiente = bytearray()  # Datos del archivo aún no escritos al almacén
+        self.recibido_archivo = 0
+        self.tamano_campos = 0
+        self.archivo_visto = False
+        self._cabecera = b""
+        self._valor = b""
+        self._cabeceras: Dict[bytes, bytes] = {}
+        self._parte_actual = None
+        self._es_archivo = False
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+        }
+
+    def on_part_begin(self):
+        self._cabeceras = {}
+        self._parte_actual = None
+        self._es_archivo = False
+
+    def on_header_field(self, datos: bytes, inicio: int, fin: int):
+        self._cabecera += datos[inicio:fin]
+
+    def on_header_value(self, datos: bytes, inicio: int, fin: int):
+        self._valor += datos[inicio:fin]
+
+    def on_header_end(self):
+        self._cabeceras[self._cabecera.lower()] = self._valor
+        self._cabecera = b""
+        self._valor = b""
+
+    def on_headers_finished(self):
+        _, opciones = parse_options_header(self._cabeceras.get(b"content-disposition", b""))
+        nombre = opciones.get(b"name", b"").decode("latin-1")
+        self._parte_actual = nombre
+        self._es_archivo = nombre == self.campo_archivo
+        if self._es_archivo:
+            if self.archivo_visto:
+                raise HTTPException(status_code=400, detail="Solo se admite un archivo por subida.")
+            self.archivo_visto = True
+        else:
+            self.campos.setdefault(nombre, bytearray())
+
+    def on_part_data(self, datos: bytes, inicio: int, fin: int):
+        trozo = datos[inicio:fin]
+        if self._es_archivo:
+            self.recibido_archivo += len(trozo)
+            if self.recibido_archivo > TAMANO_MAXIMO_SUBIDA:
+                raise _error_tamano()
+            self.pendiente += trozo
+        else:
+            self.tamano_campos += len(trozo)
+            if self.tamano_campos > TAMANO_MAXIMO_CAMPOS:
+                raise HTTPException(status_code=413, detail="Campos del formulario demasiado grandes.")
+            self.campos[self._parte_actual] += trozo
+
+
+async def recibir_subida_multipart(request: Request, campo_archivo: str) -> Tuple[Dict[str, str], BlobGuardado]:
+    """
+    Lee un multipart/form-data directamente del socket y vuelca el archivo al
+    almacén en bloques de tamaño fijo, calculando el hash sobre la marcha.
+    La memoria usada es O(TAMANO_BLOQUE) sin importar el tamaño del archivo.
+    Devuelve los campos de texto y el blob ya guardado.
+    """
+    tipo, opciones = parse_options_header(request.headers.get("content-type", ""))
+    if tipo != b"multipart/form-data" or b"boundary" not in opciones:
+        raise HTTPException(status_code=400, detail="Se esperaba multipart/form-data.")
+
+    longitud = request.headers.get("content-length")
+    if longitud and longitud.isdigit() and int(longitud) > TAMANO_MAXIMO_SUBIDA + TAMANO_MAXIMO_CAMPOS:
+        raise _error_tamano()
+
+    receptor = _ReceptorPartes(campo_archivo)
+    parser = MultipartParser(opciones[b"boundary"], receptor.callbacks())
+    escritor = await run_in_threadpool(obtener_almacen().nuevo_escritor)
+
+    try:
+        async for trozo in request.stream():
+            parser.write(trozo)
+            while len(receptor.pendiente) >= TAMANO_BLOQUE:
+                bloque = bytes(receptor.pendiente[:TAMANO_BLOQUE])
+                del receptor.pendiente[:TAMANO_BLOQUE]
+                await run_in_threadpool(escritor.escribir, bloque)
+        parser.finalize()
+
+        if not receptor.archivo_visto:
+            raise HTTPException(status_code=422, detail=f"Falta el archivo '{campo_archivo}'.")
+        if receptor.pendiente:
+            await run_in_threadpool(escritor.escribir, bytes(receptor.pendiente))
+            receptor.pendiente.clear()
+        blob = await run_in_threadpool(escritor.confirmar)
+    except FormParserError:
+        await run_in_threadpool(escritor.descartar)
+        raise HTTPException(status_code=400, detail="Cuerpo multipart mal formado.")
+    except BaseException:
+        await run_in_threadpool(escritor.descartar)
+        raise
+
+    campos = {nombre: bytes(valor).decode("utf-8") for nombre, valor in receptor.campos.items()}
+    return campos, blob
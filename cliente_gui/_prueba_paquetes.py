@@ -0,0 +1,117 @@
+"""
+Pruebas sin servidor de la creación y apertura de paquetes.
+
+  mismo nombre: dos archivos 'informe.pdf' de carpetas distintas se cifran
+                mientras el anterior aún se está "subiendo"; ningún paquete
+                pisa ni borra al otro.
+  bomba       : un segmento comprimido que se expande a cientos de MB no hace
+                que una llamada al descompresor devuelva más de SALIDA_MAXIMA.
+
+Uso:  python _prueba_paquetes.py
+"""
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import compresion
+import logica_claves
+import logica_cifrado
+import logica_descifrado
+
+PASSWORD = "prueba"
+TAMANO_BOMBA = 256 * 1024 * 1024
+
+
+def prueba_mismo_nombre(carpeta: str):
+    print("Probando dos archivos con el mismo nombre...")
+    publica, ruta_privada = logica_claves.generar_par_claves(PASSWORD, carpeta, "prueba")
+    yo = str(uuid.uuid4())
+    receptores = [{"uuid": yo, "clave_publica": publica}]
+
+    originales = []
+    for sub in ("a", "b"):
+        os.makedirs(os.path.join(carpeta, sub))
+        ruta = os.path.join(carpeta, sub, "informe.pdf")
+        with open(ruta, "wb") as f:
+            f.write(f"informe de {sub}\n".encode() * 50000 + os.urandom(1000))
+        originales.append(ruta)
+
+    def subir(ruta_original, ruta_paquete):
+        # Como la subida real: el paquete se lee después de que empiece el siguiente cifrado
+        time.sleep(0.5)
+        destino = ruta_paquete + ".descifrado"
+        logica_descifrado.descifrar_a_archivo(ruta_paquete, destino, yo, ruta_privada, PASSWORD)
+        with open(destino, "rb") as a, open(ruta_original, "rb") as b:
+            assert a.read() == b.read(), f"El paquete de {ruta_original} quedó pisado"
+        os.remove(destino)
+
+    subidas = []
+    with ThreadPoolExecutor() as hilos:
+        for ruta_original in originales:
+            ruta_paquete, _ = logica_cifrado.crear_paquete_cifrado(ruta_original, ruta_privada, PASSWORD, yo, receptores)
+            subidas.append((ruta_paquete, hilos.submit(subir, ruta_original, ruta_paquete)))
+        for _, futuro in subidas:
+            futuro.result()
+
+    rutas = [ruta for ruta, _ in subidas]
+    assert len(set(rutas)) == 2, "Los dos paquetes comparten ruta"
+    for ruta in rutas:
+        os.remove(ruta)
+    print("  OK")
+
+
+class _Contador:
+    def __init__(self):
+        self.total = 0
+        self.maximo = 0
+        self.resumen = hashlib.sha256()
+
+    def write(self, datos):
+        self.total += len(datos)
+        self.maximo = max(self.maximo, len(datos))
+        self.resumen.update(datos)
+
+
+def _bomba(algoritmo: str) -> bytes:
+    if algoritmo == compresion.ZSTD:
+        compresor = compresion.zstandard.ZstdCompressor(level=19).compressobj()
+    else:
+        compresor = zlib.compressobj(9)
+    bloque = bytes(1024 * 1024)
+    partes = [compresor.compress(bloque) for _ in range(TAMANO_BOMBA // len(bloque))]
+    return b"".join(partes) + compresor.flush()
+
+
+def prueba_bomba():
+    algoritmos = [compresion.DEFLATE] + ([compresion.ZSTD] if compresion.zstandard else [])
+    esperado = hashlib.sha256(bytes(TAMANO_BOMBA)).hexdigest()
+    for algoritmo in algoritmos:
+        print(f"Probando bomba {algoritmo}...")
+        bomba = _bomba(algoritmo)
+        destino = _Contador()
+        escritor = compresion.EscritorDescomprimido(destino, algoritmo)
+        escritor.write(bomba)
+        escritor.finalizar()
+        print(f"  {len(bomba)} bytes -> {destino.total} bytes, máximo por llamada {destino.maximo}")
+        assert destino.total == TAMANO_BOMBA and destino.resumen.hexdigest() == esperado
+        assert destino.maximo <= compresion.SALIDA_MAXIMA, "Una llamada devolvió más de SALIDA_MAXIMA"
+        print("  OK")
+
+
+def main():
+    carpeta = tempfile.mkdtemp(prefix="prueba_paquetes_")
+    try:
+        prueba_mismo_nombre(carpeta)
+        prueba_bomba()
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+    print("--- TODAS LAS PRUEBAS OK ---")
+
+
+if __name__ == "__main__":
+    main()
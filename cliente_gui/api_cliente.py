@@ -1,9 +1,18 @@
-import requests
 import json
 import os
 import sys
+import hashlib
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+import cliente_http
+from cliente_http import ErrorAPI
 
-def cargar_url_api():
+def cargar_config() -> dict:
     if getattr(sys, 'frozen', False):
         application_path = os.path.dirname(sys.executable)
     else:
@@ -14,201 +23,427 @@ def cargar_url_api():
     if os.path.exists(config_path):
         try:
             with open(config_path, 'r') as f:
-                config = json.load(f)
-                return config.get("api_url", "http://127.0.0.1:8000")
+                return json.load(f)
         except Exception:
-            return "http://127.0.0.1:8000"
+            return {}
     else:
-        url_default = "http://127.0.0.1:8000"
         try:
             with open(config_path, 'w') as f:
-                json.dump({"api_url": url_default}, f, indent=4)
+                json.dump({"api_url": "http://127.0.0.1:8000"}, f, indent=4)
         except:
             pass
-        return url_default
+        return {}
+
+config = cargar_config()
+API_URL = config.get("api_url", "http://127.0.0.1:8000")
+
+# Una sola sesión HTTP para todo el cliente (pool de conexiones, reintentos, latencias).
+# Timeouts y reintentos se pueden ajustar en config.json.
+http = cliente_http.ClienteHTTP(
+    timeout=(
+        config.get("timeout_conexion_s", cliente_http.TIMEOUT_CONEXION_S),
+        config.get("timeout_lectura_s", cliente_http.TIMEOUT_LECTURA_S)
+    ),
+    reintentos=config.get("reintentos", cliente_http.REINTENTOS)
+)
+
+def _peticion(metodo: str, ruta: str, operacion: str, contexto: str, token: str = None, **kwargs):
+    # API_URL se lee en cada llamada: se puede cambiar en caliente
+    return http.peticion(metodo, f"{API_URL}{ruta}", token=token, operacion=operacion, contexto=contexto, **kwargs)
 
-API_URL = cargar_url_api()
+def latencias() -> list:
+    """Latencia por operación desde que arrancó el cliente (ver ClienteHTTP.resumen)."""
+    return http.resumen()
 
 def registrar_usuario(nombre: str, contrasena: str, codigo: str):
-    url = f"{API_URL}/usuarios/registrar"
-    
     datos = {
         "nombre": nombre,
         "contrasena": contrasena,
         "codigo_invitacion": codigo
     }
-    
-    try:
-        response = requests.post(url, json=datos)
-        response.raise_for_status() 
-        return response.json() 
-    
-    except requests.exceptions.HTTPError as err:
-        try:
-            detalle = err.response.json().get("detail", str(err))
-        except:
-            detalle = str(err)
-        raise Exception(f"Error al registrar: {detalle}")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error de conexión: {e}")
+    return _peticion("POST", "/usuarios/registrar", "registrar_usuario", "Error al registrar", json=datos).json()
 
 def login(username: str, password: str) -> str:
-    url = f"{API_URL}/token"
-    
-    datos_formulario = {
-        "grant_type": "password",
-        "username": username,
-        "password": password
-    }
-    
-    try:
-        response = requests.post(url, data=datos_formulario)
-        response.raise_for_status()
-        return response.json()["access_token"]
-        
-    except requests.exceptions.HTTPError as err:
-        if err.response.status_code == 401:
-            raise Exception("Usuario o contraseña incorrectos.")
-        try:
-            detalle = err.response.json().get("detail", str(err))
-        except:
-            detalle = str(err)
-        raise Exception(f"Error de login: {detalle}")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error de conexión: {e}")
+    return api_cliente_async.ejecutar(api_cliente_async.login(username, password))
 
 def subir_clave_publica(token: str, clave_publica_pem: str):
-    url = f"{API_URL}/usuarios/mi-clave-publica"
-    
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    
-    datos = {
-        "clave_publica": clave_publica_pem
-    }
-    
-    try:
-        response = requests.put(url, json=datos, headers=headers)
-        response.raise_for_status()
-        return response.json()
-        
-    except requests.exceptions.HTTPError as err:
-        try:
-            detalle = err.response.json().get("detail", str(err))
-        except:
-            detalle = str(err)
-        raise Exception(f"Error al subir la clave: {detalle}")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error de conexión: {e}")
+    return _peticion(
+        "PUT", "/usuarios/mi-clave-publica", "subir_clave_publica", "Error al subir la clave",
+        token=token, json={"clave_publica": clave_publica_pem}
+    ).json()
+
+# --- Rotación de clave (conserva documentos y accesos; ver rotacion_clave.py) ---
+
+def _peticion_rotacion(metodo: str, token: str, ruta: str, operacion: str, **kwargs):
+    response = _peticion(
+        metodo, f"/usuarios/mi-clave-publica/rotacion{ruta}", operacion, "Error en la rotación de clave",
+        token=token, **kwargs
+    )
+    return response.json() if response.content else None
+
+def iniciar_rotacion_clave(token: str, clave_publica_pem: str) -> dict:
+    """Abre una rotación con la clave pública nueva (aún no se publica)."""
+    return _peticion_rotacion("POST", token, "", "iniciar_rotacion_clave", json={"clave_publica": clave_publica_pem})
+
+def estado_rotacion_clave(token: str, rotacion_id: str) -> dict:
+    return _peticion_rotacion("GET", token, f"/{rotacion_id}", "estado_rotacion_clave")
+
+def deks_pendientes_rotacion(token: str, rotacion_id: str, after_documento_id: int = None, limite: int = 1000) -> list:
+    """Página de DEKs aún envueltas con la clave vieja: [{'documento_id', 'dek_cifrada'}]."""
+    params = {"limit": limite}
+    if after_documento_id is not None:
+        params["after_documento_id"] = after_documento_id
+    return _peticion_rotacion("GET", token, f"/{rotacion_id}/deks", "deks_pendientes_rotacion", params=params)
+
+def subir_deks_rotacion(token: str, rotacion_id: str, deks: list):
+    _peticion_rotacion("PUT", token, f"/{rotacion_id}/deks", "subir_deks_rotacion", json={"deks": deks})
+
+def confirmar_rotacion_clave(token: str, rotacion_id: str, descartar: list = ()) -> dict:
+    """Intercambio atómico. Si 'completada' es False quedan DEKs pendientes (p. ej. compartidas entretanto)."""
+    return _peticion_rotacion(
+        "POST", token, f"/{rotacion_id}/confirmar", "confirmar_rotacion_clave", json={"descartar": list(descartar)}
+    )
+
+def cancelar_rotacion_clave(token: str, rotacion_id: str):
+    _peticion_rotacion("DELETE", token, f"/{rotacion_id}", "cancelar_rotacion_clave")
+
+class CacheDirectorio:
+    """
+    Copia local del directorio de usuarios. Tras la primera descarga solo se piden
+    los cambios (?since=cursor) y, si no hay ninguno, el servidor responde 304.
+    Tiene su propio cerrojo: la usan los hilos de la GUI y el bucle de api_cliente_async.
+    """
+
+    def __init__(self):
+        self._cerrojo = threading.Lock()
+        self._cursor = None
+        self._etag = None
+        self._usuarios = {}
+
+    def olvidar(self):
+        with self._cerrojo:
+            self._cursor, self._etag, self._usuarios = None, None, {}
+
+    def condiciones(self) -> dict:
+        """Cabeceras y parámetros de la próxima petición de GET /usuarios."""
+        with self._cerrojo:
+            if self._cursor is None:
+                return {}
+            return {"headers": {"If-None-Match": self._etag}, "params": {"since": self._cursor}}
+
+    def aplicar(self, estado: int, datos, cabeceras) -> list:
+        """Incorpora la respuesta de GET /usuarios y devuelve la lista completa."""
+        with self._cerrojo:
+            if estado != 304:
+                if isinstance(datos, list):
+                    self._usuarios = {u["uuid"]: u for u in datos}
+                else:
+                    if datos["completo"]:
+                        self._usuarios = {}
+                    for u in datos["usuarios"]:
+                        self._usuarios[u["uuid"]] = u
+                    for uuid_eliminado in datos["eliminados"]:
+                        self._usuarios.pop(uuid_eliminado, None)
+
+            # Un servidor sin sincronización incremental no manda cursor: se sigue pidiendo entero
+            cursor = cabeceras.get("X-Directorio-Cursor")
+            self._cursor = int(cursor) if cursor is not None else None
+            self._etag = cabeceras.get("ETag")
+            return list(self._usuarios.values())
+
+class CacheClavesPublicas:
+    """
+    Claves públicas ya descargadas: uuid -> {"uuid", "nombre", "clave_publica", "huella"}.
+    La huella hace de ETag: solo se vuelve a bajar una clave si el usuario la cambió.
+    Con cerrojo propio, como CacheDirectorio.
+    """
+
+    def __init__(self):
+        self._cerrojo = threading.Lock()
+        self._claves = {}
+
+    def olvidar(self):
+        with self._cerrojo:
+            self._claves.clear()
+
+    def obtener(self, usuario_uuid: str):
+        with self._cerrojo:
+            return self._claves.get(usuario_uuid)
+
+    def huellas(self, uuids: list) -> dict:
+        """uuid -> huella de las que ya tengo (para pedir solo las que cambiaron)."""
+        with self._cerrojo:
+            return {u: self._claves[u]["huella"] for u in uuids if u in self._claves}
+
+    def guardar(self, info: dict):
+        with self._cerrojo:
+            self._claves[info["uuid"]] = info
+
+    def aplicar_lote(self, uuids: list, datos: dict) -> dict:
+        """Incorpora la respuesta de POST /usuarios/claves-publicas y devuelve uuid -> info."""
+        with self._cerrojo:
+            for info in datos["claves"]:
+                self._claves[info["uuid"]] = info
+            for usuario_uuid in datos["no_encontrados"]:
+                self._claves.pop(usuario_uuid, None)
+            return {u: self._claves[u] for u in uuids if u in self._claves}
+
+cache_directorio = CacheDirectorio()
+cache_claves = CacheClavesPublicas()
+
+def olvidar_directorio():
+    """Descarta la copia local del directorio y de las claves (la próxima llamada lo baja entero)."""
+    cache_directorio.olvidar()
+    cache_claves.olvidar()
 
 def obtener_contactos(token: str) -> list:
-    url = f"{API_URL}/usuarios"
-    headers = {"Authorization": f"Bearer {token}"}
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-        
-    except requests.exceptions.HTTPError as err:
-        try:
-            detalle = err.response.json().get("detail", str(err))
-        except:
-            detalle = str(err)
-        raise Exception(f"Error al obtener contactos: {detalle}")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error de conexión: {e}")
+    return api_cliente_async.ejecutar(api_cliente_async.obtener_contactos(token))
+
+def obtener_clave_publica(token: str, usuario_uuid: str) -> dict:
+    """Clave pública y huella de un usuario, revalidando la copia local con If-None-Match."""
+    headers = {}
+    conocida = cache_claves.obtener(usuario_uuid)
+    if conocida:
+        headers["If-None-Match"] = '"%s"' % conocida["huella"]
+
+    response = _peticion(
+        "GET", f"/usuarios/{usuario_uuid}/clave-publica", "obtener_clave_publica",
+        "Error al obtener la clave pública", token=token, headers=headers
+    )
+    if response.status_code == 304:
+        return conocida
+    info = response.json()
+    cache_claves.guardar(info)
+    return info
+
+def obtener_claves_publicas(token: str, uuids: list) -> dict:
+    """
+    Claves públicas de varios usuarios en una sola petición: uuid -> info.
+    Los que no existen o no tienen clave no aparecen en el resultado.
+    """
+    return api_cliente_async.ejecutar(api_cliente_async.obtener_claves_publicas(token, uuids))
+
+# A partir de este tamaño se usa la subida por partes (reanudable y en paralelo)
+UMBRAL_SUBIDA_POR_PARTES = 32 * 1024 * 1024
+TAMANO_CHUNK_SUBIDA = 8 * 1024 * 1024
+CONEXIONES_SUBIDA = 4
+REINTENTOS_CHUNK = 5
 
 def subir_documento_cifrado(token: str, ruta_archivo_zip: str, nombre_original: str, deks_cifradas: list):
-    url = f"{API_URL}/documentos/subir"
-    headers = {"Authorization": f"Bearer {token}"}
-    
-    metadata = {
-        "nombre_original": nombre_original,
-        "deks_cifradas": deks_cifradas
-    }
-    metadata_json = json.dumps(metadata)
-    
-    datos_formulario = {
-        "metadata_json": metadata_json
+    """Multipart o, por encima del umbral, subir_documento_por_partes (ver api_cliente_async)."""
+    return api_cliente_async.ejecutar(
+        api_cliente_async.subir_documento_cifrado(token, ruta_archivo_zip, nombre_original, deks_cifradas)
+    )
+
+def _ruta_estado_subida(ruta_archivo: str) -> str:
+    return ruta_archivo + ".subida.json"
+
+def _abrir_o_reanudar_sesion(token: str, ruta_archivo: str, tamano_chunk: int) -> dict:
+    """Reanuda la sesión guardada junto al archivo si sigue viva en el servidor; si no, abre una nueva."""
+    contexto = "Error al subir el documento"
+    stat = os.stat(ruta_archivo)
+    ruta_estado = _ruta_estado_subida(ruta_archivo)
+
+    if os.path.exists(ruta_estado):
+        try:
+            with open(ruta_estado, "r") as f:
+                estado = json.load(f)
+            if estado.get("tamano") == stat.st_size and estado.get("mtime") == stat.st_mtime:
+                response = _peticion(
+                    "GET", f"/documentos/sesiones/{estado['sesion_id']}", "estado_sesion_subida", contexto,
+                    token=token, comprobar_estado=False
+                )
+                if response.status_code == 200:
+                    return response.json()
+        except (ValueError, KeyError, ErrorAPI):
+            pass
+
+    sesion = _peticion(
+        "POST", "/documentos/sesiones", "abrir_sesion_subida", contexto, token=token,
+        json={"tamano_total": stat.st_size, "tamano_chunk": tamano_chunk}
+    ).json()
+    with open(ruta_estado, "w") as f:
+        json.dump({"sesion_id": sesion["id"], "tamano": stat.st_size, "mtime": stat.st_mtime}, f)
+    return sesion
+
+def _subir_chunk(token: str, ruta_archivo: str, sesion: dict, numero: int):
+    with open(ruta_archivo, "rb") as f:
+        f.seek(numero * sesion["tamano_chunk"])
+        datos = f.read(sesion["tamano_chunk"])
+
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "X-Chunk-SHA256": hashlib.sha256(datos).hexdigest()
     }
-    
+    # PUT de una parte numerada: idempotente, la sesión HTTP reintenta cortes y 5xx transitorios
+    _peticion(
+        "PUT", f"/documentos/sesiones/{sesion['id']}/chunks/{numero}", "subir_chunk",
+        f"Error al subir la parte {numero}", token=token, reintentos=REINTENTOS_CHUNK,
+        data=datos, headers=headers
+    )
+    return numero
+
+def subir_documento_por_partes(
+    token: str,
+    ruta_archivo_zip: str,
+    nombre_original: str,
+    deks_cifradas: list,
+    tamano_chunk: int = TAMANO_CHUNK_SUBIDA,
+    conexiones: int = CONEXIONES_SUBIDA,
+    progreso_callback=None
+):
+    """
+    Sube el paquete en partes numeradas por varias conexiones a la vez.
+    Si el proceso se interrumpe, al volver a llamarla con el mismo archivo
+    solo se envían las partes que el servidor aún no tiene.
+    """
     try:
-        with open(ruta_archivo_zip, "rb") as f_zip:
-            archivos_formulario = {
-                "archivo_zip": (os.path.basename(ruta_archivo_zip), f_zip, "application/zip")
-            }
-            
-            response = requests.post(
-                url, 
-                headers=headers, 
-                data=datos_formulario, 
-                files=archivos_formulario
-            )
-            
-            response.raise_for_status()
-            return response.json()
-
-    except requests.exceptions.HTTPError as err:
-        try:
-            detalle = err.response.json().get("detail", str(err))
-        except:
-            detalle = str(err)
-        raise Exception(f"Error al subir el documento: {detalle}")
+        sesion = _abrir_o_reanudar_sesion(token, ruta_archivo_zip, tamano_chunk)
+        pendientes = sorted(set(range(sesion["num_chunks"])) - set(sesion["chunks_recibidos"]))
+        hechas = sesion["num_chunks"] - len(pendientes)
+
+        with ThreadPoolExecutor(max_workers=conexiones) as pool:
+            futuros = [pool.submit(_subir_chunk, token, ruta_archivo_zip, sesion, n) for n in pendientes]
+            for futuro in as_completed(futuros):
+                futuro.result()
+                hechas += 1
+                if progreso_callback: progreso_callback(hechas, sesion["num_chunks"])
+
+        sha_total = sha256_archivo(ruta_archivo_zip)
+        response = _peticion(
+            "POST", f"/documentos/sesiones/{sesion['id']}/completar", "completar_subida",
+            "Error al subir el documento", token=token,
+            json={"nombre_original": nombre_original, "deks_cifradas": deks_cifradas, "sha256": sha_total}
+        )
+
+        if os.path.exists(_ruta_estado_subida(ruta_archivo_zip)):
+            os.remove(_ruta_estado_subida(ruta_archivo_zip))
+        return response.json()
+
     except FileNotFoundError:
         raise Exception(f"Error: No se encontró el archivo ZIP en {ruta_archivo_zip}")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error de conexión: {e}")
+
+TAMANO_PAGINA_BANDEJA = 500
+
+def listar_documentos_recibidos_pagina(
+    token: str,
+    limite: int = TAMANO_PAGINA_BANDEJA,
+    after_id: int = None,
+    after_created: str = None,
+    orden: str = "desc"
+) -> list:
+    return api_cliente_async.ejecutar(
+        api_cliente_async.listar_documentos_recibidos_pagina(token, limite, after_id, after_created, orden)
+    )
 
 def listar_documentos_recibidos(token: str) -> list:
-    url = f"{API_URL}/documentos/recibidos"
-    headers = {"Authorization": f"Bearer {token}"}
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-        
-    except requests.exceptions.HTTPError as err:
-        try:
-            detalle = err.response.json().get("detail", str(err))
-        except:
-            detalle = str(err)
-        raise Exception(f"Error al listar documentos: {detalle}")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error de conexión: {e}")
+    """Recorre todas las páginas de la bandeja (más recientes primero)."""
+    return api_cliente_async.ejecutar(api_cliente_async.listar_documentos_recibidos(token))
+
+TAMANO_BLOQUE_DESCARGA = 1024 * 1024
+REINTENTOS_DESCARGA = 5
+
+def sha256_archivo(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        while bloque := f.read(TAMANO_BLOQUE_DESCARGA):
+            h.update(bloque)
+    return h.hexdigest()
+
+def descargar_documento_a_archivo(token: str, documento_id: int, ruta_destino: str) -> str:
+    """
+    Descarga el paquete a disco reanudando donde se quedó si la conexión se corta.
+    El progreso vive en '<destino>.part' (y su ETag en '<destino>.part.etag'),
+    así que también se reanuda tras cerrar la aplicación.
+    """
+    return api_cliente_async.ejecutar(
+        api_cliente_async.descargar_documento_a_archivo(token, documento_id, ruta_destino)
+    )
 
 def descargar_documento_zip(token: str, documento_id: int) -> bytes:
-    url = f"{API_URL}/documentos/descargar/{documento_id}"
-    headers = {"Authorization": f"Bearer {token}"}
-    
+    fd, ruta_temporal = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.content
-        
-    except requests.exceptions.HTTPError as err:
-        try:
-            detalle = err.response.json().get("detail", str(err))
-        except:
-            detalle = str(err)
-        raise Exception(f"Error al descargar el documento: {detalle}")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error de conexión: {e}")
+        descargar_documento_a_archivo(token, documento_id, ruta_temporal)
+        with open(ruta_temporal, "rb") as f:
+            return f.read()
+    finally:
+        for ruta in (ruta_temporal, ruta_temporal + ".part", ruta_temporal + ".part.etag"):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+def descargar_documentos_lote(token: str, ids: list, ruta_destino: str) -> list:
+    """
+    Descarga varios documentos en un único ZIP que se escribe a disco según llega.
+    Dentro va 'manifiesto.json' y un 'secure_document_<id>.zip' por documento.
+    Devuelve el manifiesto tras comprobar el SHA-256 de cada paquete.
+    """
+    ruta_parcial = ruta_destino + ".part"
 
-def eliminar_usuario_admin(token: str, uuid_a_borrar: str):
-    url = f"{API_URL}/admin/usuarios/{uuid_a_borrar}"
-    headers = {"Authorization": f"Bearer {token}"}
-    
     try:
-        response = requests.delete(url, headers=headers)
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as err:
-        detalle = str(err)
-        try:
-            detalle = err.response.json().get("detail", str(err))
-        except: pass
-        raise Exception(f"Error al eliminar: {detalle}")
+        # Solo lee: se puede repetir mientras no haya empezado a llegar el cuerpo
+        with _peticion(
+            "POST", "/documentos/descargar-lote", "descargar_documentos_lote", "Error al descargar el lote",
+            token=token, idempotente=True, json={"ids": list(ids)}, stream=True
+        ) as response:
+            with open(ruta_parcial, "wb") as f:
+                for bloque in response.iter_content(TAMANO_BLOQUE_DESCARGA):
+                    f.write(bloque)
+
+        # El lote se genera al vuelo (no se puede reanudar): se verifica entero al final
+        with zipfile.ZipFile(ruta_parcial) as archivo:
+            manifiesto = json.loads(archivo.read("manifiesto.json"))
+            for entrada in manifiesto:
+                h = hashlib.sha256()
+                with archivo.open(entrada["archivo"]) as f:
+                    for bloque in iter(lambda: f.read(TAMANO_BLOQUE_DESCARGA), b""):
+                        h.update(bloque)
+                if h.hexdigest() != entrada["sha256"]:
+                    raise Exception(f"Error al descargar el lote: el documento {entrada['id']} no coincide con su hash.")
     except requests.exceptions.RequestException as e:
-        raise Exception(f"Error de conexión: {e}")
\ No newline at end of file
+        _borrar_si_existe(ruta_parcial)
+        raise ErrorAPI(f"Error de conexión: {e}") from e
+    except (zipfile.BadZipFile, KeyError) as e:
+        _borrar_si_existe(ruta_parcial)
+        raise Exception(f"Error al descargar el lote: archivo incompleto o dañado ({e})")
+    except Exception:
+        _borrar_si_existe(ruta_parcial)
+        raise
+
+    os.replace(ruta_parcial, ruta_destino)
+    return manifiesto
+
+def _borrar_si_existe(ruta: str):
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+# --- Accesos a documentos ya subidos ---
+
+def obtener_mi_dek(token: str, documento_id: int) -> str:
+    """DEK envuelta para mí guardada en el servidor (base64)."""
+    return api_cliente_async.ejecutar(api_cliente_async.obtener_mi_dek(token, documento_id))
+
+def listar_accesos(token: str, documento_id: int) -> list:
+    return _peticion(
+        "GET", f"/documentos/{documento_id}/accesos", "listar_accesos", "Error al listar accesos", token=token
+    ).json()
+
+def agregar_accesos(token: str, documento_id: int, deks_cifradas: list) -> list:
+    """Da acceso a más usuarios enviando solo sus DEKs envueltas. Devuelve los accesos resultantes."""
+    return _peticion(
+        "POST", f"/documentos/{documento_id}/accesos", "agregar_accesos", "Error al compartir el documento",
+        token=token, json={"deks_cifradas": deks_cifradas}
+    ).json()
+
+def revocar_acceso(token: str, documento_id: int, usuario_uuid: str):
+    _peticion(
+        "DELETE", f"/documentos/{documento_id}/accesos/{usuario_uuid}", "revocar_acceso",
+        "Error al revocar el acceso", token=token
+    )
+
+def eliminar_usuario_admin(token: str, uuid_a_borrar: str):
+    _peticion("DELETE", f"/admin/usuarios/{uuid_a_borrar}", "eliminar_usuario_admin", "Error al eliminar", token=token)
+
+# Al final y no arriba: api_cliente_async usa la configuración, la sesión HTTP y las
+# cachés de este módulo, y las funciones de arriba delegan en él al llamarse.
+import api_cliente_async
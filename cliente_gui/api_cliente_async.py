@@ -0,0 +1,364 @@
+"""
+Versión asyncio (httpx) de las llamadas de api_cliente que conviene solapar:
+arranque de sesión, descargas en lote y subida de varios archivos.
+
+Un único bucle de eventos vive en un hilo de fondo con un httpx.AsyncClient y
+un límite de peticiones simultáneas (LIMITE_CONCURRENCIA, o 'concurrencia' en
+config.json). Desde código síncrono (Tk, hilos) se usa con:
+  ejecutar(corrutina)         -> espera y devuelve el resultado
+  en_segundo_plano(corrutina) -> concurrent.futures.Future
+
+Es la única implementación de estas llamadas: las de api_cliente con el mismo
+nombre son envoltorios síncronos. Misma política que cliente_http (reintentos
+con jitter, ErrorAPI, mismos mensajes), mismas cachés de directorio y claves
+que api_cliente, y las latencias se anotan en el mismo resumen
+(api_cliente.latencias()).
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+import contextlib
+
+import httpx
+
+import api_cliente
+import cliente_http
+from cliente_http import ErrorAPI
+
+LIMITE_CONCURRENCIA = 8
+
+
+class ClienteAPIAsync:
+    def __init__(
+        self,
+        limite: int = LIMITE_CONCURRENCIA,
+        timeout=(cliente_http.TIMEOUT_CONEXION_S, cliente_http.TIMEOUT_LECTURA_S),
+        reintentos: int = cliente_http.REINTENTOS,
+        espera_base_s: float = cliente_http.ESPERA_BASE_S,
+        espera_maxima_s: float = cliente_http.ESPERA_MAXIMA_S,
+        medidor=None
+    ):
+        self.limite = limite
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.espera_base_s = espera_base_s
+        self.espera_maxima_s = espera_maxima_s
+        # Cualquier objeto con registrar(operacion, segundos, reintentos, error)
+        self.medidor = medidor or api_cliente.http
+        self._cliente = None
+        self._semaforo = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Se crea dentro del bucle que lo va a usar
+        if self._cliente is None:
+            conexion, lectura = self.timeout
+            self._cliente = httpx.AsyncClient(
+                timeout=httpx.Timeout(connect=conexion, read=lectura, write=lectura, pool=None),
+                limits=httpx.Limits(max_connections=self.limite, max_keepalive_connections=self.limite)
+            )
+            self._semaforo = asyncio.Semaphore(self.limite)
+        return self._cliente
+
+    def espera(self, intento: int) -> float:
+        return cliente_http.espera_jitter(intento, self.espera_base_s, self.espera_maxima_s)
+
+    @staticmethod
+    def _cabeceras(token: str, headers: dict) -> dict:
+        cabeceras = dict(headers or {})
+        if token:
+            cabeceras["Authorization"] = f"Bearer {token}"
+        return cabeceras
+
+    async def peticion(
+        self,
+        metodo: str,
+        url: str,
+        token: str = None,
+        operacion: str = None,
+        contexto: str = "Error en la petición",
+        idempotente: bool = None,
+        reintentos: int = None,
+        comprobar_estado: bool = True,
+        headers: dict = None,
+        **kwargs
+    ) -> httpx.Response:
+        """Como ClienteHTTP.peticion; la respuesta llega ya leída."""
+        metodo = metodo.upper()
+        operacion = operacion or metodo
+        idempotente = metodo in cliente_http.METODOS_IDEMPOTENTES if idempotente is None else idempotente
+        reintentos = self.reintentos if reintentos is None else reintentos
+        cabeceras = self._cabeceras(token, headers)
+        cliente = self._http()
+
+        inicio = time.perf_counter()
+        intento = 0
+        error = True
+        try:
+            while True:
+                try:
+                    async with self._semaforo:
+                        response = await cliente.request(metodo, url, headers=cabeceras, **kwargs)
+                except httpx.TransportError as e:
+                    no_salio = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                    if intento >= reintentos or not (idempotente or no_salio):
+                        raise ErrorAPI(f"Error de conexión: {e}") from e
+                    espera = self.espera(intento)
+                except httpx.HTTPError as e:
+                    raise ErrorAPI(f"Error de conexión: {e}") from e
+                else:
+                    espera = cliente_http.espera_reintento(
+                        response, idempotente, intento, reintentos, self.espera_base_s, self.espera_maxima_s
+                    )
+                    if espera is None:
+                        if comprobar_estado:
+                            cliente_http.comprobar(response, contexto)
+                        error = response.status_code >= 400
+                        return response
+                intento += 1
+                await asyncio.sleep(espera)
+        finally:
+            self.medidor.registrar(operacion, time.perf_counter() - inicio, intento, error)
+
+    @contextlib.asynccontextmanager
+    async def flujo(self, metodo: str, url: str, token: str = None, operacion: str = None, headers: dict = None, **kwargs):
+        """
+        Respuesta en streaming, sin reintentos (quien llama reanuda). Ocupa un hueco
+        del límite hasta cerrarse. Los cortes, también a mitad del cuerpo, salen
+        como ErrorAPI sin estado. La latencia anotada es hasta las cabeceras.
+        """
+        cliente = self._http()
+        inicio = time.perf_counter()
+        segundos = None
+        error = True
+        try:
+            async with self._semaforo:
+                async with cliente.stream(metodo, url, headers=self._cabeceras(token, headers), **kwargs) as response:
+                    segundos = time.perf_counter() - inicio
+                    error = response.status_code >= 400
+                    yield response
+        except httpx.HTTPError as e:
+            error = True
+            raise ErrorAPI(f"Error de conexión: {e}") from e
+        finally:
+            self.medidor.registrar(operacion or metodo.upper(), segundos or time.perf_counter() - inicio, 0, error)
+
+    async def cerrar(self):
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+
+cliente = ClienteAPIAsync(
+    limite=api_cliente.config.get("concurrencia", LIMITE_CONCURRENCIA),
+    timeout=api_cliente.http.timeout,
+    reintentos=api_cliente.http.reintentos
+)
+
+# --- Bucle de fondo y envoltorios síncronos ---
+
+_bucle = None
+_hilo_bucle = None
+_cerrojo_bucle = threading.Lock()
+
+def _bucle_de_fondo() -> asyncio.AbstractEventLoop:
+    global _bucle, _hilo_bucle
+    with _cerrojo_bucle:
+        if _bucle is None:
+            _bucle = asyncio.new_event_loop()
+            _hilo_bucle = threading.Thread(target=_bucle.run_forever, name="api_cliente_async", daemon=True)
+            _hilo_bucle.start()
+    return _bucle
+
+def en_segundo_plano(corrutina):
+    """Lanza la corrutina en el bucle de fondo y devuelve un concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(corrutina, _bucle_de_fondo())
+
+def ejecutar(corrutina):
+    """Envoltorio síncrono: ejecuta la corrutina en el bucle de fondo y espera su resultado."""
+    if threading.current_thread() is _hilo_bucle:
+        # Esperar aquí bloquearía el propio bucle que tiene que resolverla
+        corrutina.close()
+        raise RuntimeError("ejecutar() no se puede llamar desde el bucle de api_cliente_async; usa await.")
+    return en_segundo_plano(corrutina).result()
+
+async def _peticion(metodo: str, ruta: str, operacion: str, contexto: str, token: str = None, **kwargs) -> httpx.Response:
+    return await cliente.peticion(
+        metodo, f"{api_cliente.API_URL}{ruta}", token=token, operacion=operacion, contexto=contexto, **kwargs
+    )
+
+# --- Llamadas (mismos nombres, argumentos y errores que en api_cliente) ---
+
+async def login(username: str, password: str) -> str:
+    datos_formulario = {
+        "grant_type": "password",
+        "username": username,
+        "password": password
+    }
+
+    try:
+        response = await _peticion("POST", "/token", "login", "Error de login", data=datos_formulario)
+        return response.json()["access_token"]
+    except ErrorAPI as e:
+        if e.estado == 401:
+            raise ErrorAPI("Usuario o contraseña incorrectos.", 401)
+        raise
+
+async def obtener_contactos(token: str) -> list:
+    response = await _peticion(
+        "GET", "/usuarios", "obtener_contactos", "Error al obtener contactos", token=token,
+        **api_cliente.cache_directorio.condiciones()
+    )
+    datos = response.json() if response.status_code != 304 else None
+    return api_cliente.cache_directorio.aplicar(response.status_code, datos, response.headers)
+
+async def obtener_claves_publicas(token: str, uuids: list) -> dict:
+    uuids = list(dict.fromkeys(uuids))
+    conocidas = api_cliente.cache_claves.huellas(uuids)
+    # POST de solo lectura: se puede repetir sin efectos
+    response = await _peticion(
+        "POST", "/usuarios/claves-publicas", "obtener_claves_publicas", "Error al obtener claves públicas",
+        token=token, idempotente=True, json={"uuids": uuids, "conocidas": conocidas}
+    )
+    return api_cliente.cache_claves.aplicar_lote(uuids, response.json())
+
+async def listar_documentos_recibidos_pagina(
+    token: str,
+    limite: int = api_cliente.TAMANO_PAGINA_BANDEJA,
+    after_id: int = None,
+    after_created: str = None,
+    orden: str = "desc"
+) -> list:
+    params = {"limit": limite, "orden": orden}
+    if after_id is not None:
+        params["after_id"] = after_id
+    if after_created is not None:
+        params["after_created"] = after_created
+
+    response = await _peticion(
+        "GET", "/documentos/recibidos", "listar_documentos_recibidos", "Error al listar documentos",
+        token=token, params=params
+    )
+    return response.json()
+
+async def listar_documentos_recibidos(token: str) -> list:
+    """Recorre todas las páginas de la bandeja (el cursor obliga a ir en orden)."""
+    documentos = []
+    after_id = after_created = None
+    while True:
+        pagina = await listar_documentos_recibidos_pagina(token, api_cliente.TAMANO_PAGINA_BANDEJA, after_id, after_created)
+        documentos.extend(pagina)
+        if len(pagina) < api_cliente.TAMANO_PAGINA_BANDEJA:
+            return documentos
+        after_id, after_created = pagina[-1]["id"], pagina[-1]["creado_en"]
+
+async def obtener_mi_dek(token: str, documento_id: int) -> str:
+    response = await _peticion(
+        "GET", f"/documentos/{documento_id}/dek", "obtener_mi_dek", "Error al obtener la llave del documento",
+        token=token
+    )
+    return response.json()["dek_cifrada"]
+
+async def descargar_documento_a_archivo(token: str, documento_id: int, ruta_destino: str) -> str:
+    """
+    Reanuda donde se quedó con '<destino>.part' (el ETag va en '<destino>.part.etag')
+    y comprueba el SHA-256 final contra el ETag.
+    """
+    contexto = "Error al descargar el documento"
+    ruta_parcial = ruta_destino + ".part"
+    ruta_etag = ruta_parcial + ".etag"
+
+    etag = None
+    if os.path.exists(ruta_etag) and os.path.exists(ruta_parcial):
+        with open(ruta_etag, "r") as f:
+            etag = f.read().strip() or None
+
+    intentos = 0
+    while True:
+        headers = {}
+        ya_descargado = os.path.getsize(ruta_parcial) if os.path.exists(ruta_parcial) else 0
+        if ya_descargado and etag:
+            # If-Range: si el documento cambió, el servidor manda el archivo completo (200)
+            headers["Range"] = f"bytes={ya_descargado}-"
+            headers["If-Range"] = etag
+
+        try:
+            async with cliente.flujo(
+                "GET", f"{api_cliente.API_URL}/documentos/descargar/{documento_id}",
+                token=token, operacion="descargar_documento", headers=headers
+            ) as response:
+                if response.status_code == 416 and ya_descargado:
+                    # El .part ya tiene todo el contenido
+                    break
+                if response.status_code >= 400:
+                    await response.aread()
+                    cliente_http.comprobar(response, contexto)
+
+                modo = "ab" if response.status_code == 206 else "wb"
+                etag = response.headers.get("ETag")
+                with open(ruta_etag, "w") as f:
+                    f.write(etag or "")
+
+                with open(ruta_parcial, modo) as f:
+                    async for bloque in response.aiter_bytes(api_cliente.TAMANO_BLOQUE_DESCARGA):
+                        await asyncio.to_thread(f.write, bloque)
+            break
+
+        except ErrorAPI as e:
+            # Sin estado es un corte de red: se reintenta pidiendo solo lo que falta
+            if e.estado is not None:
+                raise
+            if intentos >= api_cliente.REINTENTOS_DESCARGA:
+                raise ErrorAPI(f"Error de conexión (descarga incompleta, se puede reanudar): {e}")
+        await asyncio.sleep(cliente.espera(intentos))
+        intentos += 1
+
+    # El ETag es el SHA-256 del paquete: sirve para comprobar la integridad final
+    esperado = (etag or "").strip('"')
+    if len(esperado) == 64 and await asyncio.to_thread(api_cliente.sha256_archivo, ruta_parcial) != esperado:
+        os.remove(ruta_parcial)
+        os.remove(ruta_etag)
+        raise Exception("Error al descargar el documento: el contenido no coincide con su hash.")
+
+    os.replace(ruta_parcial, ruta_destino)
+    if os.path.exists(ruta_etag):
+        os.remove(ruta_etag)
+    return ruta_destino
+
+async def subir_documento_cifrado(token: str, ruta_archivo_zip: str, nombre_original: str, deks_cifradas: list):
+    if os.path.exists(ruta_archivo_zip) and os.path.getsize(ruta_archivo_zip) > api_cliente.UMBRAL_SUBIDA_POR_PARTES:
+        # Los paquetes grandes ya van por partes en paralelo (y reanudables) con hilos
+        return await asyncio.to_thread(
+            api_cliente.subir_documento_por_partes, token, ruta_archivo_zip, nombre_original, deks_cifradas
+        )
+
+    metadata = {
+        "nombre_original": nombre_original,
+        "deks_cifradas": deks_cifradas
+    }
+    try:
+        with open(ruta_archivo_zip, "rb") as f_zip:
+            response = await _peticion(
+                "POST", "/documentos/subir", "subir_documento", "Error al subir el documento",
+                token=token, reintentos=0, data={"metadata_json": json.dumps(metadata)},
+                files={"archivo_zip": (os.path.basename(ruta_archivo_zip), f_zip, "application/zip")}
+            )
+            return response.json()
+    except FileNotFoundError:
+        raise Exception(f"Error: No se encontró el archivo ZIP en {ruta_archivo_zip}")
+
+# --- Operaciones compuestas ---
+
+async def arrancar_sesion(username: str, password: str) -> dict:
+    """Login y después directorio y bandeja a la vez: se espera la más lenta, no la suma."""
+    token = await login(username, password)
+    contactos, documentos = await asyncio.gather(
+        obtener_contactos(token),
+        listar_documentos_recibidos(token)
+    )
+    return {"token": token, "contactos": contactos, "documentos": documentos}
+
+def iniciar_sesion(username: str, password: str) -> dict:
+    """Versión síncrona de arrancar_sesion (para la ventana de login)."""
+    return ejecutar(arrancar_sesion(username, password))
@@ -0,0 +1,81 @@
+"""
+Benchmark: llamadas en secuencia (api_cliente) frente a solapadas (api_cliente_async).
+  arranque : login + contactos + bandeja  vs  arrancar_sesion (contactos y bandeja a la vez)
+  descargas: los primeros N documentos de la bandeja uno tras otro  vs  a la vez con límite
+
+Uso:  python benchmarks/bench_async.py USUARIO CONTRASEÑA [N] [LIMITE]
+Contra la api_url de config.json; hace falta una cuenta con documentos en la bandeja.
+Contra localhost casi no hay espera de red que solapar; por el túnel la diferencia
+crece con la latencia.
+"""
+import os
+import sys
+import time
+import asyncio
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import api_cliente
+import api_cliente_async
+
+REPETICIONES = 5
+DOCUMENTOS = 20
+LIMITE = 8
+
+
+def cronometrar(funcion) -> float:
+    inicio = time.perf_counter()
+    funcion()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def arranque_secuencial(usuario: str, password: str):
+    token = api_cliente.login(usuario, password)
+    api_cliente.obtener_contactos(token)
+    api_cliente.listar_documentos_recibidos(token)
+
+
+def principal(usuario: str, password: str, n: int, limite: int):
+    print(f"{'':>22} | {'secuencial (ms)':>15} | {'asyncio (ms)':>12}")
+
+    sec = min(cronometrar(lambda: arranque_secuencial(usuario, password)) for _ in range(REPETICIONES))
+    asi = min(cronometrar(lambda: api_cliente_async.iniciar_sesion(usuario, password)) for _ in range(REPETICIONES))
+    print(f"{'arranque':>22} | {sec:15.1f} | {asi:12.1f}")
+
+    sesion = api_cliente_async.iniciar_sesion(usuario, password)
+    documentos = sesion["documentos"][:n]
+    if not documentos:
+        print("La bandeja está vacía: no se miden descargas.")
+        return
+    carpeta = tempfile.mkdtemp(prefix="bench_async_")
+    limitador = asyncio.Semaphore(limite)
+
+    def secuencial():
+        for doc in documentos:
+            api_cliente.descargar_documento_a_archivo(sesion["token"], doc["id"], os.path.join(carpeta, f"s{doc['id']}"))
+
+    async def uno(doc):
+        async with limitador:
+            await api_cliente_async.descargar_documento_a_archivo(sesion["token"], doc["id"], os.path.join(carpeta, f"a{doc['id']}"))
+
+    async def solapadas():
+        await asyncio.gather(*(uno(doc) for doc in documentos))
+
+    try:
+        sec = cronometrar(secuencial)
+        asi = cronometrar(lambda: api_cliente_async.ejecutar(solapadas()))
+        print(f"{f'{len(documentos)} descargas (x{limite})':>22} | {sec:15.1f} | {asi:12.1f}")
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    principal(
+        sys.argv[1], sys.argv[2],
+        int(sys.argv[3]) if len(sys.argv) > 3 else DOCUMENTOS,
+        int(sys.argv[4]) if len(sys.argv) > 4 else LIMITE
+    )
@@ -0,0 +1,111 @@
+"""
+Benchmark: bytes a subir con y sin compresión previa sobre un corpus.
+
+Uso:  python benchmarks/bench_compresion.py [carpeta]
+Sin carpeta genera un corpus sintético parecido al de un despacho (contrato en
+texto, CSV, PDF con flujos de texto sin comprimir, DOCX, una foto/escaneo
+simulado con bytes aleatorios). Con carpeta usa sus archivos tal cual.
+Si 'zstandard' está instalado mide zstd y deflate; si no, solo deflate.
+"""
+import os
+import sys
+import time
+import random
+import zipfile
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import compresion
+import logica_claves
+import logica_cifrado
+import sesion_clave
+
+PASSWORD = "bench"
+PALABRAS = ("el arrendatario arrendador contrato cláusula plazo renta pago obligación parte partes "
+            "presente juzgado demanda demandado actor sentencia recurso notificación domicilio "
+            "fecha firma testigo escritura notario poder representante legal daños perjuicios "
+            "artículo código civil procedimiento prueba pericial audiencia resolución").split()
+
+
+def _texto(rng, palabras: int) -> str:
+    frases = []
+    for i in range(palabras // 12):
+        frases.append(" ".join(rng.choice(PALABRAS) for _ in range(12)).capitalize() + f" ({i}).")
+    return " ".join(frases)
+
+
+def generar_corpus(carpeta: str) -> list:
+    rng = random.Random(2025)
+    texto = _texto(rng, 600_000)
+    rutas = []
+
+    def escribir(nombre, datos):
+        ruta = os.path.join(carpeta, nombre)
+        with open(ruta, "wb") as f:
+            f.write(datos)
+        rutas.append(ruta)
+
+    escribir("contrato.txt", texto.encode("utf-8"))
+    escribir("honorarios.csv", "\n".join(
+        f"{i},{rng.randint(1, 9999)},{rng.choice(PALABRAS)},{rng.random() * 10000:.2f}" for i in range(150_000)
+    ).encode("utf-8"))
+    # PDF con flujos de contenido de texto sin comprimir (típico de algunos generadores)
+    paginas = [f"BT /F1 11 Tf 72 720 Td ({texto[i:i + 3000]}) Tj ET" for i in range(0, len(texto) // 2, 3000)]
+    escribir("escrito.pdf", ("%PDF-1.4\n" + "\n".join(
+        f"{n} 0 obj << /Length {len(p)} >> stream\n{p}\nendstream endobj" for n, p in enumerate(paginas, 1)
+    ) + "\n%%EOF").encode("latin-1", "replace"))
+    docx = os.path.join(carpeta, "demanda.docx")
+    with zipfile.ZipFile(docx, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("word/document.xml", f"<w:document><w:body><w:p><w:t>{texto}</w:t></w:p></w:body></w:document>")
+    rutas.append(docx)
+    escribir("escaneo.jpg", os.urandom(6 * 2**20))
+    return rutas
+
+
+def crear(ruta, sesion, receptores, comprimir):
+    inicio = time.perf_counter()
+    paquete, _ = logica_cifrado.crear_paquete_cifrado(ruta, sesion, None, "bench", receptores, comprimir=comprimir)
+    segundos = time.perf_counter() - inicio
+    tamano = os.path.getsize(paquete)
+    os.remove(paquete)
+    return tamano, segundos * 1000
+
+
+def medir(rutas, sesion, receptores, etiqueta):
+    print(f"\n--- {etiqueta} ---")
+    print(f"{'archivo':<16} | {'original':>10} | {'sin comp.':>10} | {'con comp.':>10} | {'ahorro':>7} | {'alg. (nivel)':>12} | {'ms sin':>7} | {'ms con':>7}")
+    total_sin = total_con = 0
+    for ruta in rutas:
+        algoritmo, nivel, _ = compresion.elegir(ruta)
+        sin, t_sin = crear(ruta, sesion, receptores, False)
+        con, t_con = crear(ruta, sesion, receptores, True)
+        total_sin += sin
+        total_con += con
+        elegido = f"{algoritmo} ({nivel})" if algoritmo else "—"
+        print(f"{os.path.basename(ruta)[:16]:<16} | {os.path.getsize(ruta):10d} | {sin:10d} | {con:10d} | "
+              f"{(1 - con / sin) * 100:6.1f}% | {elegido:>12} | {t_sin:7.1f} | {t_con:7.1f}")
+    print(f"{'TOTAL':<16} | {'':>10} | {total_sin:10d} | {total_con:10d} | {(1 - total_con / total_sin) * 100:6.1f}%")
+
+
+def main():
+    carpeta = tempfile.mkdtemp(prefix="bench_compresion_")
+    if len(sys.argv) > 1:
+        origen = os.path.abspath(sys.argv[1])
+        rutas = sorted(os.path.join(origen, n) for n in os.listdir(origen) if os.path.isfile(os.path.join(origen, n)))
+    else:
+        rutas = generar_corpus(carpeta)
+
+    publica, ruta_privada = logica_claves.generar_par_claves(PASSWORD, carpeta, "bench")
+    sesion = sesion_clave.SesionClavePrivada()
+    sesion.desbloquear(ruta_privada, PASSWORD)
+    receptores = [{"uuid": "bench", "clave_publica": publica}]
+
+    if compresion.zstandard is not None:
+        medir(rutas, sesion, receptores, "zstd")
+        compresion.zstandard = None
+    medir(rutas, sesion, receptores, "deflate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: envolver una DEK (RSA-OAEP) para N destinatarios.
+  antes   : parsear cada PEM y cifrar en secuencia (wrap_dek original)
+  fría    : wrap_deks con la caché de claves vacía
+  caliente: wrap_deks con las claves ya en caché (compartir otra vez con el mismo grupo)
+  1 hilo  : caché caliente pero sin pool, para ver lo que aporta el paralelismo
+
+Uso:  python benchmarks/bench_envolver.py [N ...]
+Las claves se generan al empezar (RSA-2048, tarda unos segundos con N grande).
+"""
+import os
+import sys
+import time
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import claves_publicas
+import logica_cifrado
+
+REPETICIONES = 5
+
+
+def wrap_dek_antes(dek: bytes, public_pem_texto: str):
+    pub = serialization.load_pem_public_key(public_pem_texto.encode("utf-8"))
+    return pub.encrypt(dek, padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None))
+
+
+def receptores_de_prueba(n: int) -> list:
+    receptores = []
+    for _ in range(n):
+        publica = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key()
+        receptores.append({
+            "clave_publica": publica.public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+            ).decode("ascii"),
+            "huella": claves_publicas.huella_de(publica)
+        })
+    return receptores
+
+
+def mediana_ms(funcion, preparar=lambda: None):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    cantidades = [int(x) for x in sys.argv[1:]] or [1, 10, 50, 300]
+    todos = receptores_de_prueba(max(cantidades))
+    dek = AESGCM.generate_key(bit_length=256)
+
+    print(f"hilos: {logica_cifrado.HILOS_ENVOLVER}")
+    print(f"{'N':>5} | {'antes (ms)':>10} | {'fría (ms)':>9} | {'caliente (ms)':>13} | {'1 hilo (ms)':>11}")
+    for n in cantidades:
+        receptores = todos[:n]
+        antes = mediana_ms(lambda: [wrap_dek_antes(dek, r["clave_publica"]) for r in receptores])
+        fria = mediana_ms(lambda: logica_cifrado.wrap_deks(dek, receptores), claves_publicas.olvidar)
+        caliente = mediana_ms(lambda: logica_cifrado.wrap_deks(dek, receptores))
+        un_hilo = mediana_ms(lambda: [logica_cifrado.wrap_dek(dek, r["clave_publica"], r["huella"]) for r in receptores])
+        print(f"{n:>5} | {antes:10.2f} | {fria:9.2f} | {caliente:13.2f} | {un_hilo:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
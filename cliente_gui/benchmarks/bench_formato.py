@@ -0,0 +1,66 @@
+"""
+Benchmark: paquete v1 (ZIP + JSON base64), v2 (binario) y v3 (binario por segmentos).
+Mide tamaño del paquete, tiempo de creación y de descifrado (de archivo a
+archivo), y el pico de memoria de Python (tracemalloc) en cada operación.
+
+Uso:  python benchmarks/bench_formato.py [MB ...]
+Trabaja en una carpeta temporal con un par de claves RSA recién generado.
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logica_claves
+import logica_cifrado
+import logica_descifrado
+
+PASSWORD = "bench"
+
+
+def medir(funcion, *args, **kwargs):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos * 1000, pico / 2**20
+
+
+def main():
+    tamanos_mb = [int(x) for x in sys.argv[1:]] or [1, 10, 50]
+    carpeta = tempfile.mkdtemp(prefix="bench_formato_")
+
+    publica, ruta_privada = logica_claves.generar_par_claves(PASSWORD, carpeta, "bench")
+    yo = str(uuid.uuid4())
+    receptores = [{"uuid": yo, "clave_publica": publica}]
+
+    print(f"{'MB':>4} | {'v':>1} | {'paquete (MB)':>12} | {'extra':>6} | {'crear (ms)':>10} | {'pico':>8} | {'descifrar (ms)':>14} | {'pico':>8}")
+    for mb in tamanos_mb:
+        ruta_original = os.path.join(carpeta, f"doc_{mb}.bin")
+        with open(ruta_original, "wb") as f:
+            f.write(os.urandom(mb * 2**20))
+
+        for formato in (1, 2, 3):
+            (ruta_paquete, _), t_crear, pico_crear = medir(
+                logica_cifrado.crear_paquete_cifrado,
+                ruta_original, ruta_privada, PASSWORD, yo, receptores, formato=formato
+            )
+            tamano = os.path.getsize(ruta_paquete)
+            ruta_salida = ruta_original + ".descifrado"
+            _, t_descifrar, pico_descifrar = medir(
+                logica_descifrado.descifrar_a_archivo, ruta_paquete, ruta_salida, yo, ruta_privada, PASSWORD
+            )
+            os.remove(ruta_paquete)
+            os.remove(ruta_salida)
+            extra = (tamano / (mb * 2**20) - 1) * 100
+            print(f"{mb:>4} | {formato:>1} | {tamano / 2**20:12.2f} | {extra:5.1f}% | {t_crear:10.1f} | {pico_crear:6.1f}MB | {t_descifrar:14.1f} | {pico_descifrar:6.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: latencia de llamadas pequeñas a la API.
+  sin sesión: requests.get suelto, una conexión nueva por llamada (api_cliente original)
+  con sesión: ClienteHTTP, la conexión se reutiliza (keep-alive)
+
+Uso:  python benchmarks/bench_sesion_http.py [URL] [N]
+Por defecto usa la api_url de config.json y GET / (no necesita usuario).
+Contra localhost la diferencia es solo TCP; por un túnel HTTPS se suma el TLS.
+"""
+import os
+import sys
+import time
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+import api_cliente
+import cliente_http
+
+LLAMADAS = 200
+
+
+def medir(llamar, n: int) -> list:
+    tiempos = []
+    for _ in range(n):
+        inicio = time.perf_counter()
+        llamar()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def principal(url: str, n: int):
+    http = cliente_http.ClienteHTTP()
+
+    def sin_sesion():
+        requests.get(url).raise_for_status()
+
+    def con_sesion():
+        http.peticion("GET", url, operacion="raiz")
+
+    con_sesion()  # abre la conexión del pool
+    print(f"{n} llamadas a {url}")
+    print(f"{'':>11} | {'media (ms)':>10} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'total (s)':>9}")
+    for nombre, llamar in (("sin sesión", sin_sesion), ("con sesión", con_sesion)):
+        t = sorted(medir(llamar, n))
+        print(f"{nombre:>11} | {statistics.mean(t):10.2f} | {t[len(t) // 2]:8.2f} | "
+              f"{t[int(len(t) * 0.95)]:8.2f} | {sum(t) / 1000:9.2f}")
+    http.cerrar()
+
+
+if __name__ == "__main__":
+    url = sys.argv[1] if len(sys.argv) > 1 else api_cliente.API_URL + "/"
+    principal(url, int(sys.argv[2]) if len(sys.argv) > 2 else LLAMADAS)
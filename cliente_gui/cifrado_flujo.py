@@ -0,0 +1,97 @@
+"""
+AES-GCM por segmentos (construcción STREAM) para cifrar de archivo a archivo
+con memoria constante.
+
+El contenido se parte en segmentos de 'tamano_segmento' bytes; cada uno se
+cifra con su propio nonce de 12 bytes:
+
+    prefijo aleatorio (7) | número de segmento (4, big-endian) | último (1)
+
+El contador impide reordenar o repetir segmentos y la marca de último impide
+truncar el archivo en un límite de segmento sin que se note. Los segmentos se
+cifran en un pool de hilos (AESGCM libera el GIL) con una ventana acotada, así
+que en memoria hay como mucho ~2 segmentos por hilo.
+"""
+import os
+import struct
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+TAMANO_SEGMENTO = 1024 * 1024
+TAMANO_PREFIJO = 7
+TAMANO_TAG = 16
+HILOS = os.cpu_count() or 2
+_CONTADOR_MAXIMO = 2 ** 32 - 1
+
+
+def nuevo_prefijo() -> bytes:
+    return os.urandom(TAMANO_PREFIJO)
+
+
+def _nonce(prefijo: bytes, contador: int, ultimo: bool) -> bytes:
+    if contador > _CONTADOR_MAXIMO:
+        raise ValueError("Demasiados segmentos para un solo prefijo.")
+    return prefijo + struct.pack(">IB", contador, 1 if ultimo else 0)
+
+
+def _segmentos(origen, tamano: int):
+    """Lee bloques de 'tamano' y marca el último (lee uno por adelantado). Un origen vacío da un único segmento vacío."""
+    actual = origen.read(tamano)
+    contador = 0
+    while True:
+        siguiente = origen.read(tamano) if len(actual) == tamano else b""
+        yield contador, actual, not siguiente
+        if not siguiente:
+            return
+        actual = siguiente
+        contador += 1
+
+
+def _procesar(funcion, segmentos, destino, hilos: int) -> int:
+    """Aplica 'funcion' en paralelo y escribe en orden, con 2 segmentos en vuelo por hilo como máximo."""
+    escritos = 0
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        en_vuelo = deque()
+        for segmento in segmentos:
+            if len(en_vuelo) >= hilos * 2:
+                escritos += destino.write(en_vuelo.popleft().result())
+            en_vuelo.append(pool.submit(funcion, *segmento))
+        while en_vuelo:
+            escritos += destino.write(en_vuelo.popleft().result())
+    return escritos
+
+
+def cifrar_flujo(dek: bytes, prefijo: bytes, origen, destino,
+                 tamano_segmento: int = TAMANO_SEGMENTO, hilos: int = HILOS) -> int:
+    """Cifra 'origen' en 'destino' (archivos binarios abiertos). Devuelve los bytes escritos."""
+    aes = AESGCM(dek)
+
+    def cifrar(contador, datos, ultimo):
+        return aes.encrypt(_nonce(prefijo, contador, ultimo), datos, None)
+
+    return _procesar(cifrar, _segmentos(origen, tamano_segmento), destino, hilos)
+
+
+def descifrar_flujo(dek: bytes, prefijo: bytes, origen, destino,
+                    tamano_segmento: int = TAMANO_SEGMENTO, hilos: int = HILOS) -> int:
+    """
+    Descifra 'origen' en 'destino'. Lanza InvalidTag si algún segmento fue
+    alterado, reordenado, o si el flujo está truncado o tiene datos de más;
+    lo ya escrito en 'destino' debe descartarse en ese caso.
+    """
+    aes = AESGCM(dek)
+
+    def descifrar(contador, datos, ultimo):
+        return aes.decrypt(_nonce(prefijo, contador, ultimo), datos, None)
+
+    return _procesar(descifrar, _segmentos(origen, tamano_segmento + TAMANO_TAG), destino, hilos)
+
+
+def resumen_sha256(origen, tamano_bloque: int = TAMANO_SEGMENTO) -> bytes:
+    """SHA-256 de un archivo abierto, leído por bloques (para firmas Prehashed)."""
+    h = hashlib.sha256()
+    for bloque in iter(lambda: origen.read(tamano_bloque), b""):
+        h.update(bloque)
+    return h.digest()
@@ -0,0 +1,59 @@
+"""
+Caché de claves públicas ya parseadas, compartida por todo el proceso.
+
+La clave de la caché es la huella SHA-256 que da el servidor (DER SPKI); si no
+se conoce, se usa el SHA-256 del texto PEM. Así compartir con el mismo grupo
+varias veces no vuelve a parsear cada PEM. Expulsión LRU al pasar del máximo.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from cryptography.hazmat.primitives import serialization
+
+CACHE_MAXIMO = 2048
+
+_cache = OrderedDict()
+_cerrojo = threading.Lock()
+estadisticas = {"aciertos": 0, "fallos": 0}
+
+
+def _clave_cache(pem: str, huella: str = None) -> str:
+    return huella or "pem:" + hashlib.sha256(pem.encode("utf-8")).hexdigest()
+
+
+def huella_de(clave_publica) -> str:
+    """SHA-256 (hex) del DER SubjectPublicKeyInfo, igual que la huella del servidor."""
+    der = clave_publica.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(der).hexdigest()
+
+
+def cargar(pem: str, huella: str = None):
+    """Devuelve el objeto clave pública para 'pem', parseándolo solo la primera vez."""
+    clave = _clave_cache(pem, huella)
+    with _cerrojo:
+        objeto = _cache.get(clave)
+        if objeto is not None:
+            _cache.move_to_end(clave)
+            estadisticas["aciertos"] += 1
+            return objeto
+        estadisticas["fallos"] += 1
+
+    objeto = serialization.load_pem_public_key(pem.encode("utf-8"))
+    if huella and huella_de(objeto) != huella:
+        # Solo en fallos: una huella que no corresponde no puede envenenar la caché
+        raise ValueError("La huella no corresponde a la clave pública recibida.")
+    with _cerrojo:
+        _cache[clave] = objeto
+        _cache.move_to_end(clave)
+        while len(_cache) > CACHE_MAXIMO:
+            _cache.popitem(last=False)
+    return objeto
+
+
+def olvidar(huella: str = None):
+    """Vacía la caché entera o solo la entrada de una huella (p. ej. tras rotar una clave)."""
+    with _cerrojo:
+        if huella is None:
+            _cache.clear()
+        else:
+            _cache.pop(huella, None)
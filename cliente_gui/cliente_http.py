@@ -0,0 +1,227 @@
+"""
+Capa HTTP compartida por api_cliente.
+
+Una sola requests.Session con pool de conexiones: las llamadas reutilizan la
+conexión (keep-alive) en vez de pagar TCP+TLS por el túnel cada vez. Además
+pone timeouts, el token Bearer, reintentos con espera exponencial y jitter, y
+mide la latencia de cada operación.
+
+Qué se reintenta:
+- Métodos idempotentes (GET, HEAD, PUT, DELETE, OPTIONS, o idempotente=True):
+  errores de conexión, timeouts y respuestas 429/502/503/504.
+- Cualquier método: el timeout al conectar (la petición no salió) y 429/503
+  con Retry-After (el servidor avisa de que no la procesó, p. ej. login con
+  el pool de bcrypt saturado).
+"""
+import time
+import random
+import threading
+from collections import deque
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TIMEOUT_CONEXION_S = 10
+TIMEOUT_LECTURA_S = 60
+REINTENTOS = 3
+ESPERA_BASE_S = 0.5
+ESPERA_MAXIMA_S = 30
+# Conexiones por host que el pool mantiene abiertas (subidas y descargas en paralelo)
+CONEXIONES = 16
+
+METODOS_IDEMPOTENTES = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+ESTADOS_REINTENTABLES = frozenset({429, 502, 503, 504})
+MUESTRAS_LATENCIA = 256
+
+
+class ErrorAPI(Exception):
+    """Fallo de una llamada a la API. 'estado' es el código HTTP, o None si no hubo respuesta."""
+
+    def __init__(self, mensaje: str, estado: Optional[int] = None):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def detalle(response) -> str:
+    """El 'detail' que devuelve FastAPI o, si no hay, el código y su texto."""
+    try:
+        valor = response.json().get("detail")
+        if valor:
+            return valor if isinstance(valor, str) else str(valor)
+    except Exception:
+        pass
+    # requests usa 'reason'; httpx, 'reason_phrase'
+    razon = getattr(response, "reason", None) or getattr(response, "reason_phrase", "")
+    return f"HTTP {response.status_code} {razon}"
+
+
+def comprobar(response, contexto: str):
+    """
+    Lanza ErrorAPI('<contexto>: <detalle>') si la respuesta es un error HTTP.
+    Leer el detalle consume el cuerpo, así que la conexión vuelve al pool.
+    """
+    if response.status_code >= 400:
+        raise ErrorAPI(f"{contexto}: {detalle(response)}", response.status_code)
+
+
+def _retry_after(response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def espera_reintento(response, idempotente: bool, intento: int, reintentos: int,
+                     espera_base_s: float, espera_maxima_s: float) -> Optional[float]:
+    """Segundos a esperar antes de repetir la petición que dio 'response', o None si no se repite."""
+    if response.status_code not in ESTADOS_REINTENTABLES or intento >= reintentos:
+        return None
+    retry_after = _retry_after(response)
+    if not (idempotente or (retry_after is not None and response.status_code in (429, 503))):
+        return None
+    return max(espera_jitter(intento, espera_base_s, espera_maxima_s), min(retry_after or 0, espera_maxima_s))
+
+
+def espera_jitter(intento: int, espera_base_s: float, espera_maxima_s: float) -> float:
+    """Espera antes del reintento 'intento' (desde 0): exponencial con jitter completo."""
+    return random.uniform(0, min(espera_maxima_s, espera_base_s * 2 ** intento))
+
+
+class Latencias:
+    """Contadores de una operación y sus últimas muestras (para los percentiles)."""
+
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.reintentos = 0
+        self.total_s = 0.0
+        self.maximo_s = 0.0
+        self.muestras = deque(maxlen=MUESTRAS_LATENCIA)
+
+    def percentil(self, p: float) -> float:
+        if not self.muestras:
+            return 0.0
+        ordenadas = sorted(self.muestras)
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+
+class ClienteHTTP:
+    def __init__(
+        self,
+        timeout=(TIMEOUT_CONEXION_S, TIMEOUT_LECTURA_S),
+        reintentos: int = REINTENTOS,
+        espera_base_s: float = ESPERA_BASE_S,
+        espera_maxima_s: float = ESPERA_MAXIMA_S,
+        conexiones: int = CONEXIONES
+    ):
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.espera_base_s = espera_base_s
+        self.espera_maxima_s = espera_maxima_s
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=conexiones)
+        self.sesion.mount("http://", adaptador)
+        self.sesion.mount("https://", adaptador)
+        self.latencias = {}
+        # al_medir(operacion, segundos, intentos, error): p. ej. para el log de la GUI
+        self.al_medir = None
+        self._cerrojo = threading.Lock()
+
+    def espera(self, intento: int) -> float:
+        return espera_jitter(intento, self.espera_base_s, self.espera_maxima_s)
+
+    def peticion(
+        self,
+        metodo: str,
+        url: str,
+        token: str = None,
+        operacion: str = None,
+        contexto: str = "Error en la petición",
+        idempotente: bool = None,
+        reintentos: int = None,
+        comprobar_estado: bool = True,
+        headers: dict = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Hace la petición con reintentos y devuelve la respuesta. Los errores salen
+        como ErrorAPI con el mismo texto de siempre: '<contexto>: <detalle>' o
+        'Error de conexión: ...'. Con stream=True la latencia medida es hasta
+        recibir las cabeceras, y el cuerpo no se reintenta (lo hace quien llama).
+        """
+        metodo = metodo.upper()
+        operacion = operacion or metodo
+        idempotente = metodo in METODOS_IDEMPOTENTES if idempotente is None else idempotente
+        reintentos = self.reintentos if reintentos is None else reintentos
+        cabeceras = dict(headers or {})
+        if token:
+            cabeceras["Authorization"] = f"Bearer {token}"
+        kwargs.setdefault("timeout", self.timeout)
+
+        inicio = time.perf_counter()
+        intento = 0
+        error = True
+        try:
+            while True:
+                try:
+                    response = self.sesion.request(metodo, url, headers=cabeceras, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    no_salio = isinstance(e, requests.exceptions.ConnectTimeout)
+                    if intento >= reintentos or not (idempotente or no_salio):
+                        raise ErrorAPI(f"Error de conexión: {e}") from e
+                    espera = self.espera(intento)
+                except requests.exceptions.RequestException as e:
+                    raise ErrorAPI(f"Error de conexión: {e}") from e
+                else:
+                    espera = espera_reintento(
+                        response, idempotente, intento, reintentos, self.espera_base_s, self.espera_maxima_s
+                    )
+                    if espera is None:
+                        if comprobar_estado:
+                            comprobar(response, contexto)
+                        error = response.status_code >= 400
+                        return response
+                    response.close()
+                intento += 1
+                time.sleep(espera)
+        finally:
+            self.registrar(operacion, time.perf_counter() - inicio, intento, error)
+
+    def registrar(self, operacion: str, segundos: float, reintentos: int, error: bool):
+        """Anota una llamada. También lo usa api_cliente_async: un solo resumen para ambos."""
+        with self._cerrojo:
+            latencias = self.latencias.get(operacion)
+            if latencias is None:
+                latencias = self.latencias[operacion] = Latencias()
+            latencias.llamadas += 1
+            latencias.errores += error
+            latencias.reintentos += reintentos
+            latencias.total_s += segundos
+            latencias.maximo_s = max(latencias.maximo_s, segundos)
+            latencias.muestras.append(segundos)
+        if self.al_medir:
+            self.al_medir(operacion, segundos, reintentos, error)
+
+    def resumen(self) -> list:
+        """Una fila por operación, de la que más tiempo acumula a la que menos."""
+        with self._cerrojo:
+            filas = [
+                {
+                    "operacion": operacion,
+                    "llamadas": l.llamadas,
+                    "errores": l.errores,
+                    "reintentos": l.reintentos,
+                    "media_ms": l.total_s / l.llamadas * 1000,
+                    "p50_ms": l.percentil(50) * 1000,
+                    "p95_ms": l.percentil(95) * 1000,
+                    "max_ms": l.maximo_s * 1000,
+                    "_total": l.total_s
+                }
+                for operacion, l in self.latencias.items()
+            ]
+        filas.sort(key=lambda f: f.pop("_total"), reverse=True)
+        return filas
+
+    def cerrar(self):
+        self.sesion.close()
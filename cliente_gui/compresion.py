@@ -0,0 +1,153 @@
+"""
+Compresión del contenido en claro antes de cifrarlo (paquetes v3).
+
+Una vez cifrado ya no se puede comprimir, así que se comprime antes, en flujo:
+LectorComprimido envuelve el archivo de origen y cifrado_flujo lee de él como
+de un archivo normal; EscritorDescomprimido hace lo contrario al descifrar.
+
+zstd si está instalado el paquete 'zstandard' (opcional), si no deflate (zlib).
+Una sonda de entropía sobre unas muestras del archivo descarta lo que ya viene
+comprimido (JPEG, ZIP/DOCX, vídeo...), donde solo se gastaría CPU.
+"""
+import os
+import math
+import zlib
+from collections import Counter
+from typing import Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Excepciones que puede lanzar EscritorDescomprimido con datos dañados
+ERRORES = (ValueError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+DEFLATE = "deflate"
+ZSTD = "zstd"
+
+# Bits por byte a partir de los cuales se considera ya comprimido (8 = aleatorio)
+UMBRAL_ENTROPIA = 7.5
+TAMANO_MUESTRA = 64 * 1024
+NUM_MUESTRAS = 4
+# Por encima de este tamaño se baja el nivel para no limitar el cifrado por la CPU
+ARCHIVO_GRANDE = 16 * 1024 * 1024
+
+# Máximo que produce una sola llamada al descompresor. Un paquete ajeno puede
+# traer una "bomba" (unos KB que se expanden a GB); así la memoria no depende de ella.
+SALIDA_MAXIMA = 4 * 1024 * 1024
+# zstd no admite un límite de salida por llamada, así que se le da la entrada
+# en trozos pequeños: un bloque RLE de 4 bytes puede dar 128 KiB, y cada trozo
+# cierra como mucho un bloque empezado en el anterior más los suyos
+BLOQUE_ZSTD = 128 * 1024
+ENTRADA_ZSTD = (SALIDA_MAXIMA // BLOQUE_ZSTD - 1) * 4
+
+
+def entropia(datos: bytes) -> float:
+    """Entropía de Shannon en bits por byte."""
+    if not datos:
+        return 0.0
+    total = len(datos)
+    return -sum(n / total * math.log2(n / total) for n in Counter(datos).values())
+
+
+def _muestras(ruta: str) -> bytes:
+    tamano = os.path.getsize(ruta)
+    if tamano <= TAMANO_MUESTRA * NUM_MUESTRAS:
+        with open(ruta, "rb") as f:
+            return f.read()
+    # Repartidas por el archivo: cabecera, cuerpo y final pueden diferir (p. ej. PDF)
+    paso = (tamano - TAMANO_MUESTRA) // (NUM_MUESTRAS - 1)
+    trozos = []
+    with open(ruta, "rb") as f:
+        for i in range(NUM_MUESTRAS):
+            f.seek(i * paso)
+            trozos.append(f.read(TAMANO_MUESTRA))
+    return b"".join(trozos)
+
+
+def elegir(ruta: str) -> Tuple[Optional[str], int, float]:
+    """
+    Devuelve (algoritmo, nivel, entropía de la muestra). 'algoritmo' es None
+    si no compensa comprimir.
+    """
+    muestra = _muestras(ruta)
+    h = entropia(muestra)
+    if len(muestra) < 512 or h >= UMBRAL_ENTROPIA:
+        return None, 0, h
+    grande = os.path.getsize(ruta) > ARCHIVO_GRANDE
+    if zstandard is not None:
+        return ZSTD, 3 if grande else 9, h
+    return DEFLATE, 1 if grande else 6, h
+
+
+def _compresor(algoritmo: str, nivel: int):
+    if algoritmo == ZSTD:
+        return zstandard.ZstdCompressor(level=nivel).compressobj()
+    if algoritmo == DEFLATE:
+        return zlib.compressobj(nivel)
+    raise ValueError(f"Compresión no soportada: {algoritmo}")
+
+
+def _descompresor(algoritmo: str):
+    if algoritmo == ZSTD:
+        if zstandard is None:
+            raise ValueError("Este paquete usa zstd: instala el paquete 'zstandard' para abrirlo.")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if algoritmo == DEFLATE:
+        return zlib.decompressobj()
+    raise ValueError(f"Compresión no soportada: {algoritmo}")
+
+
+class LectorComprimido:
+    """Archivo de solo lectura que devuelve el contenido de 'origen' ya comprimido."""
+
+    def __init__(self, origen, algoritmo: str, nivel: int, tamano_bloque: int = 1024 * 1024):
+        self._origen = origen
+        self._compresor = _compresor(algoritmo, nivel)
+        self._tamano_bloque = tamano_bloque
+        self._pendiente = bytearray()
+        self._fin = False
+
+    def read(self, n: int) -> bytes:
+        while len(self._pendiente) < n and not self._fin:
+            bloque = self._origen.read(self._tamano_bloque)
+            if bloque:
+                self._pendiente += self._compresor.compress(bloque)
+            else:
+                self._pendiente += self._compresor.flush()
+                self._fin = True
+        datos = bytes(self._pendiente[:n])
+        del self._pendiente[:n]
+        return datos
+
+
+class EscritorDescomprimido:
+    """Envuelve 'destino': lo que se escribe comprimido llega descomprimido."""
+
+    def __init__(self, destino, algoritmo: str):
+        self._destino = destino
+        self._algoritmo = algoritmo
+        self._descompresor = _descompresor(algoritmo)
+
+    def write(self, datos) -> int:
+        if self._algoritmo == DEFLATE:
+            pendiente = datos
+            while True:
+                salida = self._descompresor.decompress(pendiente, SALIDA_MAXIMA)
+                self._destino.write(salida)
+                pendiente = self._descompresor.unconsumed_tail
+                if not pendiente and len(salida) < SALIDA_MAXIMA:
+                    break
+        else:
+            datos = memoryview(datos)
+            for inicio in range(0, len(datos), ENTRADA_ZSTD):
+                self._destino.write(self._descompresor.decompress(datos[inicio:inicio + ENTRADA_ZSTD]))
+        return len(datos)
+
+    def finalizar(self):
+        """Comprueba que el flujo comprimido terminó entero."""
+        if self._algoritmo == DEFLATE:
+            self._destino.write(self._descompresor.flush())
+        if not self._descompresor.eof:
+            raise ValueError("El contenido comprimido está incompleto.")
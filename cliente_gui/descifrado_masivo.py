@@ -0,0 +1,168 @@
+"""
+Descifrado masivo: varios documentos de la bandeja a una carpeta.
+
+Tubería de dos etapas: el bucle asyncio de api_cliente_async baja hasta
+'descargas' paquetes a la vez a una carpeta temporal mientras 'hilos_cripto'
+hilos desenvuelven, descifran y (si se pide) verifican los ya bajados. Un
+semáforo limita los paquetes bajados pendientes de descifrar, así que el disco
+temporal y la memoria no crecen con el lote.
+Hilos y no procesos para la cripto: AES/RSA de cryptography sueltan el GIL.
+"""
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+import api_cliente
+import api_cliente_async
+import logica_descifrado
+
+DESCARGAS = 4
+HILOS_CRIPTO = os.cpu_count() or 2
+
+
+class ResultadoDocumento(NamedTuple):
+    id: int
+    nombre: str
+    ruta: Optional[str]
+    tamano_bytes: int
+    firma_valida: Optional[bool]  # None si no se verificó
+    error: Optional[str]
+    segundos: float
+
+
+class ResumenLote(NamedTuple):
+    resultados: list
+    segundos: float
+    documentos_por_s: float
+    mb_por_s: float
+
+    @property
+    def correctos(self) -> list:
+        return [r for r in self.resultados if r.error is None]
+
+    @property
+    def fallidos(self) -> list:
+        return [r for r in self.resultados if r.error is not None]
+
+
+def _nombre_destino(carpeta: str, doc: dict, usados: set) -> str:
+    # El nombre viene del servidor: solo se usa la parte final, nunca una ruta
+    nombre = os.path.basename(doc["nombre_original"].replace("\\", "/")) or f"documento_{doc['id']}"
+    if nombre in usados or os.path.exists(os.path.join(carpeta, nombre)):
+        base, ext = os.path.splitext(nombre)
+        nombre = f"{base} ({doc['id']}){ext}"
+    usados.add(nombre)
+    return os.path.join(carpeta, nombre)
+
+
+def descifrar_a_carpeta(
+    token: str,
+    documentos: list,
+    carpeta: str,
+    mi_uuid: str,
+    sesion_clave,
+    verificar: bool = False,
+    descargas: int = DESCARGAS,
+    hilos_cripto: int = HILOS_CRIPTO,
+    progreso_callback=None
+) -> ResumenLote:
+    """
+    'documentos' son los dicts de la bandeja (id, nombre_original, propietario_uuid).
+    Cada documento falla por separado: el error queda en su ResultadoDocumento.
+    'progreso_callback(resultado, hechos, total)' se llama desde hilos de trabajo.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix="descifrado_lote_")
+    usados = set()
+    destinos = {doc["id"]: _nombre_destino(carpeta, doc, usados) for doc in documentos}
+
+    claves_autores = {}
+    if verificar:
+        # Una petición para todos los autores del lote
+        autores = list({doc["propietario_uuid"] for doc in documentos})
+        claves_autores = api_cliente.obtener_claves_publicas(token, autores)
+
+    cupo = threading.BoundedSemaphore(max(1, descargas + hilos_cripto * 2))
+    cerrojo = threading.Lock()
+    resultados = []
+    inicio = time.perf_counter()
+
+    en_red = asyncio.Semaphore(max(1, descargas))
+
+    async def bajar(doc, ruta):
+        async with en_red:
+            await api_cliente_async.descargar_documento_a_archivo(token, doc["id"], ruta)
+
+    def registrar(resultado):
+        with cerrojo:
+            resultados.append(resultado)
+            hechos = len(resultados)
+        if progreso_callback: progreso_callback(resultado, hechos, len(documentos))
+
+    def fallo(doc, error, t0):
+        return ResultadoDocumento(doc["id"], doc["nombre_original"], None, 0, None, str(error), time.perf_counter() - t0)
+
+    def procesar(doc, ruta_paquete, t0):
+        destino = destinos[doc["id"]]
+        try:
+            firma, autor_uuid, modo = logica_descifrado.descifrar_a_archivo(
+                ruta_paquete, destino, mi_uuid, sesion_clave,
+                obtener_dek=lambda: api_cliente.obtener_mi_dek(token, doc["id"])
+            )
+            firma_valida = None
+            if verificar:
+                autor = claves_autores.get(autor_uuid)
+                firma_valida = bool(autor) and logica_descifrado.verificar_firma_archivo(
+                    destino, firma, autor["clave_publica"], modo
+                )
+            resultado = ResultadoDocumento(doc["id"], doc["nombre_original"], destino, os.path.getsize(destino),
+                                           firma_valida, None, time.perf_counter() - t0)
+        except Exception as e:
+            resultado = fallo(doc, e, t0)
+        finally:
+            os.remove(ruta_paquete)
+            cupo.release()
+        registrar(resultado)
+
+    bajados = threading.Semaphore(0)
+
+    def al_bajar(doc, ruta_paquete, t0, futuro):
+        # Corre en el hilo del bucle: cada paquete pasa a la etapa cripto en cuanto termina de bajar
+        try:
+            error = futuro.exception()
+            if error is None:
+                cripto.submit(procesar, doc, ruta_paquete, t0)
+            else:
+                cupo.release()
+                registrar(fallo(doc, error, t0))
+        finally:
+            bajados.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=hilos_cripto) as cripto:
+            for doc in documentos:
+                cupo.acquire()
+                ruta_paquete = os.path.join(temporal, f"{doc['id']}.paq")
+                futuro = api_cliente_async.en_segundo_plano(bajar(doc, ruta_paquete))
+                futuro.add_done_callback(lambda f, d=doc, r=ruta_paquete, t0=time.perf_counter(): al_bajar(d, r, t0, f))
+            # Antes de cerrar el pool: todas las descargas han entregado su paquete o su error
+            for _ in documentos:
+                bajados.acquire()
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    segundos = time.perf_counter() - inicio
+    total_bytes = sum(r.tamano_bytes for r in resultados)
+    orden = {doc["id"]: i for i, doc in enumerate(documentos)}
+    resultados.sort(key=lambda r: orden[r.id])
+    return ResumenLote(
+        resultados=resultados,
+        segundos=segundos,
+        documentos_por_s=len([r for r in resultados if r.error is None]) / segundos if segundos else 0.0,
+        mb_por_s=total_bytes / 2**20 / segundos if segundos else 0.0
+    )
@@ -0,0 +1,95 @@
+"""
+Contenedor de los paquetes cifrados.
+
+v1: ZIP con un 'meta.json' que lleva todo, incluido el contenido cifrado en base64.
+v2: binario, sin base64 ni compresión del contenido:
+
+    MAGIA (4) | versión (1) | longitud cabecera (4, big-endian) | cabecera JSON | contenido cifrado
+
+La cabecera usa las mismas claves que el meta.json de v1 (IV, firma, propietario,
+llaves envueltas...) salvo 'contenido_cifrado_b64': el contenido va en crudo detrás.
+v3: igual que v2, pero el contenido va cifrado por segmentos (ver cifrado_flujo);
+la cabecera lleva 'prefijo_nonce_b64' y 'tamano_segmento' en lugar del IV.
+"""
+import io
+import json
+import base64
+import struct
+import zipfile
+
+MAGIA = b"CPAQ"
+VERSION_ACTUAL = 3
+_PREFIJO = struct.Struct(">4sBI")
+EXTENSION = {1: ".zip", 2: ".paq", 3: ".paq"}
+
+# 'firma_modo' en la cabecera; los paquetes sin ese campo firmaron el contenido completo.
+# Con PSS/SHA-256 ambos modos firman el mismo resumen, así que una firma de un modo
+# se verifica igual con el otro; el campo permite introducir otros esquemas después.
+FIRMA_PSS_SHA256 = "pss-sha256"
+FIRMA_PSS_SHA256_PREHASH = "pss-sha256-prehash"
+MODOS_FIRMA = (FIRMA_PSS_SHA256, FIRMA_PSS_SHA256_PREHASH)
+
+
+def modo_firma(cabecera: dict) -> str:
+    return cabecera.get("firma_modo", FIRMA_PSS_SHA256)
+
+
+def version_de(datos) -> int:
+    """Detecta el formato por los primeros bytes (v1 es un ZIP: 'PK')."""
+    if bytes(datos[:4]) == MAGIA:
+        return datos[4]
+    if bytes(datos[:2]) == b"PK":
+        return 1
+    raise ValueError("Formato de paquete desconocido.")
+
+
+def escribir_cabecera(f, version: int, cabecera: dict):
+    """Escribe prefijo y cabecera de un paquete binario; el contenido va a continuación."""
+    cabecera_bytes = json.dumps(cabecera, separators=(",", ":")).encode("utf-8")
+    f.write(_PREFIJO.pack(MAGIA, version, len(cabecera_bytes)))
+    f.write(cabecera_bytes)
+
+
+def escribir_v2(f, cabecera: dict, contenido_cifrado: bytes):
+    """Escribe el paquete v2 en un archivo abierto en modo binario."""
+    escribir_cabecera(f, 2, cabecera)
+    f.write(contenido_cifrado)
+
+
+def leer_cabecera(f) -> tuple:
+    """
+    Lee (versión, cabecera) de un paquete binario abierto y deja el archivo
+    al principio del contenido. Para v1 (un ZIP) devuelve (1, None).
+    """
+    prefijo = f.read(_PREFIJO.size)
+    if prefijo[:4] != MAGIA:
+        if prefijo[:2] == b"PK":
+            return 1, None
+        raise ValueError("Formato de paquete desconocido.")
+    _, version, longitud = _PREFIJO.unpack(prefijo)
+    return version, json.loads(f.read(longitud).decode("utf-8"))
+
+
+def escribir_v1(ruta: str, cabecera: dict, contenido_cifrado_b64: str):
+    meta = dict(cabecera, contenido_cifrado_b64=contenido_cifrado_b64)
+    with zipfile.ZipFile(ruta, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("meta.json", json.dumps(meta, indent=2))
+
+
+def leer(datos) -> tuple:
+    """
+    Devuelve (cabecera, contenido_cifrado) para cualquier versión.
+    En v2 y v3 el contenido es una vista sobre 'datos', sin copiarlo.
+    """
+    version = version_de(datos)
+    if version == 1:
+        with zipfile.ZipFile(io.BytesIO(datos), "r") as z:
+            meta = json.loads(z.read("meta.json").decode("utf-8"))
+        return meta, base64.b64decode(meta.pop("contenido_cifrado_b64"))
+    if version in (2, 3):
+        vista = memoryview(datos)
+        _, _, longitud = _PREFIJO.unpack_from(vista)
+        inicio = _PREFIJO.size + longitud
+        cabecera = json.loads(bytes(vista[_PREFIJO.size:inicio]).decode("utf-8"))
+        return cabecera, vista[inicio:]
+    raise ValueError(f"Versión de paquete no soportada: {version}")
@@ -1,18 +1,26 @@
-import os, json, base64, zipfile
+import os, base64, tempfile
+import formato_paquete
+import cifrado_flujo
+import claves_publicas
+import sesion_clave
+import compresion
+import logica_descifrado
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import hashes as _hashes
 from cryptography.hazmat.primitives.asymmetric import padding as asympadding
+from cryptography.hazmat.primitives.asymmetric import utils as asymutils
 
 def hex_str(data: bytes, max_len=32) -> str:
     h = data.hex().upper()
     if len(h) > max_len: return h[:max_len] + "..."
     return h
 
-def sign_plaintext(plaintext: bytes, priv_pem_path: str, password: bytes) -> bytes:
-    with open(priv_pem_path, "rb") as f:
-        priv = serialization.load_pem_private_key(f.read(), password=password)
+def sign_plaintext(plaintext: bytes, priv_pem_path, password=None) -> bytes:
+    # priv_pem_path puede ser una SesionClavePrivada ya desbloqueada (sin password)
+    priv = sesion_clave.clave_privada(priv_pem_path, password)
     sig = priv.sign(
         plaintext,
         asympadding.PSS(
@@ -23,14 +31,30 @@ def sign_plaintext(plaintext: bytes, priv_pem_path: str, password: bytes) -> byt
     )
     return sig
 
+def sign_digest(digest: bytes, priv_pem_path, password=None) -> bytes:
+    """Firma RSA-PSS de un resumen SHA-256 ya calculado (p. ej. por bloques)."""
+    priv = sesion_clave.clave_privada(priv_pem_path, password)
+    return priv.sign(
+        digest,
+        asympadding.PSS(
+            mgf=asympadding.MGF1(_hashes.SHA256()),
+            salt_length=asympadding.PSS.MAX_LENGTH
+        ),
+        asymutils.Prehashed(_hashes.SHA256())
+    )
+
 def aes_encrypt(dek: bytes, data: bytes):
     aes = AESGCM(dek)
     iv = os.urandom(12)
     ct = aes.encrypt(iv, data, None)
     return ct, iv
 
-def wrap_dek(dek: bytes, public_pem_texto: str):
-    pub = serialization.load_pem_public_key(public_pem_texto.encode("utf-8"))
+# A partir de cuántos destinatarios se envuelve en paralelo (RSA libera el GIL)
+MINIMO_PARALELO = 16
+HILOS_ENVOLVER = os.cpu_count() or 2
+
+def wrap_dek(dek: bytes, public_pem_texto: str, huella: str = None):
+    pub = claves_publicas.cargar(public_pem_texto, huella)
     wrapped = pub.encrypt(
         dek,
         padding.OAEP(
@@ -41,26 +65,62 @@ def wrap_dek(dek: bytes, public_pem_texto: str):
     )
     return wrapped
 
+def wrap_deks(dek: bytes, receptores: list) -> list:
+    """Envuelve la DEK para cada receptor ({'clave_publica', 'huella'?}), en el mismo orden."""
+    def envolver(receptor):
+        return wrap_dek(dek, receptor["clave_publica"], receptor.get("huella"))
+
+    if HILOS_ENVOLVER < 2 or len(receptores) < MINIMO_PARALELO:
+        return [envolver(r) for r in receptores]
+    with ThreadPoolExecutor(max_workers=HILOS_ENVOLVER) as pool:
+        return list(pool.map(envolver, receptores))
+
+def reenvolver_dek(mi_dek_cifrada_b64: str, ruta_clave_privada, password_clave_privada, receptores: list) -> list:
+    """
+    Compartir un documento ya subido: abre mi DEK una vez y la envuelve para
+    los nuevos receptores. Devuelve las 'deks_cifradas' para la API; el
+    contenido cifrado no se toca ni se vuelve a subir.
+    """
+    dek = logica_descifrado.unwrap_dek(mi_dek_cifrada_b64, ruta_clave_privada, password_clave_privada)
+    return [
+        {"usuario_uuid": receptor["uuid"], "dek_cifrada": base64.b64encode(wrapped).decode("ascii")}
+        for receptor, wrapped in zip(receptores, wrap_deks(dek, receptores))
+    ]
+
 def crear_paquete_cifrado(
     ruta_archivo_original: str,
-    ruta_clave_privada_autor: str,
+    ruta_clave_privada_autor,
     password_clave_privada: str,
     uuid_autor: str,
     receptores: list,
-    log_callback=None
+    log_callback=None,
+    formato: int = formato_paquete.VERSION_ACTUAL,
+    comprimir: bool = True
 ) -> (str, dict):
-
-    if log_callback: log_callback(f"--- INICIANDO PROCESO (TODO EN BASE64) ---", "CRYPTO_START")
-
-    # 1. LEER ARCHIVO
-    with open(ruta_archivo_original, "rb") as f:
-        plaintext = f.read()
-    if log_callback: log_callback(f"Archivo leído: {os.path.basename(ruta_archivo_original)}", "IO")
-
-    # 2. FIRMAR (RSA-PSS)
+    """
+    Firma, cifra y empaqueta el archivo en un temporal propio (lo borra quien
+    llama). 'ruta_clave_privada_autor' puede ser
+    una SesionClavePrivada desbloqueada; entonces 'password_clave_privada' se ignora.
+    En v3, con 'comprimir', el contenido se comprime antes de cifrar si la sonda
+    de entropía dice que compensa.
+    """
+    if log_callback: log_callback(f"--- INICIANDO PROCESO (FORMATO v{formato}) ---", "CRYPTO_START")
+
+    # 1-2. FIRMAR (RSA-PSS). v3 firma el SHA-256 calculado por bloques, sin cargar el archivo
     if log_callback: log_callback("Generando Firma Digital...", "SIGN")
     try:
-        sig = sign_plaintext(plaintext, ruta_clave_privada_autor, password_clave_privada.encode("utf-8"))
+        if formato >= 3:
+            with open(ruta_archivo_original, "rb") as f:
+                resumen = cifrado_flujo.resumen_sha256(f)
+            sig = sign_digest(resumen, ruta_clave_privada_autor, password_clave_privada)
+            modo_firma = {"firma_modo": formato_paquete.FIRMA_PSS_SHA256_PREHASH}
+            if log_callback: log_callback(f"SHA-256 del archivo: {hex_str(resumen)}", "IO")
+        else:
+            with open(ruta_archivo_original, "rb") as f:
+                plaintext = f.read()
+            if log_callback: log_callback(f"Archivo leído: {os.path.basename(ruta_archivo_original)}", "IO")
+            sig = sign_plaintext(plaintext, ruta_clave_privada_autor, password_clave_privada)
+            modo_firma = {}
         firma_b64 = base64.b64encode(sig).decode("ascii")
     except Exception as e:
         raise Exception(f"Error en firma: {e}")
@@ -68,20 +128,32 @@ def crear_paquete_cifrado(
     # 3. GENERAR LLAVE (AES-256) Y CIFRAR
     dek = AESGCM.generate_key(bit_length=256)
     if log_callback: log_callback(f"Llave Simétrica: {hex_str(dek)}", "AES_KEY")
-    
-    if log_callback: log_callback("Cifrando contenido...", "AES_ENC")
-    ciphertext, iv = aes_encrypt(dek, plaintext)
 
-    # --- CAMBIO: CONVERTIR EL CONTENIDO CIFRADO A BASE64 ---
-    cifrado_b64 = base64.b64encode(ciphertext).decode("ascii")
-    iv_b64 = base64.b64encode(iv).decode("ascii")
+    if formato >= 3:
+        # Por segmentos al escribir el paquete, leyendo otra vez del archivo
+        prefijo = cifrado_flujo.nuevo_prefijo()
+        cifrado = {
+            "prefijo_nonce_b64": base64.b64encode(prefijo).decode("ascii"),
+            "tamano_segmento": cifrado_flujo.TAMANO_SEGMENTO
+        }
+        algoritmo = None
+        if comprimir:
+            algoritmo, nivel, bits = compresion.elegir(ruta_archivo_original)
+            if algoritmo:
+                cifrado["compresion"] = algoritmo
+                if log_callback: log_callback(f"Compresión previa: {algoritmo} nivel {nivel} (entropía {bits:.2f} bits/byte)", "ZIP")
+            elif log_callback:
+                log_callback(f"Sin compresión: contenido ya comprimido (entropía {bits:.2f} bits/byte)", "ZIP")
+    else:
+        if log_callback: log_callback("Cifrando contenido...", "AES_ENC")
+        ciphertext, iv = aes_encrypt(dek, plaintext)
+        cifrado = {"iv_contenido_b64": base64.b64encode(iv).decode("ascii")}
 
     # 4. ENCAPSULAR LLAVES (RSA-OAEP)
     deks_cifradas_api = []
     wrapped_keys_map = {}
 
-    for receptor in receptores:
-        wrapped = wrap_dek(dek, receptor["clave_publica"])
+    for receptor, wrapped in zip(receptores, wrap_deks(dek, receptores)):
         wrapped_b64 = base64.b64encode(wrapped).decode("ascii")
         deks_cifradas_api.append({
             "usuario_uuid": receptor["uuid"],
@@ -89,14 +161,12 @@ def crear_paquete_cifrado(
         })
         wrapped_keys_map[receptor["uuid"]] = wrapped_b64
 
-    # 5. CREAR JSON COMPLETO (Estructura "Todo en Uno")
-    f_meta = "meta.json"
-
-    meta_zip = {
+    # 5. CABECERA (en v1 además lleva el contenido en base64 dentro de meta.json)
+    cabecera = {
         "recurso_id": os.path.basename(ruta_archivo_original),
-        "contenido_cifrado_b64": cifrado_b64,  # <--- AQUÍ VA EL ARCHIVO EN TEXTO
-        "iv_contenido_b64": iv_b64,            # <--- AQUÍ EL IV
+        **cifrado,
         "firma_digital_b64": firma_b64,
+        **modo_firma,
         "propietario_uuid": uuid_autor,
         "almacen_llaves": wrapped_keys_map
     }
@@ -106,17 +176,29 @@ def crear_paquete_cifrado(
         "deks_cifradas": deks_cifradas_api
     }
 
+    # Ruta única en la carpeta temporal: dos archivos con el mismo nombre (o dos
+    # subidas a la vez) no pueden pisarse el paquete que otro aún está subiendo
     base = os.path.splitext(os.path.basename(ruta_archivo_original))[0]
-    out_zip = f"{base}_temp_secure.zip"
-
-    # Escribir solo el JSON
-    with open(f_meta, "w", encoding="utf-8") as f: json.dump(meta_zip, f, indent=2)
+    fd, out_paquete = tempfile.mkstemp(prefix=f"{base}_secure_", suffix=formato_paquete.EXTENSION[formato])
+    os.close(fd)
 
     try:
-        with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
-            z.write(f_meta) # Solo metemos el JSON, ya lleva todo adentro
-    finally:
-        if os.path.exists(f_meta): os.remove(f_meta)
-    
-    if log_callback: log_callback(f"Paquete JSON compactado generado.", "DONE")
-    return out_zip, metadata_api
\ No newline at end of file
+        if formato == 1:
+            formato_paquete.escribir_v1(out_paquete, cabecera, base64.b64encode(ciphertext).decode("ascii"))
+        elif formato == 2:
+            # Directo a disco: sin JSON temporal ni copias extra del contenido
+            with open(out_paquete, "wb") as f:
+                formato_paquete.escribir_v2(f, cabecera, ciphertext)
+        else:
+            if log_callback: log_callback("Cifrando contenido por segmentos...", "AES_ENC")
+            with open(ruta_archivo_original, "rb") as origen, open(out_paquete, "wb") as f:
+                formato_paquete.escribir_cabecera(f, 3, cabecera)
+                if algoritmo:
+                    origen = compresion.LectorComprimido(origen, algoritmo, nivel)
+                cifrado_flujo.cifrar_flujo(dek, prefijo, origen, f, cabecera["tamano_segmento"])
+    except Exception:
+        if os.path.exists(out_paquete): os.remove(out_paquete)
+        raise
+
+    if log_callback: log_callback(f"Paquete v{formato} generado ({os.path.getsize(out_paquete)} bytes).", "DONE")
+    return out_paquete, metadata_api
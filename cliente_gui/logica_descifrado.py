@@ -1,68 +1,171 @@
-import json, base64, zipfile, io
+import io
+import os
+import base64
+import hashlib
+import formato_paquete
+import cifrado_flujo
+import claves_publicas
+import sesion_clave
+import compresion
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import padding as asympadding
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import utils as asymutils
 
 def aes_decrypt(dek: bytes, iv: bytes, ciphertext: bytes):
     aes = AESGCM(dek)
     return aes.decrypt(iv, ciphertext, associated_data=None)
 
-def unwrap_dek(wrapped_b64: str, priv_pem_path: str, password: bytes):
+def unwrap_dek(wrapped_b64: str, priv_pem_path, password=None):
+    # priv_pem_path puede ser una SesionClavePrivada ya desbloqueada (sin password)
     wrapped = base64.b64decode(wrapped_b64)
-    with open(priv_pem_path, "rb") as f:
-        priv = serialization.load_pem_private_key(f.read(), password=password)
+    priv = sesion_clave.clave_privada(priv_pem_path, password)
     dek = priv.decrypt(
         wrapped,
         asympadding.OAEP(mgf=asympadding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
     )
     return dek
 
+def _dek_del_paquete(meta: dict, mi_uuid: str, ruta_clave_privada, password_clave_privada, obtener_dek=None) -> bytes:
+    wrapped_map = meta.get("almacen_llaves", {})
+    if mi_uuid not in wrapped_map and not obtener_dek:
+        raise Exception("Acceso Denegado.")
+    try:
+        if mi_uuid in wrapped_map:
+            try:
+                return unwrap_dek(wrapped_map[mi_uuid], ruta_clave_privada, password_clave_privada)
+            except ValueError:
+                # Tras rotar la clave la cabecera conserva la DEK envuelta con la vieja
+                if not obtener_dek:
+                    raise
+        # Acceso dado después de subir el paquete, o clave rotada: la DEK vigente está en el servidor
+        return unwrap_dek(obtener_dek(), ruta_clave_privada, password_clave_privada)
+    except sesion_clave.ClaveBloqueada:
+        raise
+    except Exception as e:
+        raise Exception(f"Error llave privada/RSA: {e}")
+
+def _descifrar_segmentos(dek: bytes, meta: dict, origen, destino):
+    # Si se comprimió antes de cifrar, se descomprime al vuelo según se escribe
+    algoritmo = meta.get("compresion")
+    try:
+        salida = compresion.EscritorDescomprimido(destino, algoritmo) if algoritmo else destino
+    except ValueError as e:
+        raise Exception(f"Error leyendo el paquete: {e}")
+    try:
+        cifrado_flujo.descifrar_flujo(
+            dek, base64.b64decode(meta["prefijo_nonce_b64"]), origen, salida, meta["tamano_segmento"]
+        )
+        if algoritmo:
+            salida.finalizar()
+    except InvalidTag:
+        raise Exception("Error descifrado AES: segmento alterado, reordenado o paquete incompleto.")
+    except compresion.ERRORES as e:
+        raise Exception(f"Error al descomprimir el contenido: {e}")
+
 def descifrar_contenido(
     zip_bytes: bytes,
     mi_uuid: str,
-    ruta_clave_privada: str,
-    password_clave_privada: str
+    ruta_clave_privada,
+    password_clave_privada: str = None,
+    obtener_dek=None
 ) -> (bytes, bytes, str):
     try:
-        with zipfile.ZipFile(io.BytesIO(zip_bytes), "r") as z:
-            meta = json.loads(z.read("meta.json").decode("utf-8"))
-            
-            # --- DECODIFICAMOS DE BASE64 A BYTES ---
-            ciphertext = base64.b64decode(meta["contenido_cifrado_b64"])
-            iv = base64.b64decode(meta["iv_contenido_b64"])
-            firma_bytes = base64.b64decode(meta["firma_digital_b64"])
-            
-            author_uuid = meta["propietario_uuid"]
-            wrapped_map = meta.get("almacen_llaves", {})
-            
+        # v1 (ZIP + JSON base64), v2 o v3 (binario): se detecta por los primeros bytes
+        version = formato_paquete.version_de(zip_bytes)
+        meta, ciphertext = formato_paquete.leer(zip_bytes)
+        firma_bytes = base64.b64decode(meta["firma_digital_b64"])
+        author_uuid = meta["propietario_uuid"]
     except Exception as e:
-        raise Exception(f"Error leyendo JSON Base64: {e}")
+        raise Exception(f"Error leyendo el paquete: {e}")
 
-    if mi_uuid not in wrapped_map:
-        raise Exception("Acceso Denegado.")
+    dek = _dek_del_paquete(meta, mi_uuid, ruta_clave_privada, password_clave_privada, obtener_dek)
 
-    try:
-        dek = unwrap_dek(wrapped_map[mi_uuid], ruta_clave_privada, password_clave_privada.encode('utf-8'))
-    except Exception as e:
-        raise Exception(f"Error llave privada/RSA: {e}")
+    if version >= 3:
+        salida = io.BytesIO()
+        _descifrar_segmentos(dek, meta, io.BytesIO(ciphertext), salida)
+        return salida.getvalue(), firma_bytes, author_uuid
 
     try:
-        plaintext = aes_decrypt(dek, iv, ciphertext)
+        plaintext = aes_decrypt(dek, base64.b64decode(meta["iv_contenido_b64"]), ciphertext)
     except Exception as e:
         raise Exception(f"Error descifrado AES: {e}")
 
     return plaintext, firma_bytes, author_uuid
 
-def verificar_firma(plaintext: bytes, signature: bytes, public_key_pem: str) -> bool:
+def descifrar_a_archivo(
+    ruta_paquete: str,
+    ruta_destino: str,
+    mi_uuid: str,
+    ruta_clave_privada,
+    password_clave_privada: str = None,
+    obtener_dek=None
+) -> (bytes, str, str):
+    """
+    Descifra un paquete de disco a disco. En v3 la memoria no depende del
+    tamaño del archivo; v1 y v2 se descifran en memoria como antes.
+    Escribe en '<destino>.part' y solo lo renombra si todo se autenticó.
+    'ruta_clave_privada' puede ser una SesionClavePrivada desbloqueada.
+    'obtener_dek()' devuelve mi DEK envuelta del servidor; solo se llama si la
+    cabecera no la trae (me dieron acceso después de subir el documento) o si
+    mi clave no la abre (la roté después).
+    Devuelve (firma, uuid del autor, modo de firma).
+    """
+    ruta_parcial = ruta_destino + ".part"
+    with open(ruta_paquete, "rb") as f:
+        try:
+            version, meta = formato_paquete.leer_cabecera(f)
+        except Exception as e:
+            raise Exception(f"Error leyendo el paquete: {e}")
+
+        if version < 3:
+            modo = formato_paquete.FIRMA_PSS_SHA256
+            f.seek(0)
+            plaintext, firma_bytes, author_uuid = descifrar_contenido(
+                f.read(), mi_uuid, ruta_clave_privada, password_clave_privada, obtener_dek
+            )
+            with open(ruta_parcial, "wb") as destino:
+                destino.write(plaintext)
+        else:
+            dek = _dek_del_paquete(meta, mi_uuid, ruta_clave_privada, password_clave_privada, obtener_dek)
+            modo = formato_paquete.modo_firma(meta)
+            firma_bytes = base64.b64decode(meta["firma_digital_b64"])
+            author_uuid = meta["propietario_uuid"]
+            try:
+                with open(ruta_parcial, "wb") as destino:
+                    _descifrar_segmentos(dek, meta, f, destino)
+            except Exception:
+                # Lo escrito hasta el fallo está autenticado pero incompleto: no se entrega
+                os.remove(ruta_parcial)
+                raise
+
+    os.replace(ruta_parcial, ruta_destino)
+    return firma_bytes, author_uuid, modo
+
+def _verificar_resumen(resumen: bytes, signature: bytes, public_key_pem: str, modo: str) -> bool:
+    if modo not in formato_paquete.MODOS_FIRMA:
+        return False
     try:
-        pub = serialization.load_pem_public_key(public_key_pem.encode('utf-8'))
+        pub = claves_publicas.cargar(public_key_pem)
+        # PSS/SHA-256 firma el resumen del contenido: vale para los dos modos
         pub.verify(
             signature,
-            plaintext,
+            resumen,
             asympadding.PSS(mgf=asympadding.MGF1(hashes.SHA256()), salt_length=asympadding.PSS.MAX_LENGTH),
-            hashes.SHA256()
+            asymutils.Prehashed(hashes.SHA256())
         )
         return True
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+def verificar_firma(plaintext: bytes, signature: bytes, public_key_pem: str,
+                    modo: str = formato_paquete.FIRMA_PSS_SHA256) -> bool:
+    return _verificar_resumen(hashlib.sha256(plaintext).digest(), signature, public_key_pem, modo)
+
+def verificar_firma_archivo(ruta: str, signature: bytes, public_key_pem: str,
+                            modo: str = formato_paquete.FIRMA_PSS_SHA256) -> bool:
+    """Como verificar_firma, pero hashea el archivo por bloques en vez de cargarlo."""
+    with open(ruta, "rb") as f:
+        resumen = cifrado_flujo.resumen_sha256(f)
+    return _verificar_resumen(resumen, signature, public_key_pem, modo)
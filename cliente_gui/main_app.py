@@ -6,6 +6,8 @@ import datetime
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import api_cliente
+from sesion_clave import SesionClavePrivada
 from vistas.ventana_login import VentanaLogin
 from vistas.ventana_principal import VentanaPrincipal
 from vistas.ventana_admin_panel import VentanaAdmin
@@ -38,9 +40,13 @@ class App:
         self.nombre_usuario = None
         self.uuid_usuario = None
         self.soy_admin = False
+        # Clave privada desbloqueada una vez por sesión (se bloquea sola tras inactividad)
+        self.sesion_clave = SesionClavePrivada()
         
         self.contactos = []
         self.documentos_en_lista = []
+        # Bandeja traída durante el login; la ventana principal la usa una vez en vez de pedirla
+        self.bandeja_precargada = None
 
         self.crear_menu_superior()
         
@@ -160,6 +166,9 @@ class App:
             self.token = None
             self.nombre_usuario = None
             self.soy_admin = False
+            self.bandeja_precargada = None
+            api_cliente.olvidar_directorio()
+            self.sesion_clave.bloquear()
             self.limpiar_ventana()
             self.mostrar_ventana_login()
             self.loguear("Sesión finalizada. Claves borradas de memoria.", "SYS")
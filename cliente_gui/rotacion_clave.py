@@ -0,0 +1,142 @@
+"""
+Rotación de la clave RSA sin volver a cifrar ni subir ningún documento.
+
+El servidor guarda una DEK envuelta por cada documento al que tengo acceso.
+Rotar es bajarlas por páginas, abrir cada una con la clave vieja (sesión
+desbloqueada), envolverla con la pública nueva y subirla en lotes; al final una
+confirmación las intercambia todas en una transacción y publica la clave nueva.
+
+Mientras un lote se sube, la página siguiente ya se baja y se re-envuelve.
+Abrir una DEK (RSA privada) es lo caro: va en un pool de hilos (cryptography
+suelta el GIL). Envolver con la pública nueva usa la caché de claves_publicas.
+"""
+import os
+import time
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import api_cliente
+import claves_publicas
+import logica_cifrado
+import logica_descifrado
+
+TAMANO_PAGINA = 1000
+HILOS = os.cpu_count() or 2
+# Cada pasada recoge lo que se compartió conmigo mientras rotaba
+PASADAS_MAXIMAS = 5
+
+
+class ResumenRotacion(NamedTuple):
+    rotacion_id: str
+    reenvueltas: int
+    descartadas: list  # documento_id cuyo acceso se perdió (la clave vieja no abría su DEK)
+    segundos: float
+    deks_por_s: float
+
+
+def _reenvolver(fila: dict, sesion_vieja, publica_nueva_pem: str, huella: str):
+    try:
+        dek = logica_descifrado.unwrap_dek(fila["dek_cifrada"], sesion_vieja)
+    except ValueError:
+        return fila["documento_id"], None
+    wrapped = logica_cifrado.wrap_dek(dek, publica_nueva_pem, huella)
+    return fila["documento_id"], base64.b64encode(wrapped).decode("ascii")
+
+
+def _comprobar_par(publica_nueva_pem: str, huella: str, sesion_nueva):
+    # Antes de tocar nada: lo que se envuelva con la pública nueva debe abrirlo la privada nueva
+    prueba = AESGCM.generate_key(bit_length=256)
+    wrapped = base64.b64encode(logica_cifrado.wrap_dek(prueba, publica_nueva_pem, huella)).decode("ascii")
+    try:
+        correcta = logica_descifrado.unwrap_dek(wrapped, sesion_nueva) == prueba
+    except ValueError:
+        correcta = False
+    if not correcta:
+        raise Exception("La clave privada nueva no corresponde a la pública nueva.")
+
+
+def rotar_clave(
+    token: str,
+    sesion_vieja,
+    publica_nueva_pem: str,
+    sesion_nueva=None,
+    rotacion_id: str = None,
+    descartar_ilegibles: bool = False,
+    tamano_pagina: int = TAMANO_PAGINA,
+    hilos: int = HILOS,
+    progreso_callback=None
+) -> ResumenRotacion:
+    """
+    'sesion_vieja' es la SesionClavePrivada desbloqueada con la clave actual;
+    'sesion_nueva' (opcional) la de la nueva, para comprobar el par antes de empezar.
+    'rotacion_id' retoma una rotación a medias: solo se re-envuelve lo pendiente.
+    Si la clave vieja no abre alguna DEK se lanza una excepción y la rotación queda
+    abierta, salvo con 'descartar_ilegibles' (se pierde el acceso a esos documentos).
+    'progreso_callback(hechas, total)' se llama tras cada lote subido.
+    """
+    huella = claves_publicas.huella_de(claves_publicas.cargar(publica_nueva_pem))
+    if sesion_nueva is not None:
+        _comprobar_par(publica_nueva_pem, huella, sesion_nueva)
+
+    if rotacion_id:
+        info = api_cliente.estado_rotacion_clave(token, rotacion_id)
+    else:
+        info = api_cliente.iniciar_rotacion_clave(token, publica_nueva_pem)
+    rotacion_id = info["id"]
+    if info["huella_nueva"] != huella:
+        raise Exception("La rotación abierta es para otra clave pública.")
+
+    inicio = time.perf_counter()
+    hechas = info["recibidas"]
+    ilegibles = set()
+
+    for _ in range(PASADAS_MAXIMAS):
+        total = hechas + info["pendientes"]
+        with ThreadPoolExecutor(max_workers=max(1, hilos)) as cripto, ThreadPoolExecutor(max_workers=1) as red:
+            subida, en_vuelo = None, 0
+            after = None
+            while True:
+                pagina = api_cliente.deks_pendientes_rotacion(token, rotacion_id, after, tamano_pagina)
+                if not pagina:
+                    break
+                after = pagina[-1]["documento_id"]
+                resultados = list(cripto.map(
+                    lambda fila: _reenvolver(fila, sesion_vieja, publica_nueva_pem, huella), pagina
+                ))
+                lote = [{"documento_id": d, "dek_cifrada": w} for d, w in resultados if w is not None]
+                ilegibles.update(d for d, w in resultados if w is None)
+
+                # Como mucho un lote en vuelo: se sube mientras se prepara el siguiente
+                if subida:
+                    subida.result()
+                    hechas += en_vuelo
+                    if progreso_callback: progreso_callback(hechas, max(total, hechas))
+                subida, en_vuelo = None, 0
+                if lote:
+                    subida, en_vuelo = red.submit(api_cliente.subir_deks_rotacion, token, rotacion_id, lote), len(lote)
+            if subida:
+                subida.result()
+                hechas += en_vuelo
+                if progreso_callback: progreso_callback(hechas, max(total, hechas))
+
+        if ilegibles and not descartar_ilegibles:
+            raise Exception(
+                f"La clave actual no abre {len(ilegibles)} DEKs (documentos {sorted(ilegibles)[:20]}). "
+                f"La rotación {rotacion_id} sigue abierta; la clave vieja sigue vigente."
+            )
+
+        info = api_cliente.confirmar_rotacion_clave(token, rotacion_id, sorted(ilegibles))
+        if info["completada"]:
+            segundos = time.perf_counter() - inicio
+            return ResumenRotacion(
+                rotacion_id=rotacion_id,
+                reenvueltas=info["recibidas"],
+                descartadas=sorted(ilegibles),
+                segundos=segundos,
+                deks_por_s=info["recibidas"] / segundos if segundos else 0.0
+            )
+
+    raise Exception(f"Siguen llegando documentos nuevos; la rotación {rotacion_id} sigue abierta. Vuelve a intentarlo.")
@@ -0,0 +1,98 @@
+"""
+Sesión de clave privada: se desbloquea una vez (una sola derivación PKCS#8
+con la contraseña) y queda en memoria hasta que se bloquea a mano o pasa
+'inactividad_s' sin usarla.
+
+logica_cifrado y logica_descifrado aceptan una SesionClavePrivada en lugar de
+(ruta del PEM, contraseña); así una operación masiva no repite el KDF por
+documento ni pide la contraseña cada vez.
+"""
+import time
+import threading
+from cryptography.hazmat.primitives import serialization
+
+INACTIVIDAD_S = 15 * 60
+
+
+class ClaveBloqueada(Exception):
+    """La sesión no tiene la clave desbloqueada (nunca se abrió, se bloqueó o caducó)."""
+
+
+class SesionClavePrivada:
+    def __init__(self, inactividad_s: float = INACTIVIDAD_S):
+        self.inactividad_s = inactividad_s
+        self.ruta = None
+        self._clave = None
+        self._ultimo_uso = 0.0
+        self._cerrojo = threading.Lock()
+        self._temporizador = None
+
+    def desbloquear(self, ruta_pem: str, password: str):
+        """Carga la clave; lanza la excepción de cryptography si la contraseña no vale."""
+        with open(ruta_pem, "rb") as f:
+            clave = serialization.load_pem_private_key(f.read(), password=password.encode("utf-8"))
+        with self._cerrojo:
+            self._clave = clave
+            self.ruta = ruta_pem
+            self._ultimo_uso = time.monotonic()
+        self._programar(self.inactividad_s)
+
+    def bloquear(self):
+        with self._cerrojo:
+            self._clave = None
+            self.ruta = None
+            if self._temporizador:
+                self._temporizador.cancel()
+                self._temporizador = None
+
+    @property
+    def desbloqueada(self) -> bool:
+        with self._cerrojo:
+            return self._clave is not None and not self._caducada()
+
+    def clave(self):
+        """Devuelve la clave privada y renueva el plazo de inactividad."""
+        with self._cerrojo:
+            if self._clave is None or self._caducada():
+                self._clave = None
+                raise ClaveBloqueada("La clave privada está bloqueada. Desbloquéala de nuevo.")
+            self._ultimo_uso = time.monotonic()
+            return self._clave
+
+    def _caducada(self) -> bool:
+        return time.monotonic() - self._ultimo_uso > self.inactividad_s
+
+    def _programar(self, segundos: float):
+        # Un solo temporizador: al vencer mira el último uso y se reprograma si hizo falta
+        with self._cerrojo:
+            if self._temporizador:
+                self._temporizador.cancel()
+            self._temporizador = threading.Timer(segundos, self._vigilar)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def _vigilar(self):
+        with self._cerrojo:
+            if self._clave is None:
+                self._temporizador = None
+                return
+            restante = self.inactividad_s - (time.monotonic() - self._ultimo_uso)
+            if restante <= 0:
+                self._clave = None
+                self.ruta = None
+                self._temporizador = None
+                return
+        self._programar(restante)
+
+
+def clave_privada(origen, password=None):
+    """
+    Resuelve la clave privada a partir de una SesionClavePrivada o de la ruta
+    a un PEM cifrado con su contraseña (str o bytes), como hasta ahora.
+    """
+    if isinstance(origen, SesionClavePrivada):
+        return origen.clave()
+    if isinstance(password, str):
+        password = password.encode("utf-8")
+    with open(origen, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=password)
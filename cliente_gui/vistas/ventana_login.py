@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 import api_cliente
+import api_cliente_async
 
 class VentanaLogin:
     def __init__(self, master, app_instance):
@@ -121,12 +122,14 @@ class VentanaLogin:
             # Deshabilitar botones durante el login
             self.master.update_idletasks()
             
-            token = api_cliente.login(usuario, password)
-            self.app.token = token
+            # Login y, a la vez, contactos y bandeja (la bandeja la usa la ventana principal)
+            sesion = api_cliente_async.iniciar_sesion(usuario, password)
+            self.app.token = sesion["token"]
             self.app.nombre_usuario = usuario
+            self.app.bandeja_precargada = sesion["documentos"]
             
-            # Obtener contactos y detectar rol
-            contactos = api_cliente.obtener_contactos(token)
+            # Detectar rol
+            contactos = sesion["contactos"]
             mi_info_encontrada = False
             for c in contactos:
                 if c["nombre"] == self.app.nombre_usuario:
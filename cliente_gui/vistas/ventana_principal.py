@@ -2,17 +2,23 @@ import tkinter as tk
 from tkinter import messagebox, simpledialog, filedialog, Listbox, Scrollbar, Toplevel, MULTIPLE
 import os
 import sys
+import tempfile
+import threading
 
 # Importamos módulos lógicos
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import api_cliente
+import api_cliente_async
 import logica_claves
 import logica_cifrado
 import logica_descifrado
+import descifrado_masivo
+import rotacion_clave
+import sesion_clave
 from vistas.ventana_admin_panel import VentanaAdmin
 
 class DialogoSeleccionReceptores(Toplevel):
-    def __init__(self, parent, contactos, mi_uuid):
+    def __init__(self, parent, contactos, mi_uuid, texto="Selecciona quién podrá ver el archivo:"):
         super().__init__(parent)
         self.title("Seleccionar Receptores")
         self.geometry("600x600")
@@ -20,7 +26,7 @@ class DialogoSeleccionReceptores(Toplevel):
         self.contactos = contactos
         self.receptores_seleccionados = [] 
 
-        tk.Label(self, text="Selecciona quién podrá ver el archivo:", font=("Arial", 24, "bold")).pack(pady=25)
+        tk.Label(self, text=texto, font=("Arial", 24, "bold")).pack(pady=25)
         tk.Label(self, text="(El administrador y tú mismo están ocultos)", font=("Arial", 16), fg="grey").pack(pady=5)
 
         list_frame = tk.Frame(self)
@@ -144,6 +150,10 @@ class VentanaPrincipal:
                                  font=("Segoe UI", 18), relief='flat', command=self.refrescar_bandeja, height=2)
         btn_refrescar.pack(side="left", padx=10)
 
+        btn_bloquear = tk.Button(right_header, text="🔐 Bloquear Clave", bg=self.colores['accent'], fg='white',
+                                font=("Segoe UI", 18), relief='flat', command=self.bloquear_clave, height=2)
+        btn_bloquear.pack(side="left", padx=10)
+
         btn_salir = tk.Button(right_header, text="🚪 Salir", bg=self.colores['danger'], fg='white',
                              font=("Segoe UI", 18), relief='flat', command=self.app.cerrar_sesion, height=2)
         btn_salir.pack(side="left", padx=10)
@@ -156,7 +166,7 @@ class VentanaPrincipal:
                                       bg=self.colores['primary'], fg='white', font=("Segoe UI", 22, "bold"), relief='flat', height=3)
         btn_generar_claves.pack(side="left", padx=15, fill="x", expand=True)
         
-        btn_cifrar = tk.Button(action_frame, text="🔒 Cifrar y Subir Archivo", command=self.ejecutar_cifrado_completo, 
+        btn_cifrar = tk.Button(action_frame, text="🔒 Cifrar y Subir Archivos", command=self.ejecutar_cifrado_completo, 
                               bg=self.colores['secondary'], fg='white', font=("Segoe UI", 22, "bold"), relief='flat', height=3)
         btn_cifrar.pack(side="left", padx=15, fill="x", expand=True)
 
@@ -169,7 +179,7 @@ class VentanaPrincipal:
         list_frame.pack(fill="both", expand=True, pady=20)
         
         list_scrollbar = tk.Scrollbar(list_frame, orient="vertical", bg=self.colores['light'])
-        self.lista_documentos = tk.Listbox(list_frame, yscrollcommand=list_scrollbar.set, height=12, font=("Segoe UI", 25),
+        self.lista_documentos = tk.Listbox(list_frame, yscrollcommand=list_scrollbar.set, height=12, font=("Segoe UI", 25), selectmode=tk.EXTENDED,
                                           bg='white', fg=self.colores['text'], selectbackground=self.colores['primary'], selectforeground='white')
         list_scrollbar.config(command=self.lista_documentos.yview)
         list_scrollbar.pack(side="right", fill="y")
@@ -192,6 +202,22 @@ class VentanaPrincipal:
                                  bg=self.colores['warning'], fg='white', font=("Segoe UI", 22, "bold"), relief='flat', height=2)
         btn_verificar.pack(side="left", padx=10, fill="x", expand=True)
 
+        btn_lote = tk.Button(row1_frame, text="📦 Descifrar Selección a Carpeta", command=self.accion_descifrar_lote,
+                            bg=self.colores['primary'], fg='white', font=("Segoe UI", 22, "bold"), relief='flat', height=2)
+        btn_lote.pack(side="left", padx=10, fill="x", expand=True)
+
+        # Fila de accesos: solo cambia quién tiene la DEK, el paquete cifrado no se vuelve a subir
+        accesos_frame = tk.Frame(main_frame, bg=self.colores['light'])
+        accesos_frame.pack(fill="x", pady=8)
+
+        btn_compartir = tk.Button(accesos_frame, text="👥 Compartir con más usuarios", command=self.accion_compartir,
+                                 bg=self.colores['secondary'], fg='white', font=("Segoe UI", 22, "bold"), relief='flat', height=2)
+        btn_compartir.pack(side="left", padx=10, fill="x", expand=True)
+
+        btn_revocar = tk.Button(accesos_frame, text="🚫 Revocar acceso", command=self.accion_revocar,
+                               bg=self.colores['danger'], fg='white', font=("Segoe UI", 22, "bold"), relief='flat', height=2)
+        btn_revocar.pack(side="left", padx=10, fill="x", expand=True)
+
         # Fila 2: Operaciones de Auditoría (Lo que pidió la Profa)
         row2_frame = tk.Frame(main_frame, bg=self.colores['light'])
         row2_frame.pack(fill="x", pady=10)
@@ -221,7 +247,9 @@ class VentanaPrincipal:
     def refrescar_bandeja(self):
         try:
             self.lista_documentos.delete(0, "end")
-            documentos = api_cliente.listar_documentos_recibidos(self.app.token)
+            documentos, self.app.bandeja_precargada = self.app.bandeja_precargada, None
+            if documentos is None:
+                documentos = api_cliente.listar_documentos_recibidos(self.app.token)
             self.app.documentos_en_lista = documentos
             if not documentos:
                 self.lista_documentos.insert("end", " (No tienes documentos)")
@@ -246,22 +274,44 @@ class VentanaPrincipal:
         if not self.app.documentos_en_lista: return None
         return self.app.documentos_en_lista[seleccion[0]]
 
+    def _clave_desbloqueada(self, titulo="Selecciona tu Clave Privada (.pem)"):
+        """Devuelve la sesión de clave privada; solo pide PEM y contraseña si está bloqueada."""
+        sesion = self.app.sesion_clave
+        if sesion.desbloqueada:
+            return sesion
+
+        ruta_privada = filedialog.askopenfilename(title=titulo, filetypes=[("PEM files", "*.pem")])
+        if not ruta_privada: return None
+        pass_privada = simpledialog.askstring("Contraseña", "Contraseña de tu clave privada:", show="*")
+        if not pass_privada: return None
+
+        try:
+            sesion.desbloquear(ruta_privada, pass_privada)
+        except Exception as e:
+            self.app.mostrar_error(f"No se pudo abrir la clave privada: {e}")
+            return None
+        self.app.loguear(f"Clave privada desbloqueada ({os.path.basename(ruta_privada)}). Se bloqueará tras {int(sesion.inactividad_s // 60)} min sin uso.", "KEY_UNLOCK")
+        return sesion
+
+    def bloquear_clave(self):
+        self.app.sesion_clave.bloquear()
+        self.app.loguear("Clave privada bloqueada y borrada de memoria.", "KEY_LOCK")
+        self.app.mostrar_exito("Clave privada bloqueada.")
+
     # --- NUEVA FUNCIÓN: BAJAR ZIP RAW ---
     def accion_bajar_zip_raw(self):
         doc = self._get_seleccion()
         if not doc: return
         
         try:
-            self.app.loguear(f"Descargando ZIP Cifrado (Raw) del Doc ID {doc['id']}...", "AUDIT")
-            zip_bytes = api_cliente.descargar_documento_zip(self.app.token, doc['id'])
-            
             # Sugerir nombre con extensión .zip
             nombre_sugerido = f"CIFRADO_{doc['nombre_original']}.zip"
             ruta_guardado = filedialog.asksaveasfilename(title="Guardar ZIP Cifrado", initialfile=nombre_sugerido, defaultextension=".zip")
             
             if ruta_guardado:
-                with open(ruta_guardado, "wb") as f:
-                    f.write(zip_bytes)
+                self.app.loguear(f"Descargando ZIP Cifrado (Raw) del Doc ID {doc['id']}...", "AUDIT")
+                # Se escribe directo a disco y se reanuda si la conexión se corta
+                api_cliente.descargar_documento_a_archivo(self.app.token, doc['id'], ruta_guardado)
                 self.app.mostrar_exito(f"ZIP Cifrado guardado en:\n{ruta_guardado}")
                 self.app.loguear(f"ZIP guardado para inspección externa.", "AUDIT_OK")
         except Exception as e:
@@ -272,24 +322,15 @@ class VentanaPrincipal:
         doc = self._get_seleccion()
         if not doc: return
 
-        # Buscar al autor
-        autor_uuid = doc["propietario_uuid"]
-        autor_obj = next((c for c in self.app.contactos if c["uuid"] == autor_uuid), None)
-        
-        if not autor_obj:
-            # Intentar refrescar contactos por si acaso
-            self.app.contactos = api_cliente.obtener_contactos(self.app.token)
-            autor_obj = next((c for c in self.app.contactos if c["uuid"] == autor_uuid), None)
-
-        if not autor_obj:
-            self.app.mostrar_error("No se encontró la información del autor (UUID desconocido).")
-            return
-            
-        pem_key = autor_obj.get("clave_publica")
-        if not pem_key:
-            self.app.mostrar_error(f"El autor {autor_obj['nombre']} no tiene clave pública registrada.")
+        # Solo la clave del autor (con su huella), no el directorio entero
+        try:
+            autor_obj = api_cliente.obtener_clave_publica(self.app.token, doc["propietario_uuid"])
+        except Exception as e:
+            self.app.mostrar_error(f"No se pudo obtener la clave pública del autor: {e}")
             return
 
+        pem_key = autor_obj["clave_publica"]
+
         try:
             self.app.loguear(f"Exportando Llave Pública de {autor_obj['nombre']}...", "AUDIT")
             nombre_sugerido = f"PUBLIC_KEY_{autor_obj['nombre']}.pem"
@@ -299,7 +340,7 @@ class VentanaPrincipal:
                 with open(ruta_guardado, "w") as f:
                     f.write(pem_key)
                 self.app.mostrar_exito(f"Llave Pública guardada en:\n{ruta_guardado}")
-                self.app.loguear(f"Llave PEM exportada para verificación manual.", "AUDIT_OK")
+                self.app.loguear(f"Llave PEM exportada para verificación manual. Huella SHA-256: {autor_obj['huella']}", "AUDIT_OK")
         except Exception as e:
             self.app.mostrar_error(str(e))
 
@@ -308,76 +349,216 @@ class VentanaPrincipal:
         doc = self._get_seleccion()
         if not doc: return
         
-        ruta_privada = filedialog.askopenfilename(title="Selecciona tu Clave Privada (.pem)", filetypes=[("PEM files", "*.pem")])
-        if not ruta_privada: return
-        
-        pass_privada = simpledialog.askstring("Contraseña", "Contraseña de tu clave privada:", show="*")
-        if not pass_privada: return
+        sesion = self._clave_desbloqueada()
+        if not sesion: return
 
+        ruta_guardado = filedialog.asksaveasfilename(title="Guardar Archivo Descifrado", initialfile=f"DESCIFRADO_{doc['nombre_original']}")
+        if not ruta_guardado: return
+
+        fd, ruta_paquete = tempfile.mkstemp(suffix=".paq")
+        os.close(fd)
         try:
             self.app.mostrar_exito("Procesando... Espere.")
-            zip_bytes = api_cliente.descargar_documento_zip(self.app.token, doc['id'])
-            
-            # --- CORRECCIÓN AQUÍ: Recibimos solo 3 valores, no 4 ---
-            plaintext, _, _ = logica_descifrado.descifrar_contenido(
-                zip_bytes=zip_bytes,
+            # De disco a disco: el documento nunca está entero en memoria (paquetes v3)
+            api_cliente.descargar_documento_a_archivo(self.app.token, doc['id'], ruta_paquete)
+            logica_descifrado.descifrar_a_archivo(
+                ruta_paquete=ruta_paquete,
+                ruta_destino=ruta_guardado,
                 mi_uuid=self.app.uuid_usuario,
-                ruta_clave_privada=ruta_privada,
-                password_clave_privada=pass_privada
+                ruta_clave_privada=sesion,
+                obtener_dek=lambda: api_cliente.obtener_mi_dek(self.app.token, doc['id'])
             )
-            
-            ruta_guardado = filedialog.asksaveasfilename(title="Guardar Archivo Descifrado", initialfile=f"DESCIFRADO_{doc['nombre_original']}")
-            if ruta_guardado:
-                with open(ruta_guardado, "wb") as f: f.write(plaintext)
-                self.app.mostrar_exito(f"Archivo guardado correctamente.")
-                self.app.loguear("Archivo descifrado exitosamente.", "DECRYPT_OK")
-            
+            self.app.mostrar_exito(f"Archivo guardado correctamente.")
+            self.app.loguear("Archivo descifrado exitosamente.", "DECRYPT_OK")
+
         except Exception as e:
             self.app.mostrar_error(f"Error: {e}")
+        finally:
+            for ruta in (ruta_paquete, ruta_paquete + ".part", ruta_paquete + ".part.etag"):
+                if os.path.exists(ruta): os.remove(ruta)
+
+    def accion_descifrar_lote(self):
+        indices = self.lista_documentos.curselection()
+        documentos = [self.app.documentos_en_lista[i] for i in indices] if self.app.documentos_en_lista else []
+        if not documentos:
+            self.app.mostrar_error("Selecciona uno o varios documentos (Ctrl/Shift + clic).")
+            return
+
+        carpeta = filedialog.askdirectory(title="Carpeta donde guardar los documentos descifrados")
+        if not carpeta: return
+        sesion = self._clave_desbloqueada()
+        if not sesion: return
+        verificar = messagebox.askyesno("Verificación", "¿Verificar también la firma de cada documento?")
+
+        self.app.loguear(f"Descifrando {len(documentos)} documentos en {carpeta}...", "BATCH_START")
+
+        def progreso(resultado, hechos, total):
+            if resultado.error:
+                self.app.loguear(f"[{hechos}/{total}] {resultado.nombre}: ERROR {resultado.error}", "BATCH_FAIL")
+            else:
+                firma = "" if resultado.firma_valida is None else (" | firma OK" if resultado.firma_valida else " | FIRMA INVÁLIDA")
+                self.app.loguear(f"[{hechos}/{total}] {resultado.nombre} ({resultado.tamano_bytes} bytes){firma}", "BATCH_OK")
+
+        # En segundo plano para no congelar la ventana; el resultado vuelve al hilo de Tk con after()
+        def trabajo():
+            try:
+                resumen = descifrado_masivo.descifrar_a_carpeta(
+                    self.app.token, documentos, carpeta, self.app.uuid_usuario, sesion,
+                    verificar=verificar, progreso_callback=progreso
+                )
+            except Exception as e:
+                self.master.after(0, lambda error=e: self.app.mostrar_error(f"Error: {error}"))
+                return
+            self.master.after(0, lambda: self._fin_lote(resumen))
+
+        threading.Thread(target=trabajo, daemon=True).start()
+
+    def _fin_lote(self, resumen):
+        firmas_malas = [r for r in resumen.correctos if r.firma_valida is False]
+        texto = (f"Descifrados: {len(resumen.correctos)} de {len(resumen.resultados)}\n"
+                 f"Tiempo: {resumen.segundos:.1f} s | {resumen.documentos_por_s:.2f} docs/s | {resumen.mb_por_s:.2f} MB/s")
+        self.app.loguear(texto.replace("\n", " | "), "BATCH_DONE")
+        if resumen.fallidos or firmas_malas:
+            detalle = [f"• {r.nombre}: {r.error}" for r in resumen.fallidos]
+            detalle += [f"• {r.nombre}: firma inválida" for r in firmas_malas]
+            messagebox.showwarning("Descifrado masivo", texto + "\n\nCon problemas:\n" + "\n".join(detalle[:15]))
+        else:
+            messagebox.showinfo("Descifrado masivo", texto)
+
+    def _documento_propio_seleccionado(self):
+        doc = self._get_seleccion()
+        if not doc: return None
+        if doc["propietario_uuid"] != self.app.uuid_usuario:
+            self.app.mostrar_error("Solo el propietario puede gestionar los accesos de este documento.")
+            return None
+        return doc
+
+    def accion_compartir(self):
+        doc = self._documento_propio_seleccionado()
+        if not doc: return
+
+        try:
+            accesos = {a["usuario_uuid"] for a in api_cliente.listar_accesos(self.app.token, doc['id'])}
+            self.app.contactos = api_cliente.obtener_contactos(self.app.token)
+            candidatos = [c for c in self.app.contactos if c["uuid"] not in accesos]
+            dialogo = DialogoSeleccionReceptores(self.master, candidatos, self.app.uuid_usuario,
+                                                 f"¿Con quién más compartir '{doc['nombre_original']}'?")
+            destinatarios = dialogo.receptores_seleccionados
+            if not destinatarios: return
+
+            sesion = self._clave_desbloqueada("Tu Clave Privada (Para abrir la llave del documento)")
+            if not sesion: return
+
+            claves = api_cliente.obtener_claves_publicas(self.app.token, [d["uuid"] for d in destinatarios])
+            sin_clave = [d["nombre"] for d in destinatarios if d["uuid"] not in claves]
+            if sin_clave:
+                self.app.mostrar_error(f"Sin clave pública registrada: {', '.join(sin_clave)}")
+                return
+            destinatarios = [
+                {**d, "clave_publica": claves[d["uuid"]]["clave_publica"], "huella": claves[d["uuid"]]["huella"]}
+                for d in destinatarios
+            ]
+
+            # Mi DEK se abre una vez y se envuelve para cada nuevo receptor: solo viajan unos cientos de bytes por receptor
+            deks = logica_cifrado.reenvolver_dek(
+                api_cliente.obtener_mi_dek(self.app.token, doc['id']), sesion, None, destinatarios
+            )
+            api_cliente.agregar_accesos(self.app.token, doc['id'], deks)
+
+            nombres = ", ".join(d["nombre"] for d in destinatarios)
+            self.app.mostrar_exito(f"Documento compartido con: {nombres}")
+            self.app.loguear(f"Acceso al Doc ID {doc['id']} concedido a {nombres} ({len(deks)} DEKs RSA-OAEP, sin resubir el contenido).", "SHARE")
+        except Exception as e:
+            self.app.mostrar_error(str(e))
+
+    def accion_revocar(self):
+        doc = self._documento_propio_seleccionado()
+        if not doc: return
+
+        try:
+            accesos = [
+                {"uuid": a["usuario_uuid"], "nombre": a["nombre"]}
+                for a in api_cliente.listar_accesos(self.app.token, doc['id'])
+            ]
+            dialogo = DialogoSeleccionReceptores(self.master, accesos, self.app.uuid_usuario,
+                                                 f"¿A quién quitar el acceso a '{doc['nombre_original']}'?")
+            revocados = dialogo.receptores_seleccionados
+            if not revocados: return
+
+            nombres = ", ".join(r["nombre"] for r in revocados)
+            if not messagebox.askyesno("Revocar acceso",
+                                       f"Quitar el acceso a: {nombres}\n\n"
+                                       "Dejarán de verlo y de poder descargarlo. Una copia que ya hayan "
+                                       "descargado y descifrado no se puede recuperar."):
+                return
+
+            for r in revocados:
+                api_cliente.revocar_acceso(self.app.token, doc['id'], r["uuid"])
+                self.app.loguear(f"Acceso al Doc ID {doc['id']} revocado a {r['nombre']}.", "REVOKE")
+            self.app.mostrar_exito(f"Acceso revocado a: {nombres}")
+        except Exception as e:
+            self.app.mostrar_error(str(e))
 
     def accion_solo_verificar(self):
         doc = self._get_seleccion()
         if not doc: return
         
-        ruta_privada = filedialog.askopenfilename(title="Tu Clave Privada (Para abrir el sobre)", filetypes=[("PEM files", "*.pem")])
-        if not ruta_privada: return
-        pass_privada = simpledialog.askstring("Contraseña", "Contraseña:", show="*")
-        if not pass_privada: return
+        sesion = self._clave_desbloqueada("Tu Clave Privada (Para abrir el sobre)")
+        if not sesion: return
 
+        fd, ruta_paquete = tempfile.mkstemp(suffix=".paq")
+        os.close(fd)
+        ruta_plano = ruta_paquete + ".plano"
         try:
-            zip_bytes = api_cliente.descargar_documento_zip(self.app.token, doc['id'])
-            
-            # --- CORRECCIÓN AQUÍ: Recibimos solo 3 valores ---
-            plaintext, firma_bytes, autor_uuid = logica_descifrado.descifrar_contenido(
-                zip_bytes=zip_bytes, 
-                mi_uuid=self.app.uuid_usuario, 
-                ruta_clave_privada=ruta_privada, 
-                password_clave_privada=pass_privada
+            # Descifrado y verificación por bloques: el documento no se carga entero en memoria
+            api_cliente.descargar_documento_a_archivo(self.app.token, doc['id'], ruta_paquete)
+            firma_bytes, autor_uuid, modo_firma = logica_descifrado.descifrar_a_archivo(
+                ruta_paquete=ruta_paquete,
+                ruta_destino=ruta_plano,
+                mi_uuid=self.app.uuid_usuario,
+                ruta_clave_privada=sesion,
+                obtener_dek=lambda: api_cliente.obtener_mi_dek(self.app.token, doc['id'])
             )
             
-            # Buscar clave pública del autor para verificar
-            self.app.contactos = api_cliente.obtener_contactos(self.app.token)
-            autor = next((c for c in self.app.contactos if c["uuid"] == autor_uuid), None)
-            
-            if not autor:
-                self.app.mostrar_error("Autor desconocido (UUID no encontrado en contactos), no se puede verificar firma.")
+            # Clave pública del autor para verificar (cacheada por huella)
+            try:
+                autor = api_cliente.obtener_clave_publica(self.app.token, autor_uuid)
+            except Exception:
+                self.app.mostrar_error("Autor desconocido (UUID sin clave pública en el servidor), no se puede verificar firma.")
                 return
 
-            es_valida = logica_descifrado.verificar_firma(plaintext, firma_bytes, autor["clave_publica"])
+            es_valida = logica_descifrado.verificar_firma_archivo(ruta_plano, firma_bytes, autor["clave_publica"], modo_firma)
             
             if es_valida:
                 messagebox.showinfo("Verificación", f"✅ FIRMA VÁLIDA\n\nEl documento es auténtico y no ha sido modificado.\nFirmado por: {autor['nombre']}")
-                self.app.loguear(f"Firma RSA-PSS Verificada: OK. Autor: {autor['nombre']}", "VERIFY_OK")
+                self.app.loguear(f"Firma RSA-PSS Verificada: OK ({modo_firma}). Autor: {autor['nombre']}", "VERIFY_OK")
             else:
                 messagebox.showerror("Verificación", "❌ FIRMA INVÁLIDA\n\nEl documento ha sido alterado o la llave pública no coincide.")
                 self.app.loguear("Fallo de verificación de firma.", "VERIFY_FAIL")
                 
         except Exception as e:
             self.app.mostrar_error(str(e))
+        finally:
+            for ruta in (ruta_paquete, ruta_paquete + ".part", ruta_paquete + ".part.etag", ruta_plano):
+                if os.path.exists(ruta): os.remove(ruta)
 
 
     def generar_y_subir_claves(self):
         try:
+            self.app.contactos = api_cliente.obtener_contactos(self.app.token)
+            yo = next((c for c in self.app.contactos if c["uuid"] == self.app.uuid_usuario), None)
+            if yo and yo.get("clave_publica"):
+                rotar = messagebox.askyesnocancel(
+                    "Claves",
+                    "Ya tienes una clave publicada.\n\n"
+                    "Sí: ROTARLA conservando tus documentos y accesos (necesitas tu clave privada actual).\n"
+                    "No: REEMPLAZARLA perdiendo tus documentos y accesos (si perdiste la clave privada)."
+                )
+                if rotar is None: return
+                if rotar:
+                    self.rotar_clave()
+                    return
+
             pass_privada = simpledialog.askstring("Contraseña", "Crea contraseña para tu clave privada:", show="*")
             if not pass_privada: return
             carpeta = filedialog.askdirectory(title="Dónde guardar tus claves")
@@ -385,25 +566,70 @@ class VentanaPrincipal:
             
             pub, priv_path = logica_claves.generar_par_claves(pass_privada, carpeta, self.app.nombre_usuario)
             api_cliente.subir_clave_publica(self.app.token, pub)
+            # La clave desbloqueada (si la había) ya no corresponde a la pública del servidor
+            self.app.sesion_clave.bloquear()
             
             self.app.mostrar_exito(f"Claves generadas en: {carpeta}")
             self.app.loguear("Nuevas claves RSA-2048 generadas y Clave Pública subida al servidor.", "KEYS_GEN")
         except Exception as e:
             self.app.mostrar_error(str(e))
 
+    def rotar_clave(self):
+        sesion_vieja = self._clave_desbloqueada("Tu Clave Privada ACTUAL (para re-envolver tus llaves)")
+        if not sesion_vieja: return
+        pass_nueva = simpledialog.askstring("Contraseña", "Crea contraseña para tu clave privada NUEVA:", show="*")
+        if not pass_nueva: return
+        carpeta = filedialog.askdirectory(title="Dónde guardar la clave nueva")
+        if not carpeta: return
+        if os.path.exists(os.path.join(carpeta, f"{self.app.nombre_usuario}_private.pem")):
+            self.app.mostrar_error("Ya hay una clave privada en esa carpeta. Elige otra: la actual hace falta hasta terminar la rotación.")
+            return
+
+        try:
+            pub, ruta_nueva = logica_claves.generar_par_claves(pass_nueva, carpeta, self.app.nombre_usuario)
+            sesion_nueva = sesion_clave.SesionClavePrivada()
+            sesion_nueva.desbloquear(ruta_nueva, pass_nueva)
+        except Exception as e:
+            self.app.mostrar_error(str(e))
+            return
+        self.app.loguear("Rotando clave: se re-envuelven tus DEKs, los documentos no se vuelven a subir...", "KEY_ROTATE")
+
+        def progreso(hechas, total):
+            self.app.loguear(f"[{hechas}/{total}] DEKs re-envueltas con la clave nueva", "KEY_ROTATE")
+
+        # En segundo plano: con decenas de miles de DEKs tarda; el final vuelve al hilo de Tk con after()
+        def trabajo():
+            try:
+                resumen = rotacion_clave.rotar_clave(
+                    self.app.token, sesion_vieja, pub, sesion_nueva=sesion_nueva, progreso_callback=progreso
+                )
+            except Exception as e:
+                self.master.after(0, lambda error=e: self.app.mostrar_error(f"Rotación no completada (tu clave actual sigue vigente): {error}"))
+                return
+            finally:
+                sesion_nueva.bloquear()
+            self.master.after(0, lambda: self._fin_rotacion(resumen, ruta_nueva))
+
+        threading.Thread(target=trabajo, daemon=True).start()
+
+    def _fin_rotacion(self, resumen, ruta_nueva):
+        # La clave desbloqueada es la vieja: ya no abre las DEKs del servidor
+        self.app.sesion_clave.bloquear()
+        texto = f"{resumen.reenvueltas} DEKs re-envueltas en {resumen.segundos:.1f} s ({resumen.deks_por_s:.0f} DEKs/s)"
+        self.app.loguear(f"Clave rotada. {texto}. Clave privada nueva: {ruta_nueva}", "KEYS_ROTATED")
+        self.app.mostrar_exito(f"Clave rotada sin volver a subir documentos.\n{texto}\n\nDesde ahora usa:\n{ruta_nueva}")
+
     def ejecutar_cifrado_completo(self):
         # Esta es la misma lógica que te pasé en el paso anterior (con logs), 
         # asegúrate de que use 'self.app.loguear'
         try:
-            ruta_original = filedialog.askopenfilename(title="Selecciona archivo")
-            if not ruta_original: return
+            rutas = filedialog.askopenfilenames(title="Selecciona uno o varios archivos")
+            if not rutas: return
             
-            self.app.loguear(f"Seleccionado para cifrar: {os.path.basename(ruta_original)}", "INPUT")
+            self.app.loguear(f"Seleccionados para cifrar: {', '.join(os.path.basename(r) for r in rutas)}", "INPUT")
             
-            ruta_privada = filedialog.askopenfilename(title="Tu Clave Privada (Para FIRMAR)", filetypes=[("PEM", "*.pem")])
-            if not ruta_privada: return
-            pass_privada = simpledialog.askstring("Contraseña", "Contraseña:", show="*")
-            if not pass_privada: return
+            sesion = self._clave_desbloqueada("Tu Clave Privada (Para FIRMAR)")
+            if not sesion: return
             
             self.app.contactos = api_cliente.obtener_contactos(self.app.token)
             dialogo = DialogoSeleccionReceptores(self.master, self.app.contactos, self.app.uuid_usuario)
@@ -414,19 +640,47 @@ class VentanaPrincipal:
             yo = next((c for c in self.app.contactos if c["uuid"] == self.app.uuid_usuario), None)
             if yo and yo not in destinatarios: destinatarios.append(yo)
 
+            # Claves vigentes de los elegidos en una sola petición (el directorio puede estar desfasado)
+            claves = api_cliente.obtener_claves_publicas(self.app.token, [d["uuid"] for d in destinatarios])
+            sin_clave = [d["nombre"] for d in destinatarios if d["uuid"] not in claves]
+            if sin_clave:
+                self.app.mostrar_error(f"Sin clave pública registrada: {', '.join(sin_clave)}")
+                return
+            destinatarios = [
+                {**d, "clave_publica": claves[d["uuid"]]["clave_publica"], "huella": claves[d["uuid"]]["huella"]}
+                for d in destinatarios
+            ]
+
             self.app.loguear("Iniciando Cifrado Híbrido...", "START")
             
-            ruta_zip, meta = logica_cifrado.crear_paquete_cifrado(
-                ruta_original, ruta_privada, pass_privada, self.app.uuid_usuario, destinatarios,
-                log_callback=self.app.loguear
-            )
+            # Cada paquete se sube en segundo plano mientras se cifra el siguiente
+            subidas = []
+            fallidos = []
+            try:
+                for ruta_original in rutas:
+                    ruta_zip, meta = logica_cifrado.crear_paquete_cifrado(
+                        ruta_original, sesion, None, self.app.uuid_usuario, destinatarios,
+                        log_callback=self.app.loguear
+                    )
+                    subidas.append((ruta_original, ruta_zip, api_cliente_async.en_segundo_plano(
+                        api_cliente_async.subir_documento_cifrado(
+                            self.app.token, ruta_zip, meta["nombre_original"], meta["deks_cifradas"]
+                        )
+                    )))
+            finally:
+                for ruta_original, ruta_zip, futuro in subidas:
+                    try:
+                        futuro.result()
+                    except Exception as e:
+                        fallidos.append(f"{os.path.basename(ruta_original)}: {e}")
+                    if os.path.exists(ruta_zip): os.remove(ruta_zip)
             
-            api_cliente.subir_documento_cifrado(self.app.token, ruta_zip, meta["nombre_original"], meta["deks_cifradas"])
-            
-            if os.path.exists(ruta_zip): os.remove(ruta_zip)
-            self.app.mostrar_exito("Archivo cifrado y subido.")
-            self.app.loguear("Subida finalizada.", "DONE")
+            self.app.loguear(f"Subida finalizada: {len(subidas) - len(fallidos)} de {len(rutas)}.", "DONE")
             self.refrescar_bandeja()
+            if fallidos:
+                self.app.mostrar_error("No se subieron:\n" + "\n".join(fallidos))
+            else:
+                self.app.mostrar_exito("Archivo cifrado y subido." if len(rutas) == 1 else f"{len(rutas)} archivos cifrados y subidos.")
             
         except Exception as e:
             self.app.mostrar_error(f"Error: {e}")